@@ -0,0 +1,65 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_bank import generate_ledger
+from customer import analytics
+from customer.bank_app import TransactionLogger
+from customer.binary_ledger import BinaryTransactionLogger, import_csv
+from customer.money import to_cents
+
+BY = ("account", "type", "month")
+
+def python_loop(ledger):
+    # What a hand-written report does today: one dict update per row and account
+    groups = {}
+    for row in ledger.iter_transactions():
+        cents = to_cents(row["amount"])
+        accounts = {row["from_account_id"], row["to_account_id"]} - {""}
+        for account in accounts:
+            key = (account, row["type"], row["timestamp"][:7])
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, cents, cents, cents]
+            else:
+                group[0] += 1
+                group[1] += cents
+                group[2] = min(group[2], cents)
+                group[3] = max(group[3], cents)
+    return len(groups)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Python loop vs vectorized ledger aggregates.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "transactions.csv")
+        bin_file = os.path.join(tmp, "transactions.bin")
+        generate_ledger(csv_file, args.rows, args.customers)
+        import_csv(csv_file, bin_file)
+        csv_ledger, bin_ledger = TransactionLogger(csv_file), BinaryTransactionLogger(bin_file)
+        cases = [
+            ("python loop, csv", lambda: python_loop(csv_ledger)),
+            ("numpy, csv", lambda: len(analytics.aggregate(csv_ledger, BY, chunk_rows=None))),
+            (f"numpy, csv, chunks of {args.chunk_rows:,}",
+             lambda: len(analytics.aggregate(csv_ledger, BY, chunk_rows=args.chunk_rows))),
+            ("numpy, binary", lambda: len(analytics.aggregate(bin_ledger, BY, chunk_rows=None))),
+            (f"numpy, binary, chunks of {args.chunk_rows:,}",
+             lambda: len(analytics.aggregate(bin_ledger, BY, chunk_rows=args.chunk_rows))),
+        ]
+        print(f"{args.rows:,} rows, {args.customers:,} customers, grouped by {', '.join(BY)}")
+        print(f"{'':<36}{'seconds':>9}{'groups':>9}{'speedup':>9}")
+        baseline = None
+        for name, func in cases:
+            start = time.perf_counter()
+            groups = func()
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"{name:<36}{seconds:>9.2f}{groups:>9,}{baseline / seconds:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
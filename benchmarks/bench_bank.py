@@ -0,0 +1,260 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.lazy import LazyCustomers
+from customer.metrics import Metrics
+from customer.passwords import PasswordHasher
+from customer.storage import CUSTOMER_FIELDNAMES
+
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
+
+# Operations per workload unless --workloads says otherwise. Statements scan the
+# ledger when it isn't indexed, so they get far fewer.
+DEFAULT_OPS = {"load": 1, "deposit": 2000, "withdraw": 2000, "transfer": 2000,
+               "statement": 20, "all_statements": 1, "top3": 200, "mixed": 2000}
+MIXED_WEIGHTS = {"deposit": 40, "withdraw": 20, "transfer": 30, "statement": 5, "top3": 5}
+
+def generate_customers(filename, count, seed=1):
+    rng = random.Random(seed)
+    # Already hashed (cheaply, and once), so loading never runs the password migration
+    password = PasswordHasher(n=2).hash("P@ssw0rd!")
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CUSTOMER_FIELDNAMES)
+        for i in range(count):
+            writer.writerow([str(10001 + i), f"First{i}", f"Last{i}", password,
+                             f"{rng.randrange(10_000, 1_000_000)}.{rng.randrange(100):02d}",
+                             f"{rng.randrange(0, 1_000_000)}.00", 0, True])
+
+def generate_ledger(filename, rows, customers, seed=2):
+    # Ledger rows in TransactionLogger's format, spread over the past year
+    rng = random.Random(seed)
+    moment = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / max(rows, 1)
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TransactionLogger.FIELDNAMES)
+        for tx_id in range(1, rows + 1):
+            moment += step
+            a = str(10001 + rng.randrange(customers))
+            amount = f"{rng.randrange(1, 5000)}.00"
+            kind = rng.choice(("deposit", "withdraw", "transfer"))
+            if kind == "deposit":
+                ends = ("", "", a, "checking")
+            elif kind == "withdraw":
+                ends = (a, "savings", "", "")
+            else:
+                ends = (a, "checking", str(10001 + rng.randrange(customers)), "savings")
+            writer.writerow([tx_id, moment.isoformat(), kind, *ends, amount, "0.00", "100.00"])
+
+def prepare_data(data_dir, customers, ledger_rows):
+    # Generated files are reused between runs of the same size
+    os.makedirs(data_dir, exist_ok=True)
+    bank_file = os.path.join(data_dir, f"bank_{customers}.csv")
+    ledger = os.path.join(data_dir, f"transactions_{ledger_rows}_{customers}.csv")
+    if not os.path.exists(bank_file):
+        generate_customers(bank_file + ".tmp", customers)
+        os.replace(bank_file + ".tmp", bank_file)
+    if not os.path.exists(ledger):
+        generate_ledger(ledger + ".tmp", ledger_rows, customers)
+        os.replace(ledger + ".tmp", ledger)
+    return bank_file, ledger
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10 # bytes vs KiB
+
+class Runner:
+    def __init__(self, workdir, customers, args):
+        self.workdir = workdir
+        self.ids = [str(10001 + i) for i in range(customers)]
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.metrics = Metrics() if args.metrics else None
+        self.bank = None
+
+    def open_bank(self):
+        logger = TransactionLogger(os.path.join(self.workdir, "transactions.csv"), index=self.args.ledger_index)
+        self.bank = Bank(os.path.join(self.workdir, "bank.csv"), logger, journal=self.args.journal,
+                         customers=LazyCustomers() if self.args.lazy else None, metrics=self.metrics)
+
+    def deposit(self):
+        self.bank.deposit_money(self.rng.choice(self.ids), "checking", self.rng.randrange(1, 500))
+
+    def withdraw(self):
+        self.bank.withdraw_money(self.rng.choice(self.ids), "savings", self.rng.randrange(1, 100))
+
+    def transfer(self):
+        self.bank.transfer_money(self.rng.choice(self.ids), "checking",
+                                 self.rng.choice(self.ids), "savings", self.rng.randrange(1, 100))
+
+    def statement(self):
+        self.bank.generate_statement(self.rng.choice(self.ids))
+
+    def all_statements(self):
+        self.bank.generate_all_statements(directory="statements")
+
+    def top3(self):
+        self.bank.top_3_customers()
+
+    def mixed(self):
+        kind = self.rng.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        getattr(self, kind)()
+
+    def run(self, name, ops):
+        if name == "load":
+            step = self.reload
+        else:
+            step = getattr(self, name)
+        if self.args.trace_memory:
+            tracemalloc.start()
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for _ in range(ops):
+            t = time.perf_counter()
+            try:
+                step()
+            except ValueError: # e.g. an overdraft limit; still a timed operation
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        result = {"workload": name, "ops": ops, "errors": errors, "seconds": round(elapsed, 6),
+                  "ops_per_sec": round(ops / elapsed, 2) if elapsed else None}
+        latencies.sort()
+        result["p50_ms"] = round(percentile(latencies, 0.50) * 1e3, 4)
+        result["p99_ms"] = round(percentile(latencies, 0.99) * 1e3, 4)
+        if self.args.trace_memory:
+            result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+        result["peak_rss_mb"] = peak_rss_mb()
+        return result
+
+    def reload(self):
+        if self.bank:
+            self.bank.close()
+            bank_app._LEDGER_STATES.clear()
+        self.open_bank()
+
+def parse_workloads(spec):
+    workloads = {}
+    for item in spec.split(","):
+        name, _, count = item.strip().partition("=")
+        if name not in DEFAULT_OPS:
+            raise SystemExit(f"Unknown workload {name!r}; choose from {', '.join(DEFAULT_OPS)}")
+        workloads[name] = int(count) if count else DEFAULT_OPS[name]
+    return workloads
+
+def compare(results, baseline_file, tolerance):
+    # Print ops/sec against an earlier results file; True if nothing regressed
+    with open(baseline_file) as f:
+        baseline = {r["workload"]: r for r in json.load(f)["results"]}
+    ok = True
+    for r in results:
+        old = baseline.get(r["workload"])
+        if not old or not old.get("ops_per_sec") or not r.get("ops_per_sec"):
+            continue
+        change = r["ops_per_sec"] / old["ops_per_sec"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{r['workload']:<10}{old['ops_per_sec']:>14,.1f}{r['ops_per_sec']:>14,.1f}{change:>+9.1%}{flag}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic data and time Bank workloads against it.")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--ledger-rows", type=int, default=100_000)
+    parser.add_argument("--workloads", default="load,deposit,withdraw,transfer,statement,top3,mixed",
+                        help="comma separated names, each optionally name=ops")
+    parser.add_argument("--data-dir", help="keep generated files here and reuse them")
+    parser.add_argument("--journal", action="store_true")
+    parser.add_argument("--lazy", action="store_true", help="load customers with LazyCustomers")
+    parser.add_argument("--ledger-index", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the Python heap peak (slows every workload down)")
+    parser.add_argument("--metrics", help="instrument the Bank and write a Prometheus text dump here")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="", help="free text stored with the results, e.g. a version")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier JSON results to compare ops/sec with")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown allowed by --compare before exiting with status 1")
+    args = parser.parse_args(argv)
+    workloads = parse_workloads(args.workloads)
+    workloads.pop("load", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_file, ledger = prepare_data(args.data_dir or os.path.join(tmp, "data"),
+                                         args.customers, args.ledger_rows)
+        workdir = os.path.join(tmp, "run")
+        os.makedirs(workdir)
+        shutil.copyfile(bank_file, os.path.join(workdir, "bank.csv"))
+        shutil.copyfile(ledger, os.path.join(workdir, "transactions.csv"))
+
+        cwd = os.getcwd()
+        os.chdir(workdir) # statements are written to the current directory
+        runner = Runner(workdir, args.customers, args)
+        try:
+            results = [runner.run("load", 1)]
+            for name, ops in workloads.items():
+                results.append(runner.run(name, ops))
+        finally:
+            if runner.bank:
+                runner.bank.close()
+            os.chdir(cwd)
+
+    report = {
+        "label": args.label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "customers": args.customers,
+        "ledger_rows": args.ledger_rows,
+        "options": {"journal": args.journal, "lazy": args.lazy, "ledger_index": args.ledger_index,
+                    "metrics": bool(args.metrics),
+                    "trace_memory": args.trace_memory, "seed": args.seed},
+        "results": results,
+    }
+    print(f"{args.customers:,} customers, {args.ledger_rows:,} ledger rows")
+    print(f"{'workload':<10}{'ops':>7}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "-"
+        print(f"{r['workload']:<10}{r['ops']:>7}{r['ops_per_sec'] or 0:>12,.1f}"
+              f"{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{rss:>13}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            f.write(runner.metrics.render())
+    if args.compare:
+        print(f"\nvs {args.compare}:")
+        if not compare(results, args.compare, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
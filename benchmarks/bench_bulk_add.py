@@ -0,0 +1,68 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_bank import generate_customers, peak_rss_mb
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.passwords import PasswordHasher
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Customer onboarding: single adds and a bulk import.")
+    parser.add_argument("--existing", type=int, default=100_000, help="customers already in bank.csv")
+    parser.add_argument("--adds", type=int, default=1000, help="single add_new_customer calls")
+    parser.add_argument("--imports", type=int, default=1_000_000, help="customers in the bulk import")
+    parser.add_argument("--plaintext", action="store_true",
+                        help="import plaintext passwords (hashed at --scrypt-n) instead of existing hashes")
+    parser.add_argument("--scrypt-n", type=int, default=2**14)
+    args = parser.parse_args(argv)
+    hasher = PasswordHasher(n=args.scrypt_n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_file = os.path.join(tmp, "bank.csv")
+        ledger = os.path.join(tmp, "transactions.csv")
+        generate_customers(bank_file, args.existing)
+        # generated rows are plaintext; hash them cheaply once so the timed load doesn't migrate
+        Bank(bank_file, TransactionLogger(ledger), password_hasher=PasswordHasher(n=2)).close()
+        start = time.perf_counter()
+        bank = Bank(bank_file, TransactionLogger(ledger), password_hasher=hasher)
+        print(f"load {args.existing:,} customers: {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        bank.save_customers()
+        rewrite = time.perf_counter() - start
+        print(f"whole-file rewrite, what every add used to cost: {rewrite * 1e3:.1f} ms")
+
+        start = time.perf_counter()
+        for i in range(args.adds):
+            bank.add_new_customer(f"New{i}", "Customer", f"P@ssw0rd{i}")
+        per_add = (time.perf_counter() - start) / args.adds
+        hash_ms = sum(_timed(lambda: hasher.hash("P@ssw0rd1")) for _ in range(5)) / 5 * 1e3
+        print(f"add_new_customer: {per_add * 1e3:.2f} ms per add, of which {hash_ms:.2f} ms hashing the password")
+
+        password = hasher.hash("Imported1!")
+        entries = ({"first_name": f"Imported{i}", "last_name": "Customer", "initial_checking": i % 1000,
+                    "password": f"Imp0rted!{i}" if args.plaintext else password} for i in range(args.imports))
+        start = time.perf_counter()
+        new_ids = bank.bulk_add_customers(entries, prehashed=True)
+        seconds = time.perf_counter() - start
+        rss = peak_rss_mb()
+        print(f"bulk_add_customers: {len(new_ids):,} customers in {seconds:.1f} s "
+              f"({len(new_ids) / seconds:,.0f}/s), ids {new_ids[0]}..{new_ids[-1]}"
+              + (f", peak RSS {rss:.0f} MB" if rss is not None else ""))
+        size = os.path.getsize(bank_file)
+        bank.close()
+        bank_app._LEDGER_STATES.clear()
+        start = time.perf_counter()
+        reopened = Bank(bank_file, TransactionLogger(ledger), password_hasher=hasher)
+        print(f"reload {len(reopened.customers):,} customers ({size / 2**20:.0f} MB): "
+              f"{time.perf_counter() - start:.1f} s")
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import random
+import time
+
+from customer.bank_app import Customer
+from customer.leaderboard import Leaderboard
+
+def total_cents(customer):
+    return customer.checking.balance_cents + customer.savings.balance_cents
+
+def run(customers, updates, query):
+    rng = random.Random(7)
+    ids = list(customers)
+    start = time.perf_counter()
+    for _ in range(updates):
+        customer = customers[rng.choice(ids)]
+        customer.checking.deposit_cents(rng.randrange(1, 100000))
+        query(customer)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deposit to a random customer, then ask for the top 3, N times.")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--updates", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    def make_customers():
+        rng = random.Random(1)
+        return {str(10001 + i): Customer(str(10001 + i), "First", "Last", "P@ssword1",
+                                         rng.randrange(100000), rng.randrange(100000))
+                for i in range(args.customers)}
+
+    customers = make_customers()
+    def full_sort(_):
+        return sorted(customers.values(), key=total_cents, reverse=True)[:3]
+    sort_time = run(customers, args.updates, full_sort)
+
+    customers = make_customers()
+    start = time.perf_counter()
+    board = Leaderboard((c.account_id, total_cents(c)) for c in customers.values())
+    build_time = time.perf_counter() - start
+    def incremental(customer):
+        board.update(customer.account_id, total_cents(customer))
+        return [customers[i] for i in board.top(3)]
+    board_time = run(customers, args.updates, incremental)
+
+    print(f"{args.customers:,} customers, {args.updates} update+top-3 rounds")
+    print(f"full sort    {sort_time / args.updates * 1e3:10.3f} ms/round")
+    print(f"leaderboard  {board_time / args.updates * 1e3:10.3f} ms/round "
+          f"(one-off build {build_time:.2f} s, {sort_time / board_time:.0f}x faster per round)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+from benchmarks.bench_bank import generate_ledger
+from customer import binary_ledger
+from customer.bank_app import TransactionLogger
+from customer.binary_ledger import BinaryTransactionLogger, import_csv
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV vs binary ledger: per-account lookups and full scans.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "transactions.csv")
+        bin_file = os.path.join(tmp, "transactions.bin")
+        generate_ledger(csv_file, args.rows, args.customers)
+        start = time.perf_counter()
+        import_csv(csv_file, bin_file)
+        print(f"{args.rows:,} rows: csv {os.path.getsize(csv_file) / 2**20:.1f} MB, "
+              f"binary {os.path.getsize(bin_file) / 2**20:.1f} MB (import {time.perf_counter() - start:.1f} s)")
+
+        accounts = [str(10001 + random.Random(i).randrange(args.customers)) for i in range(args.lookups)]
+        ledgers = {"csv": TransactionLogger(csv_file), "binary": BinaryTransactionLogger(bin_file)}
+
+        def lookups(ledger):
+            return lambda: sum(len(ledger.get_transactions_for_customer(a)) for a in accounts)
+        def scan(ledger, start=None):
+            return lambda: sum(1 for row in ledger.iter_transactions(start) if row["type"] == "transfer")
+        last_month = datetime.now() - timedelta(days=30)
+
+        def measure(ledger):
+            return [timed(lookups(ledger), args.repeat), timed(scan(ledger, last_month), args.repeat),
+                    timed(scan(ledger), 1)]
+
+        rows = [(name, measure(ledger)) for name, ledger in ledgers.items()]
+        if binary_ledger.np is not None:
+            with mock.patch.object(binary_ledger, "np", None):
+                rows.append(("binary, no numpy", measure(ledgers["binary"])))
+
+        base = [seconds for seconds, _ in rows[0][1]]
+        print(f"{'format':<18}{'lookup ms/account':>18}{'last month s':>18}{'full scan s':>18}")
+        for name, results in rows:
+            cells = []
+            for (seconds, matches), (_, expected), baseline, scale in zip(
+                    results, rows[0][1], base, (1e3 / args.lookups, 1, 1)):
+                assert matches == expected
+                cells.append(f"{seconds * scale:>10.2f} ({baseline / seconds:>4.1f}x)")
+            print(f"{name:<18}" + "".join(cells))
+
+if __name__ == "__main__":
+    main()
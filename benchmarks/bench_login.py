@@ -0,0 +1,63 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.passwords import LoginCache, PasswordHasher
+from customer.storage import CUSTOMER_FIELDNAMES
+
+SETTINGS = [("scrypt", {"n": 2**12}), ("scrypt", {"n": 2**14}), ("scrypt", {"n": 2**15}),
+            ("pbkdf2_sha256", {"iterations": 100_000}), ("pbkdf2_sha256", {"iterations": 600_000})]
+
+def write_customers(filename, count):
+    # Plaintext passwords on purpose (unlike bench_bank.generate_customers), so
+    # loading runs the migration with the hasher being measured
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CUSTOMER_FIELDNAMES)
+        for i in range(count):
+            writer.writerow([str(10001 + i), f"First{i}", f"Last{i}", f"P@ssw0rd{i}", "100.00", "0.00", 0, True])
+
+def logins_per_sec(bank, ids, seconds):
+    # write_customers gives customer i the password P@ssw0rd<i>
+    for i, account_id in enumerate(ids): # the first login of each always runs the KDF
+        bank.log_in(account_id, f"P@ssw0rd{i}")
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        i = count % len(ids)
+        if not bank.log_in(ids[i], f"P@ssw0rd{i}"):
+            raise AssertionError("login failed")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logins per second at several password work factors.")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=2.0, help="per measurement")
+    args = parser.parse_args(argv)
+    ids = [str(10001 + i) for i in range(args.customers)]
+
+    print(f"{'setting':<34}{'hash ms':>9}{'cold logins/s':>15}{'cached logins/s':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scheme, params in SETTINGS:
+            bank_file = os.path.join(tmp, "bank.csv")
+            write_customers(bank_file, args.customers)
+            hasher = PasswordHasher(scheme, **params)
+            start = time.perf_counter()
+            # loading hashes every plaintext password once
+            cold = Bank(bank_file, TransactionLogger(os.path.join(tmp, "transactions.csv")),
+                        password_hasher=hasher, login_cache=LoginCache(ttl=0))
+            hash_ms = (time.perf_counter() - start) / args.customers * 1e3
+            cached = Bank(bank_file, TransactionLogger(os.path.join(tmp, "transactions.csv")),
+                          password_hasher=hasher)
+            label = f"{scheme} " + " ".join(f"{k}={v:,}" for k, v in params.items())
+            print(f"{label:<34}{hash_ms:>9.1f}{logins_per_sec(cold, ids, args.seconds):>15,.1f}"
+                  f"{logins_per_sec(cached, ids, args.seconds):>17,.0f}")
+            bank_app._LEDGER_STATES.clear()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from customer.bank_app import Bank, TransactionLogger
+from customer.columnar import CustomerTable
+from customer.lazy import LazyCustomers
+from customer.passwords import PasswordHasher
+from customer.storage import CUSTOMER_FIELDNAMES
+
+class _DictAccount:
+    # Account/Customer as they were before __slots__, for the baseline
+    def __init__(self, account_type, balance_cents):
+        self.account_type = account_type
+        self.balance_cents = balance_cents
+        self.currency = "SAR"
+
+class _DictChecking(_DictAccount):
+    def __init__(self, balance_cents):
+        super().__init__("checking", balance_cents)
+        self.overdraft_limit = -100
+        self.overdraft_count = 0
+        self.is_active = True
+
+class _DictCustomer:
+    def __init__(self, row):
+        self.account_id = row["account_id"]
+        self.first_name = row["first_name"]
+        self.last_name = row["last_name"]
+        self.password = row["password"]
+        self.checking = _DictChecking(int(row["balance_checking"].replace(".", "")))
+        self.savings = _DictAccount("savings", int(row["balance_savings"].replace(".", "")))
+
+def write_customers(filename, count):
+    # Already hashed (cheaply, and once), so loading never runs the password migration
+    password = PasswordHasher(n=2).hash("P@ssw0rd!")
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CUSTOMER_FIELDNAMES)
+        for i in range(count):
+            writer.writerow([str(10001 + i), f"First{i}", f"Last{i}", password,
+                             f"{i % 100000}.{i % 100:02d}", f"{(i * 7) % 100000}.00", 0, True])
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    keep = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return current, peak, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory used by Bank.customers after loading N customers.")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_file = os.path.join(tmp, "bank.csv")
+        ledger = os.path.join(tmp, "transactions.csv")
+        write_customers(bank_file, args.customers)
+
+        def load_dicts():
+            with open(bank_file, newline="") as f:
+                return {row["account_id"]: _DictCustomer(row) for row in csv.DictReader(f)}
+
+        modes = [
+            ("objects, no __slots__", load_dicts),
+            ("objects, __slots__", lambda: Bank(bank_file, TransactionLogger(ledger)).customers),
+            ("columnar table", lambda: Bank(bank_file, TransactionLogger(ledger), customers=CustomerTable()).customers),
+            ("lazy, offsets only", lambda: Bank(bank_file, TransactionLogger(ledger), customers=LazyCustomers()).customers),
+        ]
+        print(f"{args.customers:,} customers")
+        print(f"{'mode':<24}{'resident MB':>12}{'bytes/cust':>12}{'peak MB':>10}{'load s':>9}")
+        for name, load in modes:
+            current, peak, elapsed = measure(load)
+            print(f"{name:<24}{current / 2**20:>12.1f}{current / args.customers:>12.0f}"
+                  f"{peak / 2**20:>10.1f}{elapsed:>9.2f}")
+
+if __name__ == "__main__":
+    main()
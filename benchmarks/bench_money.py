@@ -0,0 +1,102 @@
+import argparse
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from customer.bank_app import Bank, CheckingAccount, Customer, TransactionLogger
+from customer.money import format_cents, format_money
+
+class FloatCheckingAccount:
+    # The float-based checking account as it was before integer minor units,
+    # kept here only as the baseline.
+    OVERDRAFT_FEE = 35
+
+    def __init__(self, balance=0, overdraft_limit=-100):
+        self.balance = float(balance)
+        self.overdraft_limit = overdraft_limit
+        self.overdraft_count = 0
+        self.is_active = True
+
+    def deposit(self, amount):
+        if amount <= 0:
+            raise ValueError("Deposit amount must be positive.")
+        self.balance += amount
+        return self.balance
+
+    def withdraw(self, amount):
+        if not self.is_active:
+            raise ValueError("Account is deactivated due to multiple overdrafts.")
+        if amount <= 0:
+            raise ValueError("Withdrawal must be positive.")
+        projected_balance = self.balance - amount
+        fee = 0
+        if projected_balance < 0:
+            if (projected_balance - self.OVERDRAFT_FEE) < self.overdraft_limit:
+                raise ValueError("Withdrawal would exceed overdraft limit.")
+            self.balance = projected_balance - self.OVERDRAFT_FEE
+            fee = self.OVERDRAFT_FEE
+            self.overdraft_count += 1
+            if self.overdraft_count >= 2:
+                self.is_active = False
+        else:
+            self.balance = projected_balance
+        return self.balance, fee
+
+def run(account, amounts, cents=False):
+    deposit = account.deposit_cents if cents else account.deposit
+    withdraw = account.withdraw_cents if cents else account.withdraw
+    start = time.perf_counter()
+    for amount in amounts:
+        deposit(amount)
+        withdraw(amount)
+    elapsed = time.perf_counter() - start
+    return 2 * len(amounts) / elapsed, account.balance
+
+def ledger_text(tx):
+    # The money columns as TransactionLogger writes them
+    money = format_cents if tx.get("cents") else format_money
+    return [money(tx.get(name) or 0) for name in ("amount", "fee", "resulting_balance")]
+
+def run_bank(bank, amounts):
+    # What Bank.deposit_money/withdraw_money do to the balance and the ledger
+    # row they write, without the locking and file I/O around it
+    customer = Customer("10001", "Bench", "Mark", "", 1000)
+    start = time.perf_counter()
+    for amount in amounts:
+        ledger_text(bank._deposit(customer, "checking", amount)[1])
+        ledger_text(bank._withdraw(customer, "checking", amount)[1])
+    elapsed = time.perf_counter() - start
+    return 2 * len(amounts) / elapsed, customer.checking.balance
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deposit/withdraw throughput: float vs integer minor units.")
+    parser.add_argument("--ops", type=int, default=200_000, help="deposit+withdraw pairs per case")
+    args = parser.parse_args(argv)
+
+    # deposit()/withdraw() take any amount and return Decimal balances;
+    # deposit_cents()/withdraw_cents() are the int-only hot path Bank can use.
+    cases = [
+        ("int", [7] * args.ops, False),
+        ("float", [0.1] * args.ops, False),
+        ("Decimal", [Decimal("0.10")] * args.ops, False),
+        ("int cents (hot)", [10] * args.ops, True),
+    ]
+    print(f"{'amounts':<18}{'float ops/s':>14}{'exact ops/s':>14}{'ratio':>8}  final balances")
+    for name, amounts, cents in cases:
+        baseline = [a / 100 for a in amounts] if cents else [float(a) for a in amounts]
+        float_rate, float_balance = run(FloatCheckingAccount(1000), baseline)
+        exact_rate, exact_balance = run(CheckingAccount(1000), amounts, cents)
+        print(f"{name:<18}{float_rate:>14,.0f}{exact_rate:>14,.0f}{exact_rate / float_rate:>8.2f}"
+              f"  {float_balance!r} vs {exact_balance}")
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = Bank(os.path.join(tmp, "bank.csv"), TransactionLogger(os.path.join(tmp, "transactions.csv")))
+        for name, amounts, _ in cases[:3]:
+            float_rate, _ = run(FloatCheckingAccount(1000), [float(a) for a in amounts])
+            bank_rate, balance = run_bank(bank, amounts)
+            print(f"{'Bank, ' + name:<18}{float_rate:>14,.0f}{bank_rate:>14,.0f}{bank_rate / float_rate:>8.2f}"
+                  f"  {balance}")
+        bank.close()
+
+if __name__ == "__main__":
+    main()
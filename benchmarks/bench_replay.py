@@ -0,0 +1,82 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from customer.bank_app import TransactionLogger
+from customer.money import format_cents
+from customer.replay import LedgerReplay
+
+def generate_history(filename, rows, customers, seed=3):
+    # A ledger the account rules accept: "open" rows for every customer, then
+    # deposits, withdrawals and transfers that never overdraw
+    rng = random.Random(seed)
+    balances = {}
+    moment = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / max(rows, 1)
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TransactionLogger.FIELDNAMES)
+        for tx_id in range(1, rows + 1):
+            moment += step
+            if tx_id <= customers:
+                a, cents = str(10000 + tx_id), rng.randrange(10_000, 1_000_000)
+                balances[(a, "checking")] = cents
+                row = ["open", "", "", a, "checking", cents, cents]
+            else:
+                a = (str(10001 + rng.randrange(customers)), "checking")
+                cents = rng.randrange(100, 50_000)
+                kind = rng.choice(("deposit", "withdraw", "transfer"))
+                if kind == "deposit" or balances[a] < cents:
+                    balances[a] += cents
+                    row = ["deposit", "", "", *a, cents, balances[a]]
+                elif kind == "withdraw":
+                    balances[a] -= cents
+                    row = ["withdraw", *a, "", "", cents, balances[a]]
+                else:
+                    b = (str(10001 + rng.randrange(customers)), "checking")
+                    balances[a] -= cents
+                    balances[b] += cents
+                    row = ["transfer", *a, *b, cents, balances[a]]
+            kind, *ends, cents, balance = row
+            writer.writerow([tx_id, moment.isoformat(), kind, *ends, format_cents(cents), "0.00",
+                             format_cents(balance)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point-in-time balances: replay from tx 1 vs from checkpoints.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--every", type=int, default=10_000, help="rows between checkpoints")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args(argv)
+    rng = random.Random(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = os.path.join(tmp, "transactions.csv")
+        generate_history(ledger, args.rows, args.customers)
+        logger = TransactionLogger(ledger)
+        targets = [rng.randrange(1, args.rows + 1) for _ in range(args.queries)]
+        print(f"{args.rows:,} rows, {args.customers:,} customers, {args.queries} random state_at(tx_id) queries")
+
+        start = time.perf_counter()
+        state = LedgerReplay(logger, every=0).state_at()
+        seconds = time.perf_counter() - start
+        print(f"full replay: {seconds:.2f} s ({args.rows / seconds:,.0f} rows/s), {state.anomaly_count} anomalies")
+
+        engine = LedgerReplay(logger, every=args.every)
+        start = time.perf_counter()
+        engine.checkpoint()
+        size = sum(os.path.getsize(path) for _, _, path in engine.checkpoints())
+        print(f"build checkpoints every {args.every:,} rows: {time.perf_counter() - start:.2f} s, "
+              f"{len(engine.checkpoints())} files, {size / 2**20:.0f} MB")
+
+        for name, replay in (("from tx 1", LedgerReplay(logger, every=0)), ("from checkpoints", engine)):
+            start = time.perf_counter()
+            for tx_id in targets:
+                replay.state_at(tx_id, save=False)
+            print(f"state_at {name}: {(time.perf_counter() - start) / len(targets) * 1000:,.1f} ms per query")
+
+if __name__ == "__main__":
+    main()
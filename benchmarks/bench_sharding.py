@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.passwords import PasswordHasher
+from customer.sharding import ShardedBank
+
+def run(bank, ids, ops, threads, transfer_share, seed=5):
+    # ops random deposits and transfers spread over client threads; returns ops/sec
+    def client(n, rng):
+        for _ in range(n):
+            a = rng.choice(ids)
+            if rng.random() < transfer_share:
+                bank.transfer_money(a, "savings", rng.choice(ids), "checking", 1)
+            else:
+                bank.deposit_money(a, "savings", 1)
+    workers = [threading.Thread(target=client, args=(ops // threads, random.Random(seed + i)))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return ops // threads * threads / (time.perf_counter() - start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single Bank vs ShardedBank throughput.")
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--transfers", type=float, default=0.3, help="share of ops that are transfers")
+    parser.add_argument("--no-journal", dest="journal", action="store_false")
+    args = parser.parse_args(argv)
+    hasher = PasswordHasher(n=2) # setup speed only; no logins are timed
+    entries = [{"first_name": f"First{i}", "last_name": "Last", "password": "P@ssw0rd!",
+                "initial_savings": 1_000_000} for i in range(args.customers)]
+    print(f"{args.customers:,} customers, {args.ops:,} ops ({args.transfers:.0%} transfers) "
+          f"from {args.threads} threads, journal={args.journal}, {os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = Bank(os.path.join(tmp, "bank.csv"), TransactionLogger(os.path.join(tmp, "transactions.csv")),
+                    journal=args.journal, password_hasher=hasher)
+        ids = bank.bulk_add_customers(entries)
+        baseline = run(bank, ids, args.ops, args.threads, args.transfers)
+        bank.close()
+        print(f"{'Bank':<22}{baseline:>10,.0f} ops/s")
+        for shards in map(int, args.shards.split(",")):
+            bank_app._LEDGER_STATES.clear()
+            bank = ShardedBank(os.path.join(tmp, f"sharded{shards}"), shards, journal=args.journal,
+                               password_hasher=hasher)
+            ids = bank.bulk_add_customers(entries)
+            rate = run(bank, ids, args.ops, args.threads, args.transfers)
+            bank.close()
+            print(f"{f'ShardedBank, {shards} shards':<22}{rate:>10,.0f} ops/s{rate / baseline:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.passwords import PasswordHasher
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+def timed(cmd, cwd, runs, stdin=None):
+    # Median wall time of a fresh process, in ms
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, input=stdin, stdout=subprocess.DEVNULL, check=True, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start of main.py subcommands.")
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--batch", type=int, default=200, help="commands in the stdin batch")
+    parser.add_argument("--budget-ms", type=float, default=150, help="fail if a journaled deposit takes longer")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = Bank(os.path.join(tmp, "bank.csv"), TransactionLogger(os.path.join(tmp, "transactions.csv")),
+                    password_hasher=PasswordHasher(n=2))
+        bank.bulk_add_customers({"first_name": f"First{i}", "last_name": "Last", "password": "P@ssw0rd!",
+                                 "initial_checking": 100} for i in range(args.customers))
+        bank.close()
+        bank_app._LEDGER_STATES.clear()
+        py = sys.executable
+        print(f"{args.customers:,} customers, median of {args.runs} runs")
+        results = [
+            ("python -c pass", timed([py, "-c", "pass"], tmp, args.runs)),
+            ("import main", timed([py, "-c", f"import sys; sys.path.insert(0, {os.path.dirname(MAIN)!r}); import main"],
+                                  tmp, args.runs)),
+            ("eager Bank() + colorama", timed([py, "-c", "import sys; sys.path.insert(0, "
+                                               f"{os.path.dirname(MAIN)!r}); import colorama; "
+                                               "from customer.bank_app import Bank; Bank().close()"],
+                                              tmp, args.runs)),
+            ("main.py deposit", timed([py, MAIN, "--journal", "deposit", "10001", "checking", "1"],
+                                      tmp, args.runs)),
+            ("  without the journal", timed([py, MAIN, "deposit", "10001", "checking", "1"], tmp, args.runs)),
+            ("main.py top", timed([py, MAIN, "top"], tmp, max(args.runs // 5, 1))),
+        ]
+        for name, ms in results:
+            print(f"{name:<26}{ms:>9.1f} ms")
+        lines = "".join(f"deposit {10001 + i % args.customers} checking 1\n" for i in range(args.batch))
+        ms = timed([py, MAIN, "--journal", "batch"], tmp, 3, stdin=lines)
+        print(f"{'main.py batch':<26}{ms:>9.1f} ms for {args.batch} commands ({ms / args.batch:.2f} ms each)")
+    deposit = dict(results)["main.py deposit"]
+    print(f"deposit cold start {deposit:.1f} ms, budget {args.budget_ms:.0f} ms: "
+          f"{'ok' if deposit <= args.budget_ms else 'OVER BUDGET'}")
+    return 0 if deposit <= args.budget_ms else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,381 @@
+import argparse
+import csv
+import math
+import mmap
+import os
+import sys
+from itertools import islice
+from operator import itemgetter
+
+from customer.bank_app import TransactionLogger
+from customer.binary_ledger import (ACCOUNT_TYPES, CHUNK_RECORDS, HEADER, NO_ACCOUNT, RECORD, TX_TYPES,
+                                    BinaryTransactionLogger, _check_header)
+from customer.ledger_index import to_micros
+from customer.money import format_cents
+
+try:
+    import numpy as np
+except ImportError: # optional; only this module needs it
+    np = None
+
+if np is not None:
+    from customer.binary_ledger import RECORD_DTYPE
+
+# Columns a frame can hold. Money is int64 cents, timestamps int64 µs since
+# 1970, account ids int codes into LedgerFrame.accounts (-1 for none) and
+# types int codes into TX_TYPES / ACCOUNT_TYPES, as in the binary ledger.
+COLUMNS = ("tx_id", "micros", "type", "from_account", "from_account_type", "to_account", "to_account_type",
+           "amount", "fee", "resulting_balance")
+MONEY_COLUMNS = ("amount", "fee", "resulting_balance")
+PERIODS = {"hour": "h", "day": "D", "month": "M", "year": "Y"} # datetime64 units
+GROUP_KEYS = ("account", "from_account", "to_account", "type") + tuple(PERIODS)
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+_TX_CODES = {name: code for code, name in enumerate(TX_TYPES)}
+_ACCOUNT_TYPE_CODES = {name: code for code, name in enumerate(ACCOUNT_TYPES)}
+_CSV_COLUMNS = {"tx_id": "tx_id", "micros": "timestamp", "type": "type", "from_account": "from_account_id",
+                "from_account_type": "from_account_type", "to_account": "to_account_id",
+                "to_account_type": "to_account_type", "amount": "amount", "fee": "fee",
+                "resulting_balance": "resulting_balance"}
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("customer.analytics needs NumPy (pip install numpy)")
+
+class _Accounts:
+    # account id <-> small int code, shared by every chunk of one read
+    def __init__(self):
+        self.codes = {"": NO_ACCOUNT}
+        self.ids = []
+
+    def _add(self, value):
+        code = self.codes[value] = len(self.ids)
+        self.ids.append(value)
+        return code
+
+    def encode(self, values):
+        # list of id strings -> array of codes
+        codes = self.codes
+        return np.fromiter((codes[v] if v in codes else self._add(v) for v in values),
+                           dtype=np.int64, count=len(values))
+
+    def encode_ints(self, values):
+        # array of integer ids (binary ledger) -> codes, one lookup per distinct id
+        unique, inverse = np.unique(values, return_inverse=True)
+        lookup = self.encode([str(v) if v != NO_ACCOUNT else "" for v in unique.tolist()])
+        return lookup[inverse.ravel()]
+
+class LedgerFrame:
+    # One block of ledger rows as parallel NumPy arrays (see COLUMNS)
+    def __init__(self, columns, accounts):
+        self.columns = columns
+        self.accounts = accounts # code -> account id
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+def _codes(values, codes, what):
+    try:
+        return np.fromiter((codes[value] for value in values), dtype=np.uint8, count=len(values))
+    except KeyError as e:
+        raise ValueError(f"Unknown {what}: {e.args[0]!r}")
+
+def _micros(values):
+    try: # ISO strings parse in C
+        return np.array(values, dtype="datetime64[us]").astype(np.int64)
+    except ValueError: # e.g. a UTC offset; same meaning as everywhere else
+        return np.array([to_micros(value) for value in values], dtype=np.int64)
+
+def _cents(values):
+    # "12.34" -> 1234. Exact for anything below 2**53 cents, far beyond any balance.
+    return np.rint(np.array(values, dtype=np.float64) * 100).astype(np.int64)
+
+def _convert(raw, accounts):
+    # column name -> list of CSV strings, to arrays
+    columns = {}
+    for name, values in raw.items():
+        if name == "micros":
+            columns[name] = _micros(values)
+        elif name in MONEY_COLUMNS:
+            columns[name] = _cents(values)
+        elif name == "tx_id":
+            columns[name] = np.array(values, dtype=np.int64)
+        elif name == "type":
+            columns[name] = _codes(values, _TX_CODES, "transaction type")
+        elif name.endswith("_type"):
+            columns[name] = _codes(values, _ACCOUNT_TYPE_CODES, "account type")
+        else:
+            columns[name] = accounts.encode(values)
+    return columns
+
+def _csv_blocks(filename, names, chunk_rows):
+    if not os.path.exists(filename):
+        return
+    with open(filename, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        pick = itemgetter(*[header.index(_CSV_COLUMNS[name]) for name in names])
+        width = len(header)
+        while True:
+            line_num = reader.line_num
+            # torn or stray lines are skipped like everywhere else
+            block = [pick(values) for values in islice(reader, chunk_rows)
+                     if len(values) >= width and values[0].isdigit()]
+            if reader.line_num == line_num:
+                return
+            if block:
+                columns = zip(*block) if len(names) > 1 else [block] # one name: plain values
+                yield dict(zip(names, columns))
+
+def _row_blocks(rows, names, chunk_rows):
+    block = {name: [] for name in names}
+    count = 0
+    for row in rows:
+        for name in names:
+            block[name].append(row[_CSV_COLUMNS[name]])
+        count += 1
+        if count == chunk_rows:
+            yield block
+            block = {name: [] for name in names}
+            count = 0
+    if count:
+        yield block
+
+def _binary_frames(filename, names, chunk_rows, accounts):
+    fields = {"from_account": "from_id", "from_account_type": "from_type", "to_account": "to_id",
+              "to_account_type": "to_type"} # the rest share RECORD_DTYPE's names
+    with open(filename, "rb") as f:
+        _check_header(f)
+        count = (os.fstat(f.fileno()).st_size - HEADER.size) // RECORD.size
+        if not count:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for first in range(0, count, chunk_rows):
+                n = min(chunk_rows, count - first)
+                view = np.frombuffer(mm, dtype=RECORD_DTYPE, count=n, offset=HEADER.size + first * RECORD.size)
+                columns = {}
+                for name in names:
+                    column = view[fields.get(name, name)].copy()
+                    if name in ("from_account", "to_account"):
+                        column = accounts.encode_ints(column)
+                    columns[name] = column
+                del view # the map can't close while a view is alive
+                yield columns
+
+def iter_frames(ledger, columns=COLUMNS, start=None, end=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Stream the ledger as LedgerFrames of at most chunk_rows rows holding just
+    # the named columns, optionally limited to start <= timestamp < end. Memory
+    # stays around one chunk whatever the ledger size. Plain and binary ledgers
+    # are read straight from their file; anything else (segmented, SQLite)
+    # through its iter_transactions.
+    _require_numpy()
+    names = list(columns)
+    unknown = set(names) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    filtered = start is not None or end is not None
+    read = names + ["micros"] if filtered and "micros" not in names else names
+    accounts = _Accounts()
+    if isinstance(ledger, BinaryTransactionLogger):
+        blocks = _binary_frames(ledger.filename, read, chunk_rows or CHUNK_RECORDS, accounts)
+    else:
+        if type(ledger).iter_transactions is TransactionLogger.iter_transactions:
+            raw = _csv_blocks(ledger.filename, read, chunk_rows)
+        else:
+            raw = _row_blocks(ledger.iter_transactions(start, end), read, chunk_rows)
+        blocks = (_convert(block, accounts) for block in raw)
+    lo = to_micros(start) if start is not None else None
+    hi = to_micros(end) if end is not None else None
+    for block in blocks:
+        if filtered:
+            mask = np.ones(len(block["micros"]), dtype=bool)
+            if lo is not None:
+                mask &= block["micros"] >= lo
+            if hi is not None:
+                mask &= block["micros"] < hi
+            if not mask.all():
+                block = {name: values[mask] for name, values in block.items()}
+            if not len(block["micros"]):
+                continue
+        yield LedgerFrame({name: block[name] for name in names}, accounts.ids)
+
+def load_frame(ledger, columns=COLUMNS, start=None, end=None):
+    # The whole selection as a single LedgerFrame
+    _require_numpy()
+    frames = list(iter_frames(ledger, columns, start, end, chunk_rows=None))
+    if not frames:
+        return LedgerFrame({name: np.empty(0, dtype=np.int64) for name in columns}, [])
+    if len(frames) == 1:
+        return frames[0]
+    return LedgerFrame({name: np.concatenate([f[name] for f in frames]) for name in columns}, frames[0].accounts)
+
+def _reduce(keys, sums, counts, mins, maxs):
+    # Group rows with equal keys (an n x k int64 array) and combine their
+    # partial sums/counts/mins/maxs. Groups come back in key order.
+    if not len(keys):
+        return keys, sums, counts, mins, maxs
+    # Pack each row's keys into one int64 so a single 1-d sort finds the groups
+    low, high = keys.min(axis=0), keys.max(axis=0)
+    spans = (high - low + 1).tolist()
+    if math.prod(spans) < 2**62:
+        packed = np.zeros(len(keys), dtype=np.int64)
+        for column, span in enumerate(spans):
+            packed *= span
+            packed += keys[:, column] - low[column]
+        order = np.argsort(packed, kind="stable")
+        ordered = packed[order]
+        changed = ordered[1:] != ordered[:-1]
+    else: # too many combinations to pack
+        order = np.lexsort(keys.T[::-1])
+        ordered = keys[order]
+        changed = (ordered[1:] != ordered[:-1]).any(axis=1)
+    starts = np.flatnonzero(np.r_[True, changed])
+    return (keys[order[starts]], np.add.reduceat(sums[order], starts), np.add.reduceat(counts[order], starts),
+            np.minimum.reduceat(mins[order], starts), np.maximum.reduceat(maxs[order], starts))
+
+def _group_columns(frame, by, value, types):
+    # Key columns and the value for each row of one frame. With "account" a
+    # row counts once for every account on it, so a transfer shows up for both.
+    columns = frame.columns
+    mask = None
+    if types is not None:
+        mask = np.isin(columns["type"], [_TX_CODES[t] for t in types])
+    def pick(values):
+        return values if mask is None else values[mask]
+    keys = []
+    for name in by:
+        if name in PERIODS:
+            micros = pick(columns["micros"])
+            keys.append(micros.astype("datetime64[us]").astype(f"datetime64[{PERIODS[name]}]").astype(np.int64))
+        elif name == "account":
+            keys.append(None) # filled in below
+        else:
+            keys.append(pick(columns[name]).astype(np.int64))
+    values = pick(columns[value])
+    if "account" in by:
+        from_id, to_id = pick(columns["from_account"]), pick(columns["to_account"])
+        sides = [from_id != NO_ACCOUNT, (to_id != NO_ACCOUNT) & (to_id != from_id)]
+        slot = by.index("account")
+        expanded = []
+        for i, key in enumerate(keys):
+            if i == slot:
+                expanded.append(np.concatenate([from_id[sides[0]], to_id[sides[1]]]))
+            else:
+                expanded.append(np.concatenate([key[sides[0]], key[sides[1]]]))
+        keys = expanded
+        values = np.concatenate([values[sides[0]], values[sides[1]]])
+    return np.stack(keys, axis=1) if keys else np.zeros((len(values), 0), dtype=np.int64), values
+
+class Aggregates:
+    # Sum, count, min and max of one money column per group. keys is an n x k
+    # array of codes for the `by` names; rows() turns them back into labels.
+    def __init__(self, by, value, keys, sums, counts, mins, maxs, accounts):
+        self.by = by
+        self.value = value
+        self.keys = keys
+        self.sum = sums
+        self.count = counts
+        self.min = mins
+        self.max = maxs
+        self.accounts = accounts
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _label(self, name, code):
+        if name in PERIODS:
+            return str(np.datetime64(int(code), PERIODS[name]))
+        if name == "type":
+            return TX_TYPES[code]
+        if name.endswith("_type"):
+            return ACCOUNT_TYPES[code]
+        return self.accounts[code] if code != NO_ACCOUNT else ""
+
+    def rows(self):
+        # One dict per group; money as "12.34" strings like the ledger itself
+        for i in range(len(self.keys)):
+            row = {name: self._label(name, code) for name, code in zip(self.by, self.keys[i].tolist())}
+            row["count"] = int(self.count[i])
+            row["sum"] = format_cents(int(self.sum[i]))
+            row["min"] = format_cents(int(self.min[i]))
+            row["max"] = format_cents(int(self.max[i]))
+            yield row
+
+    def __iter__(self):
+        return self.rows()
+
+def aggregate(ledger, by=("account",), value="amount", types=None, start=None, end=None,
+              chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Sum/count/min/max of `value` (amount, fee or resulting_balance) grouped
+    # by any of GROUP_KEYS, e.g. by=("account", "type", "month"). types limits
+    # the rows to some transaction types. Each chunk is reduced on its own and
+    # merged into the running result, so chunk_rows bounds the memory used;
+    # chunk_rows=None reads everything in one go.
+    _require_numpy()
+    by = tuple(by)
+    unknown = set(by) - set(GROUP_KEYS)
+    if not by:
+        raise ValueError("Group by at least one key")
+    if unknown:
+        raise ValueError(f"Unknown group keys: {', '.join(sorted(unknown))}")
+    if value not in MONEY_COLUMNS:
+        raise ValueError(f"Can only aggregate {', '.join(MONEY_COLUMNS)}, not {value!r}")
+    if types is not None:
+        types = tuple(types)
+        unknown = set(types) - set(_TX_CODES)
+        if unknown:
+            raise ValueError(f"Unknown transaction types: {', '.join(sorted(unknown))}")
+    needed = {value}
+    for name in by:
+        needed.update(("micros",) if name in PERIODS else
+                      ("from_account", "to_account") if name == "account" else (name,))
+    if types is not None:
+        needed.add("type")
+    columns = [name for name in COLUMNS if name in needed]
+    empty = np.empty(0, dtype=np.int64)
+    total = (np.zeros((0, len(by)), dtype=np.int64), empty, empty, empty, empty)
+    accounts = []
+    for frame in iter_frames(ledger, columns, start, end, chunk_rows):
+        accounts = frame.accounts
+        keys, values = _group_columns(frame, by, value, types)
+        part = _reduce(keys, values, np.ones(len(values), dtype=np.int64), values, values)
+        total = _reduce(*(np.concatenate([a, b]) for a, b in zip(total, part)))
+    return Aggregates(by, value, *total, accounts)
+
+def fee_totals(ledger, period="month", start=None, end=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Overdraft fees collected per period: {"2025-03": "70.00", ...}
+    result = aggregate(ledger, (period,), "fee", start=start, end=end, chunk_rows=chunk_rows)
+    return {row[period]: row["sum"] for row in result.rows() if row["sum"] != "0.00"}
+
+def daily_volume(ledger, types=("transfer",), start=None, end=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Amount moved per account per day
+    return aggregate(ledger, ("account", "day"), "amount", types, start, end, chunk_rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Group-by aggregates over a transactions ledger.")
+    parser.add_argument("ledger", nargs="?", default="transactions.csv", help=".csv or binary .bin ledger")
+    parser.add_argument("--by", default="account,type", help=f"comma separated, from {', '.join(GROUP_KEYS)}")
+    parser.add_argument("--value", default="amount", choices=MONEY_COLUMNS)
+    parser.add_argument("--types", help="comma separated transaction types to include")
+    parser.add_argument("--start", help="ISO date or timestamp, inclusive")
+    parser.add_argument("--end", help="ISO date or timestamp, exclusive")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    if args.ledger.endswith(".bin"):
+        ledger = BinaryTransactionLogger(args.ledger)
+    else:
+        ledger = TransactionLogger(args.ledger)
+    by = [name.strip() for name in args.by.split(",") if name.strip()]
+    types = args.types.split(",") if args.types else None
+    result = aggregate(ledger, by, args.value, types, args.start, args.end, args.chunk_rows)
+    writer = csv.DictWriter(sys.stdout, fieldnames=by + ["count", "sum", "min", "max"])
+    writer.writeheader()
+    writer.writerows(result.rows())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from customer.bank_app import Bank
+
+class AsyncBank:
+    # Coroutine front end for a Bank. Deposits, withdrawals and transfers are
+    # queued and committed in groups: every op that arrives within commit_window
+    # seconds (up to max_batch of them) goes through Bank.apply_batch together,
+    # so the group shares one ledger append and one customer save. Each op is
+    # still checked on its own with the usual rules and raises the same
+    # ValueError the synchronous method would; its coroutine returns once the
+    # group is on disk. Everything that touches files runs on a bounded pool of
+    # max_workers threads, never on the event loop.
+    #
+    #     bank = await AsyncBank.open("bank.csv", journal=True)
+    #     await bank.deposit_money("10001", "checking", 100)
+    #     await bank.aclose()
+
+    def __init__(self, bank, max_workers=4, commit_window=0.002, max_batch=1000, executor=None):
+        # executor: a pool to take over (see open); max_workers is ignored then
+        self.bank = bank
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-bank")
+        self._pending = [] # (op, future) waiting for the next group
+        self._full = asyncio.Event()
+        self._committer = None
+
+    @classmethod
+    async def open(cls, *args, max_workers=4, commit_window=0.002, max_batch=1000, **kwargs):
+        # Build the Bank (which loads customers) off the event loop, on the
+        # same bounded pool it will use afterwards
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-bank")
+        try:
+            bank = await asyncio.get_running_loop().run_in_executor(executor, functools.partial(Bank, *args, **kwargs))
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(bank, max_workers, commit_window, max_batch, executor=executor)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _submit(self, op):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((op, future))
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        if self._committer is None or self._committer.done():
+            self._committer = loop.create_task(self._commit_loop())
+        return await future
+
+    async def _commit_loop(self):
+        while self._pending:
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.commit_window)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            group = [(op, f) for op, f in self._pending[:self.max_batch] if not f.cancelled()]
+            del self._pending[:self.max_batch]
+            if group:
+                await self._commit(group)
+
+    async def _commit(self, group):
+        outcomes = [None] * len(group)
+        def on_result(index, value, error):
+            outcomes[index] = (value, error)
+        try:
+            await self._run(self.bank.apply_batch, [op for op, _ in group], False, on_result)
+        except Exception as e: # nothing in the group was kept
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), (value, error) in zip(group, outcomes):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(ValueError(error))
+
+    async def deposit_money(self, account_id, account_type, amount):
+        return await self._submit({"op": "deposit", "account_id": account_id,
+                                   "account_type": account_type, "amount": amount})
+
+    async def withdraw_money(self, account_id, account_type, amount):
+        return await self._submit({"op": "withdraw", "account_id": account_id,
+                                   "account_type": account_type, "amount": amount})
+
+    async def transfer_money(self, from_id, from_type, to_id, to_type, amount):
+        return await self._submit({"op": "transfer", "account_id": from_id, "account_type": from_type,
+                                   "to_account_id": to_id, "to_account_type": to_type, "amount": amount})
+
+    async def reactivate_account(self, account_id, account_type):
+        await self.flush() # after any queued op on the account
+        return await self._run(self.bank.reactivate_account, account_id, account_type)
+
+    async def add_new_customer(self, first_name, last_name, password, initial_checking=0, initial_savings=0):
+        return await self._run(self.bank.add_new_customer, first_name, last_name, password,
+                               initial_checking, initial_savings)
+
+    async def generate_statement(self, account_id, start=None, end=None):
+        await self.flush()
+        return await self._run(self.bank.generate_statement, account_id, start, end)
+
+    async def flush(self):
+        # Wait until every op queued so far is committed
+        while self._committer is not None and not self._committer.done():
+            await asyncio.shield(self._committer)
+
+    async def aclose(self):
+        await self.flush()
+        await self._run(self.bank.close)
+        self._executor.shutdown(wait=True)
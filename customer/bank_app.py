@@ -1,29 +1,58 @@
 import csv
 import os
 import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+from customer.batch import BatchResult, parse_amount
+from customer.leaderboard import Leaderboard, check_k
+from customer.ledger_index import LedgerIndex, to_micros
+from customer import statements
+from customer.money import format_cents, format_money, from_cents, round_cents, to_cents
+from customer import ids, passwords
+from customer.storage import CUSTOMER_FIELDNAMES, CsvStorage
+
 class Account:
+    __slots__ = ("account_type", "balance_cents", "currency")
+
     def __init__(self, account_type, balance = 0, currency="SAR"):
         self.account_type = account_type
-        self.balance = float(balance)
+        self.balance_cents = to_cents(balance) # exact integer minor units
         self.currency = currency
 
-    def deposit(self, amount):
-        if amount <= 0:
+    @property
+    def balance(self):
+        return from_cents(self.balance_cents)
+
+    @balance.setter
+    def balance(self, value):
+        self.balance_cents = to_cents(value)
+
+    # The *_cents methods are the hot path: plain ints in, plain ints out.
+    # deposit()/withdraw() accept any amount and hand back Decimal balances.
+    def deposit_cents(self, cents):
+        if cents <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
-        return self.balance # Return new balance
+        self.balance_cents += cents
+        return self.balance_cents
 
-    def withdraw(self, amount):
-        if amount <= 0:
+    def deposit(self, amount):
+        return from_cents(self.deposit_cents(to_cents(amount))) # Return new balance
+
+    def withdraw_cents(self, cents):
+        if cents <= 0:
             raise ValueError("Withdrawal amount must be positive.")
-        if self.balance < amount:
+        if self.balance_cents < cents:
             raise ValueError("Insufficient funds.")
-        self.balance -= amount
-        return self.balance
+        self.balance_cents -= cents
+        return self.balance_cents
+
+    def withdraw(self, amount):
+        return from_cents(self.withdraw_cents(to_cents(amount)))
 
 class CheckingAccount(Account):
+    __slots__ = ("overdraft_limit", "overdraft_count", "is_active")
     OVERDRAFT_FEE = 35 # Fee if overdraft happens
 
     def __init__(self, balance = 0, overdraft_limit = -100):
@@ -32,40 +61,51 @@ class CheckingAccount(Account):
         self.overdraft_count = 0
         self.is_active = True
 
-    def withdraw(self, amount):
+    def withdraw_cents(self, cents):
         if not self.is_active:
             raise ValueError("Account is deactivated due to multiple overdrafts.")
 
-        if amount <= 0:
+        if cents <= 0:
             raise ValueError("Withdrawal must be positive.")
 
-        projected_balance = self.balance - amount
+        projected_balance = self.balance_cents - cents
         fee = 0
 
         if projected_balance < 0: # Overdraft
-            if (projected_balance - self.OVERDRAFT_FEE) < self.overdraft_limit:
+            fee = to_cents(self.OVERDRAFT_FEE)
+            if (projected_balance - fee) < to_cents(self.overdraft_limit):
                 raise ValueError("Withdrawal would exceed overdraft limit.")
 
-            self.balance = projected_balance - self.OVERDRAFT_FEE
-            fee = self.OVERDRAFT_FEE
+            self.balance_cents = projected_balance - fee
             self.overdraft_count += 1
 
             if self.overdraft_count >= 2: # 2 overdrafts → deactivate
                 self.is_active = False
         else:
-            self.balance = projected_balance
+            self.balance_cents = projected_balance
 
-        return self.balance, fee
+        return self.balance_cents, fee
+
+    def withdraw(self, amount):
+        new_balance, fee = self.withdraw_cents(to_cents(amount))
+        return from_cents(new_balance), from_cents(fee)
 
 class SavingsAccount(Account):
+    __slots__ = ()
+
     def __init__(self, balance=0):
         super().__init__("savings", balance)
 
+    def withdraw_cents(self, cents):
+        return super().withdraw_cents(cents), 0
+
     def withdraw(self, amount):
-        new_balance = super().withdraw(amount)
-        return new_balance, 0
+        new_balance, fee = self.withdraw_cents(to_cents(amount))
+        return from_cents(new_balance), from_cents(fee)
 
 class Customer:
+    __slots__ = ("account_id", "first_name", "last_name", "password", "checking", "savings", "__weakref__")
+
     def __init__(self, account_id, first_name, last_name, password,
                  balance_checking=0, balance_savings=0):
         self.account_id = account_id
@@ -78,143 +118,681 @@ class Customer:
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+# One state per ledger path, shared by every TransactionLogger (and so every Bank)
+# in the process that writes to the same file.
+_LEDGER_STATES = {}
+_LEDGER_STATES_LOCK = threading.Lock()
+
+class _LedgerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_id = None
+        self.signature = None # (inode, size, mtime) after our last write
+        self.needs_newline = False
+        self.index = None
+
+def _ledger_state(filename):
+    key = os.path.abspath(filename)
+    with _LEDGER_STATES_LOCK:
+        state = _LEDGER_STATES.get(key)
+        if state is None:
+            state = _LEDGER_STATES[key] = _LedgerState()
+        return state
+
+def _file_signature(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _read_last_tx_id(filename, chunk_size=4096):
+    # Walk backwards from the end of the ledger until a complete row with a
+    # numeric tx_id is found. Returns (last_id, ends_with_newline).
+    with open(filename, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return 0, True
+        f.seek(end - 1)
+        ends_with_newline = f.read(1) == b"\n"
+
+        pos = end
+        carry = b""
+        skip_partial = not ends_with_newline # a truncated last row never committed
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + carry).split(b"\n")
+            carry = lines.pop(0) if pos > 0 else b"" # may be cut, finish it next round
+            for line in reversed(lines):
+                if skip_partial:
+                    skip_partial = False
+                    continue
+                first = line.split(b",", 1)[0].strip()
+                if first.isdigit():
+                    return int(first), ends_with_newline
+    return 0, ends_with_newline
+
 class TransactionLogger:
     FIELDNAMES = ["tx_id", "timestamp", "type", "from_account_id", "from_account_type",
                   "to_account_id", "to_account_type", "amount", "fee", "resulting_balance"]
 
-    def __init__(self, filename="transactions.csv"):
+    def __init__(self, filename="transactions.csv", index=False):
         self.filename = filename
+        self._state = _ledger_state(filename)
         if not os.path.exists(self.filename):
             with open(self.filename, "w", newline="") as f:
                 writer = csv.DictWriter(f, fieldnames=self.FIELDNAMES)
                 writer.writeheader()
-
-    def _next_tx_id(self): # Generate next transaction ID
-        max_id = 0
-        if os.path.exists(self.filename):
-            with open(self.filename, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        max_id = max(max_id, int(row.get("tx_id", 0)))
-                    except:
-                        continue
-        return max_id + 1
-
-    def log(self, tx_type, from_id=None, from_type=None, to_id=None, to_type=None, amount=0, fee=0, resulting_balance=0):
-        tx = {
-            "tx_id": self._next_tx_id(),
-            "timestamp": datetime.now().isoformat(),
-            "type": tx_type,
-            "from_account_id": from_id or "",
-            "from_account_type": from_type or "",
-            "to_account_id": to_id or "",
-            "to_account_type": to_type or "",
-            "amount": amount,
-            "fee": fee,
-            "resulting_balance": resulting_balance,
-        }
-        with open(self.filename, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=self.FIELDNAMES)
-            writer.writerow(tx)
-
-    def get_transactions_for_customer(self, account_id):
+        # index=True keeps <filename>.idx up to date so statements seek instead of scan
+        self.index = None
+        if index:
+            with self._state.lock:
+                if self._state.index is None:
+                    self._state.index = LedgerIndex(filename)
+                self.index = self._state.index
+
+    metrics = None
+
+    def instrument(self, metrics):
+        # Time the ledger calls (on this logger only) and count rows and bytes
+        if self.metrics is metrics:
+            return
+        self.metrics = metrics
+        for name in ("log", "log_many", "_next_tx_id", "get_transactions_for_customer"):
+            setattr(self, name, metrics.timed(getattr(self, name), "ledger_call_seconds", name, call=name))
+
+    def _next_tx_id(self): # Hand out the next transaction ID (caller holds the ledger lock)
+        state = self._state
+        try:
+            signature = _file_signature(os.stat(self.filename))
+        except FileNotFoundError:
+            signature = None
+        if state.next_id is None or signature != state.signature:
+            # First write, or the file changed behind our back: recover from its tail
+            if signature is None:
+                last_id, ends_with_newline = 0, True
+            else:
+                last_id, ends_with_newline = _read_last_tx_id(self.filename)
+            state.next_id = max(last_id, self._archived_last_tx_id()) + 1
+            state.needs_newline = not ends_with_newline
+        tx_id = state.next_id
+        state.next_id += 1
+        return tx_id
+
+    def _archived_last_tx_id(self):
+        # Highest tx_id kept outside self.filename (see segments.SegmentedTransactionLogger)
+        return 0
+
+    def _rotate_if_needed(self, state):
+        # Called under the ledger lock before every append
+        pass
+
+    def log(self, tx_type, from_id=None, from_type=None, to_id=None, to_type=None, amount=0, fee=0, resulting_balance=0,
+            cents=False, before_write=None):
+        # cents=True: the three amounts are already integer cents (Bank's hot path).
+        # Returns the row's tx_id; before_write(tx_id), if given, runs once the id
+        # is taken but before anything is written, and nothing is if it raises.
+        state = self._state
+        with state.lock:
+            self._rotate_if_needed(state)
+            tx_id = self._next_tx_id()
+            if before_write is not None:
+                try:
+                    before_write(tx_id)
+                except BaseException:
+                    state.next_id = None # the id goes back
+                    raise
+            now = datetime.now()
+            tx = {
+                "tx_id": tx_id,
+                "timestamp": now.isoformat(),
+                "type": tx_type,
+                "from_account_id": from_id or "",
+                "from_account_type": from_type or "",
+                "to_account_id": to_id or "",
+                "to_account_type": to_type or "",
+                "amount": format_cents(amount) if cents else format_money(amount),
+                "fee": format_cents(fee) if cents else format_money(fee),
+                "resulting_balance": format_cents(resulting_balance) if cents else format_money(resulting_balance),
+            }
+            with open(self.filename, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDNAMES)
+                start = f.tell()
+                if start == 0:
+                    writer.writeheader()
+                elif state.needs_newline: # don't glue our row onto a truncated one
+                    f.write("\r\n")
+                state.needs_newline = False
+                offset = f.tell()
+                writer.writerow(tx)
+                f.flush()
+                state.signature = _file_signature(os.fstat(f.fileno()))
+            if self.metrics is not None:
+                self.metrics.inc("ledger_rows_written_total")
+                self.metrics.inc("ledger_bytes_written_total", state.signature[1] - start)
+            if self.index:
+                self.index.add(tx["tx_id"], offset, state.signature[1], now,
+                               tx["from_account_id"], tx["to_account_id"])
+        return tx_id
+
+    def log_many(self, txs):
+        # Append many rows in one buffered write; txs yields log() keyword dicts.
+        state = self._state
+        count = 0
+        with state.lock:
+            self._rotate_if_needed(state)
+            next_id = self._next_tx_id()
+            with open(self.filename, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDNAMES)
+                start = f.tell()
+                if start == 0:
+                    writer.writeheader()
+                elif state.needs_newline:
+                    f.write("\r\n")
+                state.needs_newline = False
+                for tx in txs:
+                    money = format_cents if tx.get("cents") else format_money
+                    writer.writerow({
+                        "tx_id": next_id + count,
+                        "timestamp": datetime.now().isoformat(),
+                        "type": tx["tx_type"],
+                        "from_account_id": tx.get("from_id") or "",
+                        "from_account_type": tx.get("from_type") or "",
+                        "to_account_id": tx.get("to_id") or "",
+                        "to_account_type": tx.get("to_type") or "",
+                        "amount": money(tx.get("amount") or 0),
+                        "fee": money(tx.get("fee") or 0),
+                        "resulting_balance": money(tx.get("resulting_balance") or 0),
+                    })
+                    count += 1
+                f.flush()
+                state.signature = _file_signature(os.fstat(f.fileno()))
+            state.next_id = next_id + count
+            if self.metrics is not None:
+                self.metrics.inc("ledger_rows_written_total", count)
+                self.metrics.inc("ledger_bytes_written_total", state.signature[1] - start)
+            if self.index:
+                self.index.refresh() # indexes the new rows in one pass
+        return count
+
+    def get_transactions_for_customer(self, account_id, start=None, end=None):
+        # Rows touching account_id, optionally limited to start <= timestamp < end
+        if self.index:
+            rows = self.index.rows(account_id, start, end)
+            if self.metrics is not None:
+                self.metrics.inc("ledger_rows_read_total", len(rows))
+            return rows
         tx_list = []
         if not os.path.exists(self.filename):
             return tx_list
+        lo = to_micros(start) if start is not None else None
+        hi = to_micros(end) if end is not None else None
         with open(self.filename, "r") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 if row.get("from_account_id") == account_id or row.get("to_account_id") == account_id:
+                    if lo is not None or hi is not None:
+                        micros = to_micros(row["timestamp"])
+                        if (lo is not None and micros < lo) or (hi is not None and micros >= hi):
+                            continue
                     tx_list.append(row)
+            if self.metrics is not None: # a full scan
+                self.metrics.inc("ledger_rows_read_total", max(reader.line_num - 1, 0))
+                self.metrics.inc("ledger_bytes_read_total", os.fstat(f.fileno()).st_size)
         return tx_list
 
+    def iter_transactions(self, start=None, end=None):
+        # Every row with start <= timestamp < end, streamed in ledger order
+        if not os.path.exists(self.filename):
+            return
+        lo = to_micros(start) if start is not None else None
+        hi = to_micros(end) if end is not None else None
+        with open(self.filename, "r") as f:
+            for row in csv.DictReader(f):
+                if lo is not None or hi is not None:
+                    micros = to_micros(row["timestamp"])
+                    if (lo is not None and micros < lo) or (hi is not None and micros >= hi):
+                        continue
+                yield row
+
+# Accounts hash onto a fixed set of lock stripes, so memory stays bounded no
+# matter how many customers there are. Stripes are always taken in index order.
+_LOCK_STRIPES = 1024
+
+_LETTER = re.compile(r"[A-Za-z]")
+_DIGIT = re.compile(r"[0-9]")
+_SYMBOL = re.compile(r"[@$!%*?&]")
+
+class _SharedExclusiveLock:
+    # Single operations hold it shared; apply_batch and compaction hold it
+    # exclusively. Waiting exclusive holders block new shared ones.
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+# Column order apply_batch uses to spool pending ledger rows to disk
+_SPOOL_FIELDS = ["tx_type", "from_id", "from_type", "to_id", "to_type", "amount", "fee", "resulting_balance"]
+
 class Bank:
-    def __init__(self, filename="bank.csv"):
+    FIELDNAMES = CUSTOMER_FIELDNAMES
+    # Public methods timed and counted when a Bank is given metrics
+    INSTRUMENTED = ("add_new_customer", "bulk_add_customers", "log_in", "deposit_money", "withdraw_money",
+                    "transfer_money", "reactivate_account", "apply_batch", "generate_statement",
+                    "generate_all_statements", "top_k_customers",
+                    "top_3_customers", "bottom_k_customers", "customer_rank", "load_customers",
+                    "save_customers", "compact")
+
+    def __init__(self, filename="bank.csv", tx_logger=None, journal=False,
+                 fsync_every=1, compact_interval=None, storage=None, customers=None, metrics=None,
+                 password_hasher=None, login_cache=None):
         self.filename = filename
-        self.customers = {}
-        self.tx_logger = TransactionLogger()
+        # Passwords are stored hashed; plaintext ones in bank.csv are hashed on
+        # load (or, with LazyCustomers, on first login). login_cache saves
+        # re-running the KDF when the same customer authenticates again.
+        self.password_hasher = password_hasher or passwords.DEFAULT_HASHER
+        self.login_cache = login_cache if login_cache is not None else passwords.LoginCache()
+        # Any mapping of account_id -> Customer works, e.g. columnar.CustomerTable
+        self.customers = {} if customers is None else customers
+        # storage picks the backend (CsvStorage by default, or SqliteStorage);
+        # the other options only shape the default CSV one.
+        if storage is None:
+            storage = CsvStorage(filename, tx_logger or TransactionLogger(), journal, fsync_every)
+        self.storage = storage
+        self.tx_logger = storage.tx_logger
+        self._stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._gate = _SharedExclusiveLock()
+        # Saves go one at a time. Accounts an operation is still changing are
+        # listed in _in_flight with their last saved state, which is what a
+        # whole-table save writes for them.
+        self._save_lock = threading.Lock()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        # New account ids come from a persistent counter instead of max(ids)
+        self._ids = ids.id_allocator(storage.ids_filename)
+        self._leaderboard = None # built on first use, then kept up to date
+        self._compactor = None
+        self._stop_compactor = threading.Event()
+        # metrics (a metrics.Metrics) wraps this instance's public methods; without
+        # it nothing is wrapped and the methods run as they are
+        self.metrics = metrics
+        if metrics is not None:
+            for name in self.INSTRUMENTED:
+                setattr(self, name, metrics.timed(getattr(self, name), "bank_operation_seconds", name,
+                                                  "bank_operations_total", operation=name))
+            storage.instrument(metrics)
         self.load_customers()
+        if compact_interval:
+            self._compactor = threading.Thread(
+                target=self._compact_every, args=(compact_interval,), daemon=True)
+            self._compactor.start()
+
+    @staticmethod
+    def _customer_from_row(row):
+        cust = Customer(row["account_id"], row["first_name"], row["last_name"], row["password"])
+        cust.checking.balance_cents = round_cents(row["balance_checking"])
+        cust.savings.balance_cents = round_cents(row["balance_savings"])
+        cust.checking.overdraft_count = int(row.get("overdraft_count") or 0)
+        cust.checking.is_active = row.get("is_active") not in ("False", False) # as read, or a _customer_row
+        return cust
+
+    @staticmethod
+    def _customer_row(cust):
+        return {
+            "account_id": cust.account_id,
+            "first_name": cust.first_name,
+            "last_name": cust.last_name,
+            "password": cust.password,
+            "balance_checking": format_cents(cust.checking.balance_cents),
+            "balance_savings": format_cents(cust.savings.balance_cents),
+            "overdraft_count": cust.checking.overdraft_count,
+            "is_active": cust.checking.is_active,
+        }
+
+    def _all_rows(self):
+        rows = getattr(self.customers, "rows", None)
+        if rows: # the mapping can stream them without building every Customer
+            return rows()
+        return [self._customer_row(c) for c in list(self.customers.values())]
 
     def load_customers(self):
-        if not os.path.exists(self.filename):
+        attach = getattr(self.customers, "attach", None)
+        if attach: # e.g. lazy.LazyCustomers, which loads customers on demand
+            attach(self.storage)
+            self._ids.seen(self._highest_id())
             return
-        with open(self.filename, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                self.customers[row["account_id"]] = Customer(
-                    row["account_id"], row["first_name"], row["last_name"],
-                    row["password"], float(row["balance_checking"]), float(row["balance_savings"])
-                )
+        load_row = getattr(self.customers, "load_row", None)
+        for row in self.storage.load_customers():
+            if load_row:
+                load_row(row)
+            else:
+                self.customers[row["account_id"]] = self._customer_from_row(row)
+        self._ids.seen(self._highest_id())
+        self._hash_plaintext_passwords()
+
+    def _highest_id(self):
+        return max((int(k) for k in self.customers if k.isdigit()), default=ids.FIRST_ID - 1)
+
+    def _hash_plaintext_passwords(self):
+        # One-off migration of rows written before passwords were hashed
+        hasher = self.password_hasher
+        migrated = [c for c in self.customers.values() if not hasher.is_hashed(c.password)]
+        if not migrated:
+            return
+        for c in migrated:
+            c.password = hasher.hash(c.password)
+        self._mark_dirty(migrated)
+        self.save_customers()
 
     def save_customers(self):
-        with open(self.filename, "w", newline="") as f:
-            fieldnames = ["account_id", "first_name", "last_name", "password",
-                          "balance_checking", "balance_savings"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for cust in self.customers.values():
-                writer.writerow({
-                    "account_id": cust.account_id,
-                    "first_name": cust.first_name,
-                    "last_name": cust.last_name,
-                    "password": cust.password,
-                    "balance_checking": cust.checking.balance,
-                    "balance_savings": cust.savings.balance
-                })
+        with self._gate.exclusive(), self._save_lock: # nothing is half-applied
+            self.storage.save_customers(self._all_rows())
+            self._notify_saved(None)
+
+    def compact(self):
+        written = []
+        def get_rows():
+            written[:] = self._all_rows()
+            return written
+        self.storage.compact(get_rows, self._gate.exclusive)
+        compacted = getattr(self.customers, "compacted", None)
+        if compacted and written:
+            compacted(written)
+
+    def _compact_every(self, interval):
+        while not self._stop_compactor.wait(interval):
+            self.compact()
+
+    def _mark_dirty(self, customers):
+        mark_dirty = getattr(self.customers, "mark_dirty", None)
+        if mark_dirty:
+            mark_dirty(customers)
+
+    def _notify_saved(self, rows):
+        # Lets a mapping that keeps changed customers until they are on disk
+        # (lazy.LazyCustomers) let go of them
+        saved = getattr(self.customers, "saved", None)
+        if saved:
+            saved(rows)
+
+    def _persist(self, *customers):
+        own = {c.account_id for c in customers}
+        rows = [self._customer_row(c) for c in customers]
+        with self._save_lock:
+            self._mark_dirty(customers)
+            self.storage.save_changed(rows, lambda: self._committed_rows(own))
+            self._notify_saved(rows)
+            with self._in_flight_lock: # saved now, so later snapshots may write them
+                for c in customers:
+                    if c.account_id in self._in_flight:
+                        self._in_flight[c.account_id] = self._snapshot([c])[0]
+
+    def _committed_rows(self, own):
+        # Every row for a whole-table save; accounts other operations are in the
+        # middle of changing are written as they were last saved
+        with self._in_flight_lock:
+            in_flight = {a: state for a, state in self._in_flight.items() if a not in own}
+        for row in self._all_rows():
+            state = in_flight.get(row["account_id"])
+            if state is not None:
+                row = dict(row, balance_checking=format_cents(state[0]), overdraft_count=state[1],
+                           is_active=state[2], balance_savings=format_cents(state[3]))
+            yield row
+
+    @staticmethod
+    def _snapshot(customers):
+        return [(c.checking.balance_cents, c.checking.overdraft_count, c.checking.is_active, c.savings.balance_cents)
+                for c in customers]
+
+    @staticmethod
+    def _restore(customers, saved):
+        for c, state in zip(customers, saved):
+            c.checking.balance_cents, c.checking.overdraft_count, c.checking.is_active, c.savings.balance_cents = state
+
+    @contextmanager
+    def _locked(self, *account_ids):
+        # Lock the given accounts for one operation. Stripes are taken in a fixed
+        # order, so transfers A->B and B->A can't deadlock.
+        stripes = sorted({hash(a) % _LOCK_STRIPES for a in account_ids})
+        with self._gate.shared():
+            taken = []
+            try:
+                for i in stripes:
+                    self._stripes[i].acquire()
+                    taken.append(i)
+                yield
+            finally:
+                for i in reversed(taken):
+                    self._stripes[i].release()
+
+    @contextmanager
+    def _atomic(self, *customers):
+        # Run one operation as a storage transaction; if anything fails the
+        # in-memory accounts are put back the way they were.
+        saved = self._snapshot(customers)
+        with self._in_flight_lock:
+            self._in_flight.update((c.account_id, state) for c, state in zip(customers, saved))
+        try:
+            with self.storage.transaction():
+                yield
+        except BaseException:
+            self._restore(customers, saved)
+            raise
+        finally:
+            with self._in_flight_lock:
+                for c in customers:
+                    self._in_flight.pop(c.account_id, None)
+        self._rerank(customers)
+
+    @staticmethod
+    def _total_cents(customer):
+        return customer.checking.balance_cents + customer.savings.balance_cents
+
+    def _ranking(self):
+        if self._leaderboard is None:
+            with self._gate.exclusive(): # no balance may change while it is built
+                if self._leaderboard is None:
+                    self._leaderboard = Leaderboard(
+                        (c.account_id, self._total_cents(c)) for c in self.customers.values())
+        return self._leaderboard
+
+    def _rerank(self, customers):
+        if self._leaderboard is not None:
+            for c in customers:
+                self._leaderboard.update(c.account_id, self._total_cents(c))
+
+    def close(self):
+        if self._compactor:
+            self._stop_compactor.set()
+            self._compactor.join()
+            self._compactor = None
+        self._ids.release()
+        self.storage.close()
 
     @staticmethod
     def is_strong_password(password):
         return (
             len(password) >= 8
-            and re.search(r"[A-Za-z]", password)
-            and re.search(r"[0-9]", password)
-            and re.search(r"[@$!%*?&]", password)
+            and _LETTER.search(password)
+            and _DIGIT.search(password)
+            and _SYMBOL.search(password)
         )
 
     def add_new_customer(self, first_name, last_name, password, initial_checking=0, initial_savings=0):
-        if self.customers:
-            max_id = max(int(k) for k in self.customers.keys())
-            new_account_id = str(max_id + 1)
-        else:
-            new_account_id = "10001"
-
-        if not self.is_strong_password(password):
-            raise ValueError("Password too weak! Must be at least 8 chars with letters, numbers, and symbols.")
+        return self.bulk_add_customers([{"first_name": first_name, "last_name": last_name, "password": password,
+                                         "initial_checking": initial_checking,
+                                         "initial_savings": initial_savings}])[0]
+
+    @classmethod
+    def _check_passwords(cls, customers, hasher, prehashed=False):
+        # Raises for the first weak plaintext password; returns which ones are
+        # already hashed. Only an import (prehashed=True) may carry hashes: from
+        # anywhere else a hash-shaped string is just a password to check.
+        hashed = []
+        for n, entry in enumerate(customers, 1):
+            password = entry.get("password") or ""
+            hashed.append(prehashed and hasher.is_hashed(password))
+            if not hashed[-1] and not cls.is_strong_password(password):
+                message = "Password too weak! Must be at least 8 chars with letters, numbers, and symbols."
+                raise ValueError(message if len(customers) == 1 else f"Customer {n}: {message}")
+        return hashed
+
+    def bulk_add_customers(self, customers, prehashed=False):
+        # Add many customers at once: every entry (a dict with first_name,
+        # last_name, password and optionally initial_checking/initial_savings)
+        # is checked first, then ids are reserved in one block and all rows are
+        # appended in a single write. Nothing is added if any entry is invalid.
+        # With prehashed=True (imports) a password already hashed by a
+        # PasswordHasher is stored as it is. An entry with an account_id keeps
+        # it (it must not be taken yet).
+        # Returns the new account ids in order.
+        customers = list(customers)
+        hasher = self.password_hasher
+        hashed = self._check_passwords(customers, hasher, prehashed)
+        built = []
+        for entry, is_hashed in zip(customers, hashed):
+            password = entry["password"]
+            built.append(Customer(entry.get("account_id"), entry["first_name"], entry["last_name"],
+                                  password if is_hashed else hasher.hash(password),
+                                  entry.get("initial_checking", 0), entry.get("initial_savings", 0)))
+        if not built:
+            return []
+        # Exclusive, so no whole-file save can run between the append and the
+        # new customers showing up in self.customers
+        with self._gate.exclusive():
+            given = set()
+            for customer in built:
+                if customer.account_id is not None:
+                    if customer.account_id in self.customers or customer.account_id in given:
+                        raise ValueError(f"Account id already exists: {customer.account_id}")
+                    given.add(customer.account_id)
+            if given: # keep our own ids above them
+                self._ids.seen(max((int(a) for a in given if a.isdigit()), default=ids.FIRST_ID - 1))
+            fresh = [c for c in built if c.account_id is None]
+            for customer, account_id in zip(fresh, self._ids.reserve(len(fresh)) if fresh else ()):
+                customer.account_id = str(account_id)
+            rows = [self._customer_row(c) for c in built]
+            with self.storage.transaction():
+                # Opening balances go in the ledger too, so replay.py can rebuild them
+                if any(c.checking.balance_cents or c.savings.balance_cents for c in built):
+                    self.tx_logger.log_many(self._opening_txs(built))
+                self.storage.append_customers(rows)
+            for customer in built:
+                self.customers[customer.account_id] = customer
+            self._notify_saved(rows) # they are on disk, so a lazy mapping may evict them
+        self._rerank(built)
+        return [c.account_id for c in built]
 
-        self.customers[new_account_id] = Customer(
-            new_account_id, first_name, last_name, password,
-            initial_checking, initial_savings
-        )
-        self.save_customers()
-        return new_account_id
+    @staticmethod
+    def _opening_txs(customers):
+        for c in customers:
+            for account in (c.checking, c.savings):
+                if account.balance_cents:
+                    yield dict(tx_type="open", to_id=c.account_id, to_type=account.account_type,
+                               amount=account.balance, resulting_balance=account.balance)
 
     def log_in(self, account_id, password):
         customer = self.customers.get(account_id)
         if not customer:
             return False
-        return customer.password == password
+        stored = customer.password
+        if self.login_cache.check(account_id, stored, password):
+            return True
+        if not self.password_hasher.verify(password, stored):
+            return False
+        if self.password_hasher.needs_rehash(stored): # plaintext, or an older work factor
+            self._rehash_password(customer, stored, password)
+        self.login_cache.add(account_id, customer.password, password)
+        return True
+
+    def _rehash_password(self, customer, stored, password):
+        hashed = self.password_hasher.hash(password) # the slow part, outside the locks
+        with self._locked(customer.account_id):
+            if customer.password != stored: # changed meanwhile
+                return
+            customer.password = hashed
+            try:
+                with self.storage.transaction():
+                    self._persist(customer)
+            except BaseException:
+                customer.password = stored
+                raise
+
+    @staticmethod
+    def _account(customer, account_type, message):
+        if account_type == "checking":
+            return customer.checking
+        if account_type == "savings":
+            return customer.savings
+        raise ValueError(message)
+
+    # The amount is turned into cents once; everything after that is the int
+    # *_cents path. Ledger rows carry cents too and are formatted when logged;
+    # only the values handed back to the caller become Decimals.
+    def _deposit(self, customer, account_type, amount):
+        account = self._account(customer, account_type, "Invalid account type.")
+        cents = to_cents(amount)
+        new_cents = account.deposit_cents(cents)
+        tx = dict(tx_type="deposit", to_id=customer.account_id, to_type=account_type,
+                  amount=cents, resulting_balance=new_cents, cents=True)
+        return from_cents(new_cents), tx
+
+    def _withdraw(self, customer, account_type, amount):
+        account = self._account(customer, account_type, "Invalid account type.")
+        cents = to_cents(amount)
+        new_cents, fee_cents = account.withdraw_cents(cents)
+        tx = dict(tx_type="withdraw", from_id=customer.account_id, from_type=account_type,
+                  amount=cents, fee=fee_cents, resulting_balance=new_cents, cents=True)
+        return (from_cents(new_cents), from_cents(fee_cents)), tx
+
+    def _transfer(self, sender, from_type, receiver, to_type, amount):
+        source = self._account(sender, from_type, "Invalid sender account type.")
+        target = self._account(receiver, to_type, "Invalid receiver account type.")
+        cents = to_cents(amount)
+        sender_cents, fee_cents = source.withdraw_cents(cents)
+        receiver_cents = target.deposit_cents(cents)
+        tx = dict(tx_type="transfer", from_id=sender.account_id, from_type=from_type,
+                  to_id=receiver.account_id, to_type=to_type, amount=cents, fee=fee_cents,
+                  resulting_balance=sender_cents, cents=True)
+        return (from_cents(sender_cents), from_cents(receiver_cents)), tx
 
     def deposit_money(self, account_id, account_type, amount):
         customer = self.customers.get(account_id)
         if not customer:
             raise ValueError("Customer not found.")
 
-        if account_type == "checking":
-            new_balance = customer.checking.deposit(amount)
-        elif account_type == "savings":
-            new_balance = customer.savings.deposit(amount)
-        else:
-            raise ValueError("Invalid account type.")
-
-        self.tx_logger.log(
-            tx_type="deposit",
-            to_id=account_id,
-            to_type=account_type,
-            amount=amount,
-            resulting_balance=new_balance
-        )
-        self.save_customers()
+        with self._locked(account_id), self._atomic(customer):
+            new_balance, tx = self._deposit(customer, account_type, amount)
+            self.tx_logger.log(**tx)
+            self._persist(customer)
         return new_balance
 
     def withdraw_money(self, account_id, account_type, amount):
@@ -222,22 +800,10 @@ class Bank:
         if not customer:
             raise ValueError("Customer not found.")
 
-        if account_type == "checking":
-            new_balance, fee = customer.checking.withdraw(amount)
-        elif account_type == "savings":
-            new_balance, fee = customer.savings.withdraw(amount)
-        else:
-            raise ValueError("Invalid account type.")
-
-        self.tx_logger.log(
-            tx_type="withdraw",
-            from_id=account_id,
-            from_type=account_type,
-            amount=amount,
-            fee=fee,
-            resulting_balance=new_balance
-        )
-        self.save_customers()
+        with self._locked(account_id), self._atomic(customer):
+            (new_balance, fee), tx = self._withdraw(customer, account_type, amount)
+            self.tx_logger.log(**tx)
+            self._persist(customer)
         return new_balance, fee
 
     def transfer_money(self, from_id, from_type, to_id, to_type, amount):
@@ -246,31 +812,10 @@ class Bank:
         if not sender or not receiver:
             raise ValueError("Sender or receiver not found.")
 
-        if from_type == "checking":
-            sender_new, fee = sender.checking.withdraw(amount)
-        elif from_type == "savings":
-            sender_new, fee = sender.savings.withdraw(amount)
-        else:
-            raise ValueError("Invalid sender account type.")
-
-        if to_type == "checking":
-            receiver_new = receiver.checking.deposit(amount)
-        elif to_type == "savings":
-            receiver_new = receiver.savings.deposit(amount)
-        else:
-            raise ValueError("Invalid receiver account type.")
-
-        self.tx_logger.log(
-            tx_type="transfer",
-            from_id=from_id,
-            from_type=from_type,
-            to_id=to_id,
-            to_type=to_type,
-            amount=amount,
-            fee=fee,
-            resulting_balance=sender_new
-        )
-        self.save_customers()
+        with self._locked(from_id, to_id), self._atomic(sender, receiver):
+            (sender_new, receiver_new), tx = self._transfer(sender, from_type, receiver, to_type, amount)
+            self.tx_logger.log(**tx)
+            self._persist(sender, receiver)
         return sender_new, receiver_new
 
     def reactivate_account(self, account_id, account_type):
@@ -281,52 +826,194 @@ class Bank:
         if account_type != "checking":
             raise ValueError("Only checking accounts can be reactivated.")
 
-        if customer.checking.is_active:
-            raise ValueError("Account already active.")
+        with self._locked(account_id), self._atomic(customer):
+            if customer.checking.is_active:
+                raise ValueError("Account already active.")
 
-        if customer.checking.balance < 0:
-            raise ValueError(f"Cannot reactivate account. Outstanding overdraft: {customer.checking.balance}")
+            if customer.checking.balance_cents < 0:
+                raise ValueError(f"Cannot reactivate account. Outstanding overdraft: {customer.checking.balance}")
 
-        customer.checking.is_active = True
-        customer.checking.overdraft_count = 0
+            customer.checking.is_active = True
+            customer.checking.overdraft_count = 0
 
-        self.tx_logger.log(
-        "reactivate",
-        account_id,
-        account_type,
-        None,
-        None,
-        0,
-        0,
-        customer.checking.balance
-        )
+            self.tx_logger.log(
+            "reactivate",
+            account_id,
+            account_type,
+            None,
+            None,
+            0,
+            0,
+            customer.checking.balance
+            )
 
 
-        self.save_customers()
+            self._persist(customer)
         return True
 
 
-    def generate_statement(self, account_id):
+    # Hooks for one side of a transfer whose other side lives in another bank
+    # (sharding._Shard runs both as a two-phase commit). A leg is a deposit or
+    # withdraw on one account with its own ledger row; prepare(tx_id, state)
+    # is told the row's id and the account state the leg leads to before the
+    # row is written, so a crash in between can be settled with settle_leg.
+    def apply_leg(self, account_id, kind, account_type, amount, prepare, **tx_fields):
+        # tx_fields override the ledger row, e.g. tx_type="transfer_out", to_id=...
         customer = self.customers.get(account_id)
         if not customer:
             raise ValueError("Customer not found.")
+        change = {"deposit": self._deposit, "withdraw": self._withdraw}[kind]
+        with self._locked(account_id), self._atomic(customer):
+            value, tx = change(customer, account_type, amount)
+            tx.update(tx_fields)
+            state = self._snapshot([customer])[0]
+            self.tx_logger.log(**tx, before_write=lambda tx_id: prepare(tx_id, state))
+            self._persist(customer)
+        return value
+
+    def settle_leg(self, account_id, tx_id, tx_type, state):
+        # After a crash: if the prepared leg's ledger row is there, make sure
+        # the account is in the state it led to and return True; False means
+        # the leg never happened. Only needed on restart, so it scans the ledger.
+        row = None
+        for found in self.tx_logger.iter_transactions():
+            if int(found["tx_id"]) >= tx_id:
+                row = found if int(found["tx_id"]) == tx_id else None
+                break
+        customer = self.customers.get(account_id)
+        if row is None or row["type"] != tx_type or customer is None:
+            return False
+        with self._locked(account_id):
+            self._restore([customer], [tuple(state)])
+            self._persist(customer)
+        self._rerank([customer])
+        return True
 
-        tx_list = self.tx_logger.get_transactions_for_customer(account_id)
-        with open(f"{account_id}_statement.txt", "w") as f:
-            f.write(f"Customer: {customer.first_name} {customer.last_name}\n")
-            f.write(f"Checking Balance: {customer.checking.balance}\n")
-            f.write(f"Savings Balance: {customer.savings.balance}\n")
-            f.write(f"Overdrafts: {customer.checking.overdraft_count}\n")
-            f.write("Transactions:\n")
-            for tx in tx_list:
-                f.write(
-                    f"{tx['timestamp']} | {tx['type']} | Amount: {tx['amount']} | Fee: {tx['fee']} | Balance: {tx['resulting_balance']}\n"
-                )
+    def _apply_op(self, op):
+        kind = op.get("op")
+        amount = parse_amount(op.get("amount"))
+        if kind == "transfer":
+            sender = self.customers.get(op.get("account_id"))
+            receiver = self.customers.get(op.get("to_account_id"))
+            if not sender or not receiver:
+                raise ValueError("Sender or receiver not found.")
+            customers = (sender, receiver)
+        elif kind in ("deposit", "withdraw"):
+            customer = self.customers.get(op.get("account_id"))
+            if not customer:
+                raise ValueError("Customer not found.")
+            customers = (customer,)
+        else:
+            raise ValueError(f"Unknown operation: {kind!r}")
+
+        saved = self._snapshot(customers)
+        try:
+            if kind == "deposit":
+                value, tx = self._deposit(customer, op.get("account_type"), amount)
+            elif kind == "withdraw":
+                value, tx = self._withdraw(customer, op.get("account_type"), amount)
+            else:
+                value, tx = self._transfer(sender, op.get("account_type"), receiver,
+                                           op.get("to_account_type"), amount)
+        except (ValueError, TypeError) as e:
+            self._restore(customers, saved) # a transfer may have half happened
+            raise ValueError(str(e))
+        return customers, saved, value, tx
+
+    def apply_batch(self, ops, atomic=True, on_result=None):
+        # Apply many deposit/withdraw/transfer ops (dicts shaped like BATCH_FIELDNAMES,
+        # e.g. from read_batch_csv) with the same rules as the single-op methods,
+        # then write all ledger rows in one append and persist customers once.
+        # atomic=True undoes the whole batch at the first failing op; atomic=False
+        # skips failing ops. on_result(index, value, error) receives every outcome
+        # instead of them being kept on the result, which keeps memory flat.
+        with self._gate.exclusive(): # no single op may interleave with the batch
+            return self._apply_batch(ops, atomic, on_result)
+
+    def _apply_batch(self, ops, atomic, on_result):
+        result = BatchResult(keep_results=on_result is None)
+        touched = {}
+        saved = {} # account_id -> state before the batch
+        import tempfile # only batches need it; kept off the startup path
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+", newline="") as spool:
+            pending = csv.writer(spool)
+            for index, op in enumerate(ops):
+                try:
+                    customers, before, value, tx = self._apply_op(op)
+                except ValueError as e:
+                    result.errors.append((index, str(e)))
+                    if on_result:
+                        on_result(index, None, str(e))
+                    if atomic:
+                        break
+                    continue
+                for c, state in zip(customers, before):
+                    if c.account_id not in saved:
+                        saved[c.account_id] = state
+                        touched[c.account_id] = c
+                row = [tx.get(name, "") for name in _SPOOL_FIELDS]
+                if tx.get("cents"): # spooled as text, like rows given in any other unit
+                    row[5:] = [format_cents(v or 0) for v in row[5:]]
+                pending.writerow(row)
+                result.applied += 1
+                if on_result:
+                    on_result(index, value, None)
+                else:
+                    result.results.append((index, value))
+
+            changed = list(touched.values())
+            before = [saved[c.account_id] for c in changed]
+            if atomic and result.errors:
+                self._restore(changed, before)
+                result.applied = 0
+                result.rolled_back = True
+                return result
+            if not changed:
+                return result
+
+            spool.seek(0)
+            try:
+                with self.storage.transaction():
+                    self.tx_logger.log_many(dict(zip(_SPOOL_FIELDS, row)) for row in csv.reader(spool))
+                    self._persist(*changed)
+            except BaseException:
+                self._restore(changed, before)
+                raise
+        self._rerank(changed)
+        return result
+
+    def generate_statement(self, account_id, start=None, end=None):
+        customer = self.customers.get(account_id)
+        if not customer:
+            raise ValueError("Customer not found.")
+
+        tx_list = self.tx_logger.get_transactions_for_customer(account_id, start, end)
+        statements.write_statement(f"{account_id}_statement.txt", customer, tx_list)
+
+    def generate_all_statements(self, start=None, end=None, directory=".", workers=4,
+                                spill_rows=500_000, progress=None):
+        # Every customer's statement from a single pass over the ledger; see
+        # statements.generate_all_statements. Returns how many were written.
+        return statements.generate_all_statements(self, start, end, directory, workers,
+                                                  spill_rows, progress=progress)
+
+    def top_k_customers(self, k):
+        check_k(k) # before the backend: SQLite reads LIMIT -1 as no limit
+        top_ids = self.storage.top_customers(k)
+        if top_ids is None: # not indexed by the backend, use the leaderboard
+            top_ids = self._ranking().top(k)
+        return [self.customers[i] for i in top_ids if i in self.customers]
 
     def top_3_customers(self):
-        ranked = sorted(
-            self.customers.values(),
-            key=lambda c: c.checking.balance + c.savings.balance,
-            reverse=True
-        )
-        return ranked[:3]
\ No newline at end of file
+        return self.top_k_customers(3)
+
+    def bottom_k_customers(self, k):
+        # Lowest total balances first, e.g. to spot accounts heading for overdraft
+        return [self.customers[i] for i in self._ranking().bottom(k) if i in self.customers]
+
+    def customer_rank(self, account_id):
+        # 1 for the customer with the highest total balance
+        rank = self._ranking().rank(account_id)
+        if rank is None:
+            raise ValueError("Customer not found.")
+        return rank
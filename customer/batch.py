@@ -0,0 +1,38 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+# Columns of a batch file; transfers use to_account_id/to_account_type,
+# deposits and withdrawals leave them empty.
+BATCH_FIELDNAMES = ["op", "account_id", "account_type", "to_account_id", "to_account_type", "amount"]
+
+class BatchResult:
+    def __init__(self, keep_results=True):
+        self.applied = 0
+        self.results = [] if keep_results else None # (index, value) per applied op
+        self.errors = [] # (index, message) per failed op
+        self.rolled_back = False
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return (f"BatchResult(applied={self.applied}, failed={len(self.errors)}, "
+                f"rolled_back={self.rolled_back})")
+
+def read_batch_csv(source):
+    # Stream ops from a CSV file (path or open file) one row at a time, so a
+    # payroll file of any size can go straight into Bank.apply_batch.
+    if isinstance(source, str):
+        with open(source, newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        yield from csv.DictReader(source)
+
+def parse_amount(value):
+    if isinstance(value, str):
+        try:
+            return Decimal(value.strip()) # exact, unlike float
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+    return value
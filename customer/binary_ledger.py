@@ -0,0 +1,273 @@
+import argparse
+import csv
+import functools
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+
+from customer.bank_app import TransactionLogger, _file_signature, _ledger_state
+from customer.ledger_index import to_micros
+from customer.money import format_cents, round_cents, to_cents
+
+try:
+    import numpy as np
+except ImportError: # optional; reads fall back to struct
+    np = None
+
+# File layout: a 16-byte header, then fixed 64-byte little-endian records:
+# tx_id, timestamp (µs since 1970), from/to account id (-1 for none), amount,
+# fee and resulting_balance in cents, then type, from_type and to_type codes.
+MAGIC = b"BLEDGER1"
+HEADER = struct.Struct("<8sII") # magic, version, record size
+RECORD = struct.Struct("<qqqqqqqBBB5x")
+VERSION = 1
+TX_TYPES = ("", "deposit", "withdraw", "transfer", "reactivate", "open", "transfer_out", "transfer_in")
+ACCOUNT_TYPES = ("", "checking", "savings")
+NO_ACCOUNT = -1
+CHUNK_RECORDS = 65536
+
+_TX_CODES = {name: code for code, name in enumerate(TX_TYPES)}
+_ACCOUNT_TYPE_CODES = {name: code for code, name in enumerate(ACCOUNT_TYPES)}
+_EPOCH = datetime(1970, 1, 1)
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([("tx_id", "<i8"), ("micros", "<i8"), ("from_id", "<i8"), ("to_id", "<i8"),
+                             ("amount", "<i8"), ("fee", "<i8"), ("resulting_balance", "<i8"),
+                             ("type", "u1"), ("from_type", "u1"), ("to_type", "u1"), ("pad", "V5")])
+
+def _code(codes, value, what):
+    try:
+        return codes[value or ""]
+    except KeyError:
+        raise ValueError(f"Unknown {what}: {value!r}")
+
+def _account_code(account_id):
+    # Account ids are stored as integers; only ids that round-trip exactly fit
+    if not account_id:
+        return NO_ACCOUNT
+    if not (account_id.isdigit() and str(int(account_id)) == account_id):
+        raise ValueError(f"Account id can't be stored in the binary ledger: {account_id!r}")
+    return int(account_id)
+
+@functools.lru_cache(maxsize=4096) # neighbouring records share their second
+def _second(seconds):
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat()
+
+_money = functools.lru_cache(maxsize=65536)(format_cents) # amounts and fees repeat a lot
+
+def _timestamp(micros):
+    seconds, fraction = divmod(micros, 1_000_000)
+    return f"{_second(seconds)}.{fraction:06d}" if fraction else _second(seconds)
+
+def encode_row(row, strict=True):
+    # A ledger row as TransactionLogger writes it (dict of strings) -> record
+    # values. Raises ValueError for anything export wouldn't reproduce exactly;
+    # strict=False normalizes money as older ledgers wrote it ("100.1", "0",
+    # "-45.0", float noise) to cents, e.g. exported as "100.10".
+    micros = to_micros(row["timestamp"])
+    money = [(to_cents if strict else round_cents)(row[name]) for name in ("amount", "fee", "resulting_balance")]
+    if _timestamp(micros) != row["timestamp"] or strict and [format_cents(c) for c in money] != [
+            row["amount"], row["fee"], row["resulting_balance"]]:
+        raise ValueError(f"Row {row.get('tx_id')} can't be stored losslessly")
+    return (int(row["tx_id"]), micros, _account_code(row["from_account_id"]), _account_code(row["to_account_id"]),
+            *money, _code(_TX_CODES, row["type"], "transaction type"),
+            _code(_ACCOUNT_TYPE_CODES, row["from_account_type"], "account type"),
+            _code(_ACCOUNT_TYPE_CODES, row["to_account_type"], "account type"))
+
+def decode_record(values):
+    tx_id, micros, from_id, to_id, amount, fee, balance, kind, from_type, to_type = values[:10]
+    return {
+        "tx_id": str(tx_id),
+        "timestamp": _timestamp(micros),
+        "type": TX_TYPES[kind],
+        "from_account_id": str(from_id) if from_id != NO_ACCOUNT else "",
+        "from_account_type": ACCOUNT_TYPES[from_type],
+        "to_account_id": str(to_id) if to_id != NO_ACCOUNT else "",
+        "to_account_type": ACCOUNT_TYPES[to_type],
+        "amount": _money(amount),
+        "fee": _money(fee),
+        "resulting_balance": _money(balance),
+    }
+
+def _create(filename):
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+def _check_header(f):
+    header = f.read(HEADER.size)
+    if len(header) != HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD.size):
+        raise ValueError(f"{f.name} is not a binary ledger")
+
+class BinaryTransactionLogger:
+    # Same API as TransactionLogger, stored as fixed-width records instead of
+    # CSV. Reads map the file and filter records in place (with NumPy when it
+    # is installed), so only matching rows are turned into dicts; those have
+    # exactly the strings TransactionLogger would have written.
+    FIELDNAMES = TransactionLogger.FIELDNAMES
+
+    def __init__(self, filename="transactions.bin"):
+        self.filename = filename
+        self._state = _ledger_state(filename)
+        with self._state.lock:
+            if not os.path.exists(filename):
+                _create(filename)
+        with open(filename, "rb") as f:
+            _check_header(f)
+
+    def _next_tx_id(self): # caller holds the ledger lock
+        state = self._state
+        st = os.stat(self.filename)
+        if state.next_id is None or _file_signature(st) != state.signature:
+            body = st.st_size - HEADER.size
+            if body % RECORD.size: # a torn last record was never acknowledged
+                os.truncate(self.filename, st.st_size - body % RECORD.size)
+                body -= body % RECORD.size
+            last_id = 0
+            if body:
+                with open(self.filename, "rb") as f:
+                    f.seek(HEADER.size + body - RECORD.size)
+                    last_id = RECORD.unpack(f.read(RECORD.size))[0]
+            state.next_id = last_id + 1
+        tx_id = state.next_id
+        state.next_id += 1
+        return tx_id
+
+    def _record(self, tx_id, tx_type, from_id, from_type, to_id, to_type, amount, fee, resulting_balance, cents=False):
+        money = int if cents else to_cents
+        return RECORD.pack(tx_id, to_micros(datetime.now()), _account_code(from_id), _account_code(to_id),
+                           money(amount or 0), money(fee or 0), money(resulting_balance or 0),
+                           _code(_TX_CODES, tx_type, "transaction type"),
+                           _code(_ACCOUNT_TYPE_CODES, from_type, "account type"),
+                           _code(_ACCOUNT_TYPE_CODES, to_type, "account type"))
+
+    def _append(self, data):
+        state = self._state
+        with open(self.filename, "ab") as f:
+            f.write(data)
+            f.flush()
+            state.signature = _file_signature(os.fstat(f.fileno()))
+
+    def log(self, tx_type, from_id=None, from_type=None, to_id=None, to_type=None, amount=0, fee=0, resulting_balance=0,
+            cents=False, before_write=None):
+        with self._state.lock:
+            tx_id = self._next_tx_id()
+            try:
+                record = self._record(tx_id, tx_type, from_id, from_type, to_id, to_type, amount, fee, resulting_balance,
+                                      cents)
+                if before_write is not None:
+                    before_write(tx_id)
+            except BaseException:
+                self._state.next_id = None # nothing was written
+                raise
+            self._append(record)
+        return tx_id
+
+    def log_many(self, txs):
+        state = self._state
+        with state.lock:
+            next_id = self._next_tx_id()
+            records = []
+            try:
+                for tx in txs:
+                    records.append(self._record(next_id + len(records), tx["tx_type"], tx.get("from_id"),
+                                                tx.get("from_type"), tx.get("to_id"), tx.get("to_type"),
+                                                tx.get("amount"), tx.get("fee"), tx.get("resulting_balance"),
+                                                tx.get("cents")))
+            except ValueError:
+                state.next_id = None
+                raise
+            self._append(b"".join(records))
+            state.next_id = next_id + len(records)
+        return len(records)
+
+    def _select(self, account_id=None, start=None, end=None):
+        # Yield matching records as decoded rows, one mapped chunk at a time
+        try:
+            account = _account_code(account_id) if account_id is not None else None
+        except ValueError:
+            return # not an id this ledger can hold
+        lo = to_micros(start) if start is not None else None
+        hi = to_micros(end) if end is not None else None
+        with open(self.filename, "rb") as f:
+            _check_header(f)
+            count = (os.fstat(f.fileno()).st_size - HEADER.size) // RECORD.size
+            if not count:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for first in range(0, count, CHUNK_RECORDS):
+                    n = min(CHUNK_RECORDS, count - first)
+                    offset = HEADER.size + first * RECORD.size
+                    if np is not None:
+                        view = np.frombuffer(mm, dtype=RECORD_DTYPE, count=n, offset=offset)
+                        mask = np.ones(n, dtype=bool)
+                        if account is not None:
+                            mask &= (view["from_id"] == account) | (view["to_id"] == account)
+                        if lo is not None:
+                            mask &= view["micros"] >= lo
+                        if hi is not None:
+                            mask &= view["micros"] < hi
+                        picked = view[mask].tolist() # copies just the matches
+                        del view, mask # the map can't close while a view is alive
+                    else:
+                        chunk = memoryview(mm)[offset:offset + n * RECORD.size]
+                        picked = [values for values in RECORD.iter_unpack(chunk)
+                                  if (account is None or values[2] == account or values[3] == account)
+                                  and (lo is None or values[1] >= lo) and (hi is None or values[1] < hi)]
+                        chunk.release()
+                    for values in picked:
+                        yield decode_record(values)
+
+    def get_transactions_for_customer(self, account_id, start=None, end=None):
+        return list(self._select(account_id, start, end))
+
+    def iter_transactions(self, start=None, end=None):
+        return self._select(None, start, end)
+
+def import_csv(csv_filename, binary_filename, strict=False):
+    # transactions.csv -> binary ledger. Money is normalized to cents unless
+    # strict=True, which fails on any row export couldn't reproduce byte for byte.
+    tmp = binary_filename + ".tmp"
+    count = 0
+    with open(csv_filename, newline="") as src, open(tmp, "wb") as dst:
+        dst.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        batch = []
+        for row in csv.DictReader(src):
+            batch.append(RECORD.pack(*encode_row(row, strict)))
+            if len(batch) == CHUNK_RECORDS:
+                dst.write(b"".join(batch))
+                count += len(batch)
+                batch = []
+        dst.write(b"".join(batch))
+        count += len(batch)
+    os.replace(tmp, binary_filename)
+    return count
+
+def export_csv(binary_filename, csv_filename):
+    count = 0
+    tmp = csv_filename + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TransactionLogger.FIELDNAMES)
+        writer.writeheader()
+        for row in BinaryTransactionLogger(binary_filename).iter_transactions():
+            writer.writerow(row)
+            count += 1
+    os.replace(tmp, csv_filename)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between transactions.csv and the binary ledger format.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--strict", action="store_true",
+                        help="import: refuse rows whose amounts aren't written as TransactionLogger writes them")
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        count = import_csv(args.source, args.target, args.strict)
+    else:
+        count = export_csv(args.source, args.target)
+    print(f"Converted {count} transactions from {args.source} to {args.target}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from array import array
+from collections.abc import MutableMapping
+
+from customer.bank_app import CheckingAccount, Customer, SavingsAccount
+from customer.money import from_cents, round_cents, to_cents
+
+_DEFAULT_LIMIT_CENTS = to_cents(CheckingAccount().overdraft_limit)
+
+class CustomerTable(MutableMapping):
+    # Memory-lean replacement for the Bank.customers dict: one row per customer
+    # in parallel columns instead of three Python objects. Looking a customer up
+    # returns a light view with the usual Customer/Account attributes and rules,
+    # reading and writing the columns directly.
+    #
+    #     bank = Bank(customers=CustomerTable())
+
+    def __init__(self):
+        self._rows = {} # account_id -> row number
+        self.account_ids = []
+        self.first_names = []
+        self.last_names = []
+        self.passwords = []
+        self.checking_cents = array("q")
+        self.savings_cents = array("q")
+        self.overdraft_limit_cents = array("q")
+        self.overdraft_count = array("i")
+        self.is_active = array("b")
+
+    def __len__(self):
+        return len(self.account_ids)
+
+    def __iter__(self):
+        return iter(list(self.account_ids))
+
+    def __contains__(self, account_id):
+        return account_id in self._rows
+
+    def __getitem__(self, account_id):
+        return _CustomerView(self, self._rows[account_id])
+
+    def get(self, account_id, default=None):
+        row = self._rows.get(account_id)
+        return default if row is None else _CustomerView(self, row)
+
+    def _append(self, account_id, first_name, last_name, password,
+                checking_cents, savings_cents, limit_cents, overdraft_count, is_active):
+        self._rows[account_id] = len(self.account_ids)
+        self.account_ids.append(account_id)
+        self.first_names.append(first_name)
+        self.last_names.append(last_name)
+        self.passwords.append(password)
+        self.checking_cents.append(checking_cents)
+        self.savings_cents.append(savings_cents)
+        self.overdraft_limit_cents.append(limit_cents)
+        self.overdraft_count.append(overdraft_count)
+        self.is_active.append(is_active)
+
+    def __setitem__(self, account_id, customer):
+        row = self._rows.get(account_id)
+        values = (customer.first_name, customer.last_name, customer.password,
+                  customer.checking.balance_cents, customer.savings.balance_cents,
+                  to_cents(customer.checking.overdraft_limit), customer.checking.overdraft_count,
+                  customer.checking.is_active)
+        if row is None:
+            self._append(account_id, *values)
+        else:
+            (self.first_names[row], self.last_names[row], self.passwords[row],
+             self.checking_cents[row], self.savings_cents[row], self.overdraft_limit_cents[row],
+             self.overdraft_count[row], self.is_active[row]) = values
+
+    def load_row(self, row):
+        # Straight from a storage row to the columns, without building a Customer
+        account_id = row["account_id"]
+        values = (row["first_name"], row["last_name"], row["password"],
+                  round_cents(row["balance_checking"]), round_cents(row["balance_savings"]),
+                  _DEFAULT_LIMIT_CENTS, int(row.get("overdraft_count") or 0),
+                  row.get("is_active") != "False")
+        i = self._rows.get(account_id)
+        if i is None:
+            self._append(account_id, *values)
+        else: # a journal row replaying over the snapshot
+            (self.first_names[i], self.last_names[i], self.passwords[i],
+             self.checking_cents[i], self.savings_cents[i], self.overdraft_limit_cents[i],
+             self.overdraft_count[i], self.is_active[i]) = values
+
+    def __delitem__(self, account_id):
+        # Move the last row into the hole so the columns stay dense. Views handed
+        # out earlier point at row numbers, so they must not outlive a delete.
+        row = self._rows.pop(account_id)
+        last = len(self.account_ids) - 1
+        for column in (self.account_ids, self.first_names, self.last_names, self.passwords,
+                       self.checking_cents, self.savings_cents, self.overdraft_limit_cents,
+                       self.overdraft_count, self.is_active):
+            column[row] = column[last]
+            column.pop()
+        if row != last:
+            self._rows[self.account_ids[row]] = row
+
+def _column_property(column):
+    def get(self):
+        return getattr(self._table, column)[self._row]
+    def set(self, value):
+        getattr(self._table, column)[self._row] = value
+    return property(get, set)
+
+class _CheckingView(CheckingAccount):
+    __slots__ = ("_table", "_row")
+    account_type = "checking"
+    currency = "SAR"
+    balance_cents = _column_property("checking_cents")
+    overdraft_count = _column_property("overdraft_count")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def is_active(self):
+        return bool(self._table.is_active[self._row])
+
+    @is_active.setter
+    def is_active(self, value):
+        self._table.is_active[self._row] = bool(value)
+
+    @property
+    def overdraft_limit(self):
+        return from_cents(self._table.overdraft_limit_cents[self._row])
+
+    @overdraft_limit.setter
+    def overdraft_limit(self, value):
+        self._table.overdraft_limit_cents[self._row] = to_cents(value)
+
+class _SavingsView(SavingsAccount):
+    __slots__ = ("_table", "_row")
+    account_type = "savings"
+    currency = "SAR"
+    balance_cents = _column_property("savings_cents")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+class _CustomerView(Customer):
+    __slots__ = ("_table", "_row")
+    account_id = _column_property("account_ids")
+    first_name = _column_property("first_names")
+    last_name = _column_property("last_names")
+    password = _column_property("passwords")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def checking(self):
+        return _CheckingView(self._table, self._row)
+
+    @property
+    def savings(self):
+        return _SavingsView(self._table, self._row)
@@ -0,0 +1,114 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError: # not on Windows; reservations are then only safe within a process
+    fcntl = None
+
+FIRST_ID = 10001
+
+# One allocator per id file, shared by every Bank in the process using it
+_ALLOCATORS = {}
+_ALLOCATORS_LOCK = threading.Lock()
+
+def id_allocator(filename, block_size=64):
+    if filename is None:
+        return IdAllocator(None, block_size)
+    key = os.path.abspath(filename)
+    with _ALLOCATORS_LOCK:
+        allocator = _ALLOCATORS.get(key)
+        if allocator is None:
+            allocator = _ALLOCATORS[key] = IdAllocator(filename, block_size)
+        return allocator
+
+class IdAllocator:
+    # Hands out account ids in increasing order without looking at existing
+    # customers. The file holds the highest id reserved so far; ids are taken
+    # from it in blocks of block_size, and the file is updated (and synced)
+    # before any id of a new block is used. A crash can leave a gap but never
+    # hands an id out twice, and processes sharing the file lock it while
+    # reserving, so they get disjoint blocks. release() gives back the unused
+    # end of the current block on a clean shutdown.
+
+    def __init__(self, filename, block_size=64):
+        self.filename = filename
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self._next = None # next id of the current block
+        self._limit = None # last id of the current block
+        self._highest = FIRST_ID - 1 # stands in for the file when there is none
+
+    def _read(self):
+        try:
+            with open(self.filename) as f:
+                text = f.read().strip()
+        except FileNotFoundError:
+            text = ""
+        return int(text) if text.isdigit() else FIRST_ID - 1
+
+    def _write(self, value):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{value}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+
+    def _update(self, change):
+        # change(highest reserved) -> new highest, applied under the file lock.
+        # The lock lives in its own file because the id file itself is replaced.
+        if self.filename is None:
+            self._highest = change(self._highest)
+            return self._highest
+        with open(self.filename + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                current = self._read()
+                value = change(current)
+                if value != current:
+                    self._write(value)
+                return value
+            finally:
+                if fcntl:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _reserve(self, count): # caller holds self.lock
+        # Carry on right after the ids handed out so far if nobody reserved
+        # since; otherwise start above whatever was reserved last
+        def change(highest):
+            first = self._next if self._next is not None and highest == self._limit else highest + 1
+            return first + count - 1
+        limit = self._update(change)
+        return limit - count + 1, limit
+
+    def seen(self, highest_id):
+        # Called when customers are loaded: ids must go above the highest one
+        # that exists (rows written by hand or before the allocator), and a
+        # block the file no longer backs (it was reset) is dropped
+        with self.lock:
+            highest = self._update(lambda reserved: max(reserved, highest_id))
+            if self._next is not None and (highest_id >= self._next or highest < self._limit):
+                self._next = self._limit = None
+
+    def next_id(self):
+        return self.reserve(1)[0]
+
+    def reserve(self, count):
+        # count consecutive ids, as a range
+        with self.lock:
+            if self._next is None or self._limit - self._next + 1 < count:
+                self._next, self._limit = self._reserve(max(count, self.block_size))
+            first = self._next
+            self._next += count
+            return range(first, first + count)
+
+    def release(self):
+        # Give back what's left of the current block if nobody reserved after it
+        with self.lock:
+            if self._next is None:
+                return
+            unused_from, limit = self._next, self._limit
+            self._next = self._limit = None
+            self._update(lambda highest: unused_from - 1 if highest == limit else highest)
@@ -0,0 +1,240 @@
+import csv
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping, ValuesView
+
+from customer.bank_app import Bank, _file_signature
+from customer.storage import CUSTOMER_FIELDNAMES, CsvStorage
+
+REQUIRED_FIELDS = CUSTOMER_FIELDNAMES[:6] # overdraft_count and is_active came later
+
+class LazyCustomers(MutableMapping):
+    # Bank.customers for big bank.csv files. Startup only records the byte offset
+    # of each account's row; a Customer is built the first time it is looked up.
+    # At most cache_size untouched customers stay cached, least recently used
+    # go first. Customers changed through the Bank are kept in memory and are
+    # the only ones re-serialized on save; every other row is copied as is.
+    #
+    #     bank = Bank(customers=LazyCustomers(cache_size=1000))
+
+    def __init__(self, cache_size=1024):
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self.filename = None
+        self._journaled = False
+        self._fieldnames = None
+        self._signature = None # of the snapshot the offsets point into
+        self._offsets = {} # account_id -> byte offset of its row
+        self._overlay = {} # account_id -> row newer than the snapshot (journal)
+        self._cache = OrderedDict() # account_id -> Customer, least recent first
+        self._dirty = {} # account_id -> Customer changed since loading
+        self._deleted = set()
+        # Every Customer somebody still holds, so a lookup never hands out a
+        # second copy of an account that is being changed elsewhere
+        self._live = weakref.WeakValueDictionary()
+
+    def attach(self, storage):
+        # Called by Bank.load_customers in place of loading every row
+        if not isinstance(storage, CsvStorage):
+            raise TypeError("LazyCustomers only works with CSV storage.")
+        with self.lock:
+            self.filename = storage.filename
+            self._journaled = storage.journal is not None
+            self._index()
+            if storage.journal:
+                for row in storage.journal.replay(): # later rows win
+                    self._overlay[row["account_id"]] = row
+
+    def _index(self):
+        self._fieldnames = None
+        self._signature = None
+        self._offsets = {}
+        try:
+            f = open(self.filename, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            self._signature = _file_signature(os.fstat(f.fileno()))
+            header = f.readline()
+            self._fieldnames = next(csv.reader([header.decode("utf-8")]), None)
+            missing = [name for name in REQUIRED_FIELDS if name not in (self._fieldnames or ())]
+            if header and missing:
+                raise ValueError(f"{self.filename} is not a customer file: no {', '.join(missing)} column")
+            offset = len(header)
+            for line in f:
+                if line.startswith(b'"'): # quoted id, let csv unquote it
+                    account_id = next(csv.reader([line.decode("utf-8")]))[0]
+                else:
+                    account_id = line.split(b",", 1)[0].decode("utf-8").strip()
+                if account_id:
+                    self._offsets[account_id] = offset
+                offset += len(line)
+
+    def _refresh(self):
+        # Re-index if the snapshot was rewritten or appended to; False if there is none
+        try:
+            st = os.stat(self.filename)
+        except (FileNotFoundError, TypeError):
+            return False
+        if _file_signature(st) != self._signature:
+            self._index()
+        return True
+
+    def _read_row(self, account_id):
+        if not self._refresh():
+            return None
+        offset = self._offsets.get(account_id)
+        if offset is None:
+            return None
+        with open(self.filename, "rb") as f:
+            f.seek(offset)
+            values = next(csv.reader([f.readline().decode("utf-8")]))
+        return dict(zip(self._fieldnames, values))
+
+    def _lookup(self, account_id):
+        with self.lock:
+            customer = self._dirty.get(account_id)
+            if customer is not None:
+                return customer
+            customer = self._cache.get(account_id)
+            if customer is not None:
+                self._cache.move_to_end(account_id)
+                return customer
+            if account_id in self._deleted:
+                return None
+            customer = self._live.get(account_id)
+            if customer is None:
+                row = self._overlay.get(account_id) or self._read_row(account_id)
+                if row is None:
+                    return None
+                customer = self._live[account_id] = Bank._customer_from_row(row)
+            self._cache[account_id] = customer
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return customer
+
+    def mark_dirty(self, customers):
+        # Bank calls this before saving changed customers
+        with self.lock:
+            for customer in customers:
+                self._dirty[customer.account_id] = customer
+                self._live[customer.account_id] = customer
+                self._cache.pop(customer.account_id, None)
+
+    def saved(self, rows=None):
+        # Bank calls this once a save is on disk. Journaled rows become the
+        # overlay; otherwise bank.csv was rewritten with every change in it
+        # (rows=None: a full snapshot, journal folded in). Either way the
+        # customers go back to being cache entries, bounded by cache_size.
+        with self.lock:
+            if rows is not None and self._journaled:
+                done = []
+                for row in rows:
+                    self._overlay[row["account_id"]] = row
+                    done.append(row["account_id"])
+            else:
+                done = list(self._dirty)
+                if rows is None:
+                    self._overlay.clear()
+            for account_id in done:
+                customer = self._dirty.pop(account_id, None)
+                if customer is not None:
+                    self._cache[account_id] = customer
+                    self._cache.move_to_end(account_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def compacted(self, rows):
+        # The snapshot now holds these rows; journal rows written after they
+        # were captured are newer and stay in the overlay
+        with self.lock:
+            for row in rows:
+                if self._overlay.get(row["account_id"]) is row:
+                    del self._overlay[row["account_id"]]
+
+    def __getitem__(self, account_id):
+        customer = self._lookup(account_id)
+        if customer is None:
+            raise KeyError(account_id)
+        return customer
+
+    def get(self, account_id, default=None):
+        customer = self._lookup(account_id)
+        return default if customer is None else customer
+
+    def __contains__(self, account_id):
+        with self.lock:
+            if account_id in self._deleted:
+                return False
+            if account_id in self._dirty or account_id in self._overlay or account_id in self._offsets:
+                return True
+            return self._refresh() and account_id in self._offsets # e.g. appended, then evicted
+
+    def __setitem__(self, account_id, customer):
+        with self.lock:
+            self._deleted.discard(account_id)
+            self.mark_dirty([customer])
+
+    def __delitem__(self, account_id):
+        with self.lock:
+            if account_id not in self:
+                raise KeyError(account_id)
+            for entries in (self._dirty, self._cache, self._live, self._overlay):
+                entries.pop(account_id, None)
+            self._deleted.add(account_id)
+
+    def _keys(self):
+        with self.lock:
+            self._refresh()
+            keys = dict.fromkeys(self._offsets)
+            keys.update(dict.fromkeys(self._overlay))
+            keys.update(dict.fromkeys(self._dirty))
+            for account_id in self._deleted:
+                keys.pop(account_id, None)
+        return keys
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def values(self):
+        return _StreamedValues(self)
+
+    def rows(self):
+        # Every customer as a storage row in one pass over the snapshot; rows of
+        # customers nobody changed are passed through without building objects
+        with self.lock:
+            dirty = dict(self._dirty)
+            overlay = dict(self._overlay)
+            deleted = set(self._deleted)
+        newer = {**overlay, **dirty}
+        seen = set()
+        if self.filename and os.path.exists(self.filename):
+            with open(self.filename, newline="") as f:
+                for row in csv.DictReader(f):
+                    account_id = row["account_id"]
+                    if account_id in deleted:
+                        continue
+                    if account_id in newer:
+                        seen.add(account_id)
+                        customer = dirty.get(account_id)
+                        yield Bank._customer_row(customer) if customer is not None else overlay[account_id]
+                    else:
+                        yield row
+        for account_id, newest in newer.items():
+            if account_id not in seen and account_id not in deleted:
+                yield Bank._customer_row(newest) if account_id in dirty else newest
+
+class _StreamedValues(ValuesView):
+    # Iterating all customers reads the file once instead of once per account,
+    # and doesn't push the working set out of the cache
+    def __iter__(self):
+        customers = self._mapping
+        for row in customers.rows():
+            with customers.lock:
+                customer = customers._live.get(row["account_id"])
+            yield customer if customer is not None else Bank._customer_from_row(row)
@@ -0,0 +1,99 @@
+import threading
+from bisect import bisect_left, insort
+
+def check_k(k):
+    if k < 0:
+        raise ValueError(f"k must not be negative, got {k}")
+
+class Leaderboard:
+    # Account ids ordered by total balance in cents, richest first (ties by id).
+    # Entries live in a list of short sorted runs, so an update is a bisect over
+    # the run maxima plus an insert into one small list, instead of a full sort.
+
+    RUN_SIZE = 512
+
+    def __init__(self, totals=()):
+        self.lock = threading.Lock()
+        self._totals = dict(totals) # account_id -> total cents
+        keys = sorted((-total, account_id) for account_id, total in self._totals.items())
+        self._runs = [keys[i:i + self.RUN_SIZE] for i in range(0, len(keys), self.RUN_SIZE)]
+        self._maxes = [run[-1] for run in self._runs]
+
+    def __len__(self):
+        return len(self._totals)
+
+    def __contains__(self, account_id):
+        return account_id in self._totals
+
+    def _insert(self, key):
+        if not self._runs:
+            self._runs.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect_left(self._maxes, key), len(self._runs) - 1)
+        run = self._runs[i]
+        insort(run, key)
+        self._maxes[i] = run[-1]
+        if len(run) > 2 * self.RUN_SIZE:
+            half = len(run) // 2
+            self._runs[i:i + 1] = [run[:half], run[half:]]
+            self._maxes[i:i + 1] = [run[half - 1], run[-1]]
+
+    def _remove(self, key):
+        i = bisect_left(self._maxes, key)
+        run = self._runs[i]
+        del run[bisect_left(run, key)]
+        if run:
+            self._maxes[i] = run[-1]
+        else:
+            del self._runs[i]
+            del self._maxes[i]
+
+    def update(self, account_id, total):
+        with self.lock:
+            old = self._totals.get(account_id)
+            if old == total:
+                return
+            if old is not None:
+                self._remove((-old, account_id))
+            self._totals[account_id] = total
+            self._insert((-total, account_id))
+
+    def remove(self, account_id):
+        with self.lock:
+            old = self._totals.pop(account_id, None)
+            if old is not None:
+                self._remove((-old, account_id))
+
+    def top(self, k):
+        check_k(k)
+        with self.lock:
+            ids = []
+            for run in self._runs:
+                for _, account_id in run[:k - len(ids)]:
+                    ids.append(account_id)
+                if len(ids) >= k:
+                    break
+            return ids
+
+    def bottom(self, k):
+        # Poorest first
+        check_k(k)
+        with self.lock:
+            ids = []
+            for run in reversed(self._runs):
+                for _, account_id in reversed(run[max(0, len(run) - (k - len(ids))):]):
+                    ids.append(account_id)
+                if len(ids) >= k:
+                    break
+            return ids
+
+    def rank(self, account_id):
+        # 1 for the richest customer, None if the account isn't ranked
+        with self.lock:
+            total = self._totals.get(account_id)
+            if total is None:
+                return None
+            key = (-total, account_id)
+            i = bisect_left(self._maxes, key)
+            return sum(len(run) for run in self._runs[:i]) + bisect_left(self._runs[i], key) + 1
@@ -0,0 +1,216 @@
+import csv
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def to_micros(value):
+    # datetime or ISO string -> integer microseconds, the unit the index sorts on
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, datetime.min.time())
+    return (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+class LedgerIndex:
+    # Secondary index over a transactions.csv: account_id -> byte offsets of the
+    # rows it appears in, plus their timestamps for date-range lookups.
+    # Stored next to the ledger as append-only "tx_id,account_id,offset,micros" lines.
+
+    def __init__(self, ledger_filename, filename=None):
+        self.ledger_filename = ledger_filename
+        self.filename = filename or ledger_filename + ".idx"
+        self.lock = threading.RLock()
+        self._offsets = {}
+        self._times = {}
+        self._columns = None
+        self._covered = None # ledger bytes already indexed
+        self._last = None # (tx_id, offset) of the newest indexed row
+        self._ledger_ino = None
+
+    def _reset(self):
+        self._offsets = {}
+        self._times = {}
+        self._columns = None
+        self._covered = None
+        self._last = None
+        self._ledger_ino = None
+
+    def _read_header(self):
+        with open(self.ledger_filename, "rb") as f:
+            header = f.readline()
+        if not header.endswith(b"\n"):
+            return None
+        names = next(csv.reader([header.decode("utf-8")]))
+        self._columns = {name: i for i, name in enumerate(names)}
+        return len(header)
+
+    def _remember(self, account_id, offset, micros):
+        offsets = self._offsets.get(account_id)
+        if offsets is None:
+            offsets = self._offsets[account_id] = array("q")
+            self._times[account_id] = array("q")
+        offsets.append(offset)
+        self._times[account_id].append(micros)
+
+    def _load(self):
+        self._reset()
+        if not os.path.exists(self.ledger_filename):
+            return
+        header_end = self._read_header()
+        if header_end is None:
+            return
+        self._ledger_ino = os.stat(self.ledger_filename).st_ino
+        self._covered = header_end
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb+") as f:
+            data = f.read()
+            keep = data.rfind(b"\n") + 1
+            if keep != len(data): # torn last entry
+                f.truncate(keep)
+        try:
+            for line in data[:keep].splitlines():
+                tx_id, account_id, offset, micros = line.decode("utf-8").split(",")
+                self._remember(account_id, int(offset), int(micros))
+                self._last = (tx_id, int(offset))
+            end = self._row_end(*self._last) if self._last else header_end
+        except ValueError:
+            end = None
+        if end is None: # unreadable, or the ledger was replaced under us
+            os.remove(self.filename)
+            self._load()
+            return
+        self._covered = end
+
+    def _row_end(self, tx_id, offset):
+        with open(self.ledger_filename, "rb") as f:
+            f.seek(offset)
+            line = f.readline()
+        if not line.endswith(b"\n") or line.split(b",", 1)[0].decode("utf-8") != tx_id:
+            return None
+        return offset + len(line)
+
+    def _ensure_loaded(self):
+        if self._covered is None:
+            self._load()
+
+    def refresh(self):
+        # Index whatever was appended to the ledger without going through us
+        with self.lock:
+            self._ensure_loaded()
+            if self._covered is None:
+                return
+            try:
+                st = os.stat(self.ledger_filename)
+            except FileNotFoundError:
+                self._reset()
+                return
+            size = st.st_size
+            if st.st_ino != self._ledger_ino or size < self._covered:
+                self.rebuild()
+            elif size > self._covered:
+                self._scan_from(self._covered)
+
+    def rebuild(self):
+        with self.lock:
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            self._reset()
+            self._load()
+            if self._covered is not None:
+                self._scan_from(self._covered)
+
+    def _scan_from(self, pos):
+        cols = self._columns
+        entries = []
+        with open(self.ledger_filename, "rb") as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # still being written
+                offset = pos
+                pos += len(line)
+                row = next(csv.reader([line.decode("utf-8")]), None)
+                if not row or len(row) < len(cols):
+                    continue
+                try:
+                    micros = to_micros(row[cols["timestamp"]])
+                except ValueError:
+                    continue
+                tx_id = row[cols["tx_id"]]
+                for account_id in _accounts(row[cols["from_account_id"]], row[cols["to_account_id"]]):
+                    entries.append((tx_id, account_id, offset, micros))
+        self._append(entries)
+        self._covered = pos
+
+    def _append(self, entries):
+        if not entries:
+            return
+        with open(self.filename, "a", newline="") as f:
+            for tx_id, account_id, offset, micros in entries:
+                f.write(f"{tx_id},{account_id},{offset},{micros}\n")
+                self._remember(account_id, offset, micros)
+                self._last = (tx_id, offset)
+
+    def add(self, tx_id, offset, end, timestamp, from_id, to_id):
+        # Called by TransactionLogger right after it appended a row at offset
+        with self.lock:
+            self._ensure_loaded()
+            if self._covered != offset or os.stat(self.ledger_filename).st_ino != self._ledger_ino:
+                self.refresh() # something else wrote first; catch up instead
+                return
+            micros = to_micros(timestamp)
+            self._append([(str(tx_id), a, offset, micros) for a in _accounts(from_id, to_id)])
+            self._covered = end
+
+    def offsets(self, account_id, start=None, end=None):
+        # Offsets of the account's rows with start <= timestamp < end
+        with self.lock:
+            self.refresh()
+            offsets = self._offsets.get(account_id)
+            if offsets is None:
+                return []
+            times = self._times[account_id]
+            lo = bisect_left(times, to_micros(start)) if start is not None else 0
+            hi = bisect_left(times, to_micros(end)) if end is not None else len(times)
+            return offsets[lo:hi].tolist()
+
+    def rows(self, account_id, start=None, end=None):
+        offsets = self.offsets(account_id, start, end)
+        if not offsets:
+            return []
+        names = sorted(self._columns, key=self._columns.get)
+        rows = []
+        with open(self.ledger_filename, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                values = next(csv.reader([f.readline().decode("utf-8")]))
+                rows.append(dict(zip(names, values)))
+        return rows
+
+def _accounts(from_id, to_id):
+    ids = []
+    if from_id:
+        ids.append(from_id)
+    if to_id and to_id != from_id:
+        ids.append(to_id)
+    return ids
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Maintain the per-account index of a transactions ledger.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("ledger", nargs="?", default="transactions.csv")
+    args = parser.parse_args(argv)
+    index = LedgerIndex(args.ledger)
+    index.rebuild()
+    print(f"Indexed {sum(len(o) for o in index._offsets.values())} entries for "
+          f"{len(index._offsets)} accounts into {index.filename}")
+
+if __name__ == "__main__":
+    main()
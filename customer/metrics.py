@@ -0,0 +1,161 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, like Prometheus client defaults but reaching down
+# to the 100µs range single in-memory operations take
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+    # Opt-in counters and latency histograms. Pass one to Bank(metrics=...);
+    # without it nothing is wrapped or counted, so the default path is unchanged.
+    #
+    #     metrics = Metrics()
+    #     bank = Bank(metrics=metrics)
+    #     ...
+    #     print(metrics.render()) # Prometheus text format
+    #     metrics.snapshot()["counters"]['bank_operations_total{operation="deposit_money",outcome="ok"}']
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, slow_threshold=None, max_profiles=5):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self._counters = {} # (name, labels) -> value
+        self._histograms = {} # (name, labels) -> [bucket counts..., +Inf count, sum]
+        # cProfile capture: profile_next() arms it by hand; with slow_threshold
+        # an operation slower than that arms it for the next call of the same
+        # operation, whose profile is kept only if that call is slow too.
+        self.slow_threshold = slow_threshold
+        self.max_profiles = max_profiles
+        self.profiles = [] # (operation, seconds, pstats.Stats)
+        self._armed = set()
+        self._profiling = False
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, seconds)] += 1
+            counts[-1] += seconds
+
+    def profile_next(self, operation=None):
+        # Profile the next call of operation (of anything if None)
+        with self.lock:
+            self._armed.add(operation)
+
+    def _take_profile(self, operation):
+        with self.lock:
+            if self._profiling or len(self.profiles) >= self.max_profiles:
+                return False
+            for armed in (operation, None):
+                if armed in self._armed:
+                    self._armed.discard(armed)
+                    self._profiling = True # one at a time; cProfile can't nest
+                    return True
+        return False
+
+    def timed(self, func, histogram, name, counter=None, **labels):
+        # Wrap func so each call is observed in histogram; counter, if given,
+        # also counts calls by outcome. name identifies it for profiling.
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = cProfile.Profile() if self._armed and self._take_profile(name) else None
+            outcome = "error"
+            started = time.perf_counter()
+            try:
+                if profile:
+                    result = profile.runcall(func, *args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                self.observe(histogram, elapsed, **labels)
+                if counter:
+                    self.inc(counter, outcome=outcome, **labels)
+                if profile:
+                    self._keep_profile(name, elapsed, profile)
+                elif self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                    self.profile_next(name)
+        return wrapper
+
+    def _keep_profile(self, operation, elapsed, profile):
+        with self.lock:
+            self._profiling = False
+            if self.slow_threshold is not None and elapsed < self.slow_threshold:
+                self._armed.add(operation) # fast this time; try the next call
+                return
+            self.profiles.append((operation, elapsed, pstats.Stats(profile)))
+
+    def profile_report(self, limit=20):
+        out = io.StringIO()
+        for operation, elapsed, stats in list(self.profiles):
+            out.write(f"== {operation} took {elapsed * 1e3:.3f} ms ==\n")
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def reset(self):
+        with self.lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.profiles.clear()
+
+    def snapshot(self):
+        # Plain dicts keyed by Prometheus-style series names
+        with self.lock:
+            counters = {_series(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {}
+            for (name, labels), counts in self._histograms.items():
+                histograms[_series(name, labels)] = {
+                    "buckets": dict(zip(self.buckets + (float("inf"),), counts[:-1])),
+                    "count": sum(counts[:-1]),
+                    "sum": counts[-1],
+                }
+        return {"counters": counters, "histograms": histograms}
+
+    def render(self):
+        # Prometheus text exposition format
+        with self.lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(counts)) for key, counts in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{_series(name, labels)} {value}")
+        for (name, labels), counts in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{_series(name + '_bucket', labels + (('le', le),))} {cumulative}")
+            lines.append(f"{_series(name + '_sum', labels)} {counts[-1]!r}")
+            lines.append(f"{_series(name + '_count', labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def _series(name, labels):
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return f"{name}{{{inner}}}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
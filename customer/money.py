@@ -0,0 +1,63 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+# Money is kept as an int number of minor units (halalas/cents). Integer
+# arithmetic is exact and about as fast as float; Decimal only shows up at the
+# edges, when a balance is read or written out.
+MINOR_UNITS = 100
+
+def to_cents(value, exact=True):
+    # exact=True (amounts people give us): more than two decimal places is a
+    # ValueError, never silently rounded. exact=False is round_cents.
+    if type(value) is int: # fast path for the common case
+        return value * MINOR_UNITS
+    if type(value) is float and -1e13 < value < 1e13:
+        cents = round(value * MINOR_UNITS)
+        if cents / MINOR_UNITS == value: # value is exactly what "x.yy" parses to
+            return cents
+    if isinstance(value, Decimal):
+        scaled = value * MINOR_UNITS
+        cents = int(scaled) if scaled.is_finite() else None
+        if cents == scaled:
+            return cents
+        amount = value
+    elif isinstance(value, bool):
+        raise TypeError("Amount must be a number.")
+    elif isinstance(value, int):
+        return int(value) * MINOR_UNITS
+    elif isinstance(value, float):
+        amount = Decimal(repr(value)) # the shortest repr is what the user typed
+    elif isinstance(value, str):
+        try:
+            amount = Decimal(value.strip())
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+    else:
+        raise TypeError("Amount must be a number.")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    scaled = amount * MINOR_UNITS
+    cents = scaled.to_integral_value(ROUND_HALF_EVEN)
+    if exact and cents != scaled:
+        raise ValueError(f"Amount has more than two decimal places: {value!r}")
+    return int(cents)
+
+def round_cents(value):
+    # Money as stored by older versions, which wrote floats such as
+    # 0.30000000000000004: rounded half-even to the nearest cent
+    return to_cents(value, exact=False)
+
+def from_cents(cents):
+    if cents == 0:
+        return ZERO
+    return Decimal(cents).scaleb(-2)
+
+ZERO = Decimal(0).scaleb(-2)
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    units, minor = divmod(abs(cents), MINOR_UNITS)
+    return f"{sign}{units}.{minor:02d}"
+
+def format_money(value):
+    # Canonical text form used in bank.csv and transactions.csv, e.g. "-45.00"
+    return format_cents(to_cents(value))
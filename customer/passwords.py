@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMES = ("scrypt", "pbkdf2_sha256")
+SALT_BYTES = 16
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+class PasswordHasher:
+    # Salted password hashes, stored in the password column as
+    #     scrypt$<n>$<r>$<p>$<salt>$<hash>
+    #     pbkdf2_sha256$<iterations>$<salt>$<hash>
+    # The work factor (n for scrypt, iterations for PBKDF2) is tunable; hashes
+    # made with other settings still verify, and needs_rehash() tells when one
+    # should be replaced. Anything else in the column is a legacy plaintext
+    # password.
+
+    def __init__(self, scheme="scrypt", n=2**14, r=8, p=1, iterations=600_000):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password scheme: {scheme!r}")
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of 2")
+        self.scheme = scheme
+        self.n, self.r, self.p = n, r, p
+        self.iterations = iterations
+
+    def _params(self):
+        if self.scheme == "scrypt":
+            return ("scrypt", self.n, self.r, self.p)
+        return ("pbkdf2_sha256", self.iterations)
+
+    @staticmethod
+    def _derive(password, params, salt):
+        if params[0] == "scrypt":
+            _, n, r, p = params
+            return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r * p + 2**20, dklen=32)
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[1])
+
+    @staticmethod
+    def _parse(stored):
+        # (params, salt, hash) of a stored hash, or None for plaintext
+        parts = stored.split("$") if isinstance(stored, str) else ()
+        try:
+            if parts[0] == "scrypt" and len(parts) == 6:
+                params = ("scrypt", int(parts[1]), int(parts[2]), int(parts[3]))
+            elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+                params = ("pbkdf2_sha256", int(parts[1]))
+            else:
+                return None
+            return params, base64.b64decode(parts[-2], validate=True), base64.b64decode(parts[-1], validate=True)
+        except (IndexError, ValueError):
+            return None
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        params = self._params()
+        return "$".join([*map(str, params), _b64(salt), _b64(self._derive(password, params, salt))])
+
+    def is_hashed(self, stored):
+        return self._parse(stored) is not None
+
+    def verify(self, password, stored):
+        parsed = self._parse(stored)
+        if parsed is None: # legacy plaintext
+            return hmac.compare_digest(password.encode("utf-8"), str(stored).encode("utf-8"))
+        params, salt, expected = parsed
+        return hmac.compare_digest(self._derive(password, params, salt), expected)
+
+    def needs_rehash(self, stored):
+        parsed = self._parse(stored)
+        return parsed is None or parsed[0] != self._params()
+
+# Used by Bank when none is given
+DEFAULT_HASHER = PasswordHasher()
+
+class LoginCache:
+    # Remembers recent successful logins so checking the same password again
+    # skips the KDF. An entry is a keyed HMAC of (stored hash, password) per
+    # account: a different password or a changed hash never matches, and the
+    # password itself isn't kept. Entries expire after ttl seconds; past
+    # max_entries the least recently used go first. ttl=0 turns it off.
+
+    def __init__(self, max_entries=10_000, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._key = os.urandom(32) # per process; entries mean nothing elsewhere
+        self._entries = OrderedDict() # account_id -> (token, expires)
+
+    def _token(self, stored, password):
+        return hmac.new(self._key, f"{stored}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def check(self, account_id, stored, password):
+        if not self.ttl:
+            return False
+        with self.lock:
+            entry = self._entries.get(account_id)
+            if entry is None:
+                return False
+            if entry[1] <= self.clock():
+                del self._entries[account_id]
+                return False
+            self._entries.move_to_end(account_id)
+        return hmac.compare_digest(entry[0], self._token(stored, password))
+
+    def add(self, account_id, stored, password):
+        if not self.ttl or not self.max_entries:
+            return
+        token = self._token(stored, password)
+        with self.lock:
+            self._entries[account_id] = (token, self.clock() + self.ttl)
+            self._entries.move_to_end(account_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account_id):
+        with self.lock:
+            self._entries.pop(account_id, None)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
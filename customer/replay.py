@@ -0,0 +1,351 @@
+import argparse
+import csv
+import json
+import os
+
+from customer.bank_app import CheckingAccount, Customer, TransactionLogger
+from customer.ledger_index import to_micros
+from customer.money import format_cents, round_cents
+from customer.storage import CsvStorage
+
+CHECKPOINT_EVERY = 10_000 # ledger rows between checkpoints
+MAX_ANOMALIES = 1000 # kept per state; the rest are only counted
+STATE_FIELDS = ("balance_checking", "balance_savings", "overdraft_count", "is_active")
+
+def _cents(text):
+    # Ledger money is written by format_cents ("-12.05"); anything else goes the slow way
+    if len(text) > 3 and text[-3] == ".":
+        try:
+            return int(text[:-3] + text[-2:])
+        except ValueError:
+            pass
+    return round_cents(text or "0")
+
+class ReplayState:
+    # Every account as of one point in the ledger: after tx_id (0 for before
+    # the first row). Accounts are Customers with empty names so the same
+    # CheckingAccount/SavingsAccount rules apply; one the ledger never
+    # mentioned is all zeros and active.
+    def __init__(self):
+        self.tx_id = 0
+        self.timestamp = None
+        self.accounts = {}
+        self.anomalies = [] # (tx_id, account_id, message) for rows the rules wouldn't allow
+        self.anomaly_count = 0
+
+    def account(self, account_id):
+        customer = self.accounts.get(account_id)
+        if customer is None:
+            customer = self.accounts[account_id] = Customer(account_id, "", "", "")
+        return customer
+
+    def _side(self, account_id, account_type):
+        if not account_id:
+            raise ValueError("No account.")
+        if account_type == "checking":
+            return self.account(account_id).checking
+        if account_type == "savings":
+            return self.account(account_id).savings
+        raise ValueError(f"Invalid account type: {account_type!r}")
+
+    def _note(self, tx_id, account_id, message):
+        self.anomaly_count += 1
+        if len(self.anomalies) < MAX_ANOMALIES:
+            self.anomalies.append((tx_id, account_id, message))
+
+    def _withdraw(self, tx_id, account_id, account_type, amount, fee):
+        account = self._side(account_id, account_type)
+        try:
+            _, charged = account.withdraw_cents(amount)
+        except ValueError as e:
+            # The bank let it through, so it happened: apply it as recorded
+            self._note(tx_id, account_id, f"{e} Applied as recorded.")
+            account.balance_cents -= amount + fee
+            if fee and isinstance(account, CheckingAccount):
+                account.overdraft_count += 1
+                if account.overdraft_count >= 2:
+                    account.is_active = False
+            return account
+        if charged != fee:
+            self._note(tx_id, account_id, f"Fee {format_cents(fee)} recorded, rules charge {format_cents(charged)}.")
+        return account
+
+    def apply(self, row):
+        tx_id = int(row["tx_id"])
+        kind = row["type"]
+        from_id, to_id = row["from_account_id"], row["to_account_id"]
+        amount, fee = _cents(row["amount"]), _cents(row["fee"])
+        checked = None # the account resulting_balance belongs to
+        try:
+            if kind == "open": # a new customer's initial balance
+                checked = self._side(to_id, row["to_account_type"])
+                checked.balance_cents += amount
+            elif kind in ("deposit", "transfer_in"): # transfer_in/_out: the legs of a cross-shard transfer
+                checked = self._side(to_id, row["to_account_type"])
+                checked.deposit_cents(amount)
+            elif kind in ("withdraw", "transfer_out"):
+                checked = self._withdraw(tx_id, from_id, row["from_account_type"], amount, fee)
+            elif kind == "transfer":
+                checked = self._withdraw(tx_id, from_id, row["from_account_type"], amount, fee)
+                self._side(to_id, row["to_account_type"]).deposit_cents(amount)
+            elif kind == "reactivate":
+                checked = self._side(from_id, "checking")
+                if checked.is_active or checked.balance_cents < 0:
+                    self._note(tx_id, from_id, "Reactivated while active or overdrawn.")
+                checked.is_active = True
+                checked.overdraft_count = 0
+            else:
+                self._note(tx_id, from_id or to_id, f"Unknown transaction type {kind!r} skipped.")
+        except ValueError as e:
+            self._note(tx_id, from_id or to_id, str(e))
+        if checked is not None and checked.balance_cents != _cents(row["resulting_balance"]):
+            self._note(tx_id, from_id if kind in ("withdraw", "transfer", "transfer_out", "reactivate") else to_id,
+                       f"Resulting balance {row['resulting_balance']} recorded, "
+                       f"replay has {format_cents(checked.balance_cents)}.")
+        self.tx_id = tx_id
+        self.timestamp = row["timestamp"]
+
+    def row(self, account_id):
+        # The STATE_FIELDS of one account, formatted as Bank stores them
+        c = self.accounts.get(account_id) or Customer(account_id, "", "", "")
+        return {"account_id": account_id,
+                "balance_checking": format_cents(c.checking.balance_cents),
+                "balance_savings": format_cents(c.savings.balance_cents),
+                "overdraft_count": c.checking.overdraft_count,
+                "is_active": c.checking.is_active}
+
+    def rows(self):
+        return [self.row(account_id) for account_id in sorted(self.accounts)]
+
+    def to_json(self, offset=None):
+        return {"tx_id": self.tx_id, "timestamp": self.timestamp, "offset": offset,
+                "accounts": {a: [c.checking.balance_cents, c.savings.balance_cents,
+                                 c.checking.overdraft_count, c.checking.is_active]
+                             for a, c in self.accounts.items()},
+                "anomalies": self.anomalies, "anomaly_count": self.anomaly_count}
+
+    @classmethod
+    def from_json(cls, value):
+        state = cls()
+        state.tx_id = value["tx_id"]
+        state.timestamp = value["timestamp"]
+        for account_id, (checking, savings, overdrafts, active) in value["accounts"].items():
+            c = state.account(account_id)
+            c.checking.balance_cents, c.savings.balance_cents = checking, savings
+            c.checking.overdraft_count, c.checking.is_active = overdrafts, active
+        state.anomalies = [tuple(a) for a in value["anomalies"]]
+        state.anomaly_count = value["anomaly_count"]
+        return state
+
+class LedgerReplay:
+    # Rebuilds every account's balances, overdraft_count and is_active at any
+    # tx_id or timestamp by running the ledger through the account rules.
+    # Every `every` tx_ids a replay passes, the state is saved as a checkpoint
+    # in <ledger>.checkpoints/, and later queries start from the nearest one
+    # at or before their target instead of tx 1. Checkpoints are only a
+    # cache: one that no longer matches the ledger (it was replaced or
+    # rewritten) is dropped, along with everything after it.
+    #
+    # Works with any ledger that has iter_transactions(); for a plain
+    # transactions.csv a checkpoint also remembers its byte offset, so
+    # resuming doesn't even parse the rows before it. every=0 turns
+    # checkpoints off: every query replays from tx 1.
+
+    def __init__(self, tx_logger, directory=None, every=CHECKPOINT_EVERY):
+        self.ledger = tx_logger
+        self.directory = directory or tx_logger.filename + ".checkpoints"
+        self.every = every
+
+    def checkpoints(self):
+        # [(tx_id, micros, path)] oldest first
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            tx_id, _, micros = stem.partition("-")
+            if ext == ".json" and tx_id.isdigit() and micros.lstrip("-").isdigit():
+                found.append((int(tx_id), int(micros), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def _save(self, state, offset):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{state.tx_id:012d}-{to_micros(state.timestamp)}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(state.to_json(offset), f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def _drop_from(self, tx_id):
+        for found, _, path in self.checkpoints():
+            if found >= tx_id:
+                os.remove(path)
+
+    def _plain_csv(self):
+        return type(self.ledger) is TransactionLogger
+
+    def _csv_rows(self, offset):
+        # (row, offset of the next row) from a transactions.csv, starting at offset
+        with open(self.ledger.filename, "rb") as f:
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                return
+            names = next(csv.reader([header.decode("utf-8")]))
+            end = [max(offset or 0, len(header))]
+            f.seek(end[0])
+
+            def lines():
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return # still being written
+                    end[0] += len(line)
+                    yield line.decode("utf-8")
+
+            for values in csv.reader(lines()):
+                if len(values) >= len(names) and values[0].isdigit(): # skip torn or stray lines
+                    yield dict(zip(names, values)), end[0]
+
+    def _resumes(self, state, offset):
+        # Is the checkpoint still a prefix of the ledger? Its last row must
+        # sit where it was, with the same timestamp.
+        micros = to_micros(state.timestamp)
+        if self._plain_csv() and offset is not None:
+            with open(self.ledger.filename, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < offset:
+                    return False
+                f.seek(max(offset - 4096, 0))
+                tail = f.read(offset - f.tell()).rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+            values = next(csv.reader([tail.decode("utf-8", "replace")]), [])
+            return len(values) > 1 and values[0] == str(state.tx_id) and _same_time(values[1], micros)
+        for row in self.ledger.iter_transactions(start=state.timestamp):
+            if int(row["tx_id"]) >= state.tx_id:
+                return int(row["tx_id"]) == state.tx_id and _same_time(row["timestamp"], micros)
+        return False
+
+    def _rows_after(self, state, offset):
+        if self._plain_csv():
+            yield from self._csv_rows(offset)
+            return
+        rows = self.ledger.iter_transactions(start=state.timestamp) if state.tx_id else \
+            self.ledger.iter_transactions()
+        for row in rows:
+            if int(row["tx_id"]) > state.tx_id:
+                yield row, None
+
+    def _start(self, tx_id, micros):
+        # The newest usable checkpoint at or before the target, or a fresh state
+        for found, found_micros, path in reversed(self.checkpoints() if self.every else []):
+            if (tx_id is not None and found > tx_id) or (micros is not None and found_micros > micros):
+                continue
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                state = ReplayState.from_json(saved)
+            except (OSError, ValueError, KeyError, TypeError):
+                self._drop_from(found)
+                continue
+            if self._resumes(state, saved.get("offset")):
+                return state, saved.get("offset")
+            self._drop_from(found)
+        return ReplayState(), None
+
+    def state_at(self, tx_id=None, timestamp=None, save=True):
+        # State after row tx_id, or after the last row with timestamp <= timestamp
+        # (rows are in time order, as TransactionLogger writes them); the end of
+        # the ledger without either. save=False leaves the checkpoints alone.
+        micros = to_micros(timestamp) if timestamp is not None else None
+        state, offset = self._start(tx_id, micros)
+        newest = None
+        if save and self.every:
+            newest = max((found for found, _, _ in self.checkpoints()), default=0)
+        for row, offset in self._rows_after(state, offset):
+            if tx_id is not None and int(row["tx_id"]) > tx_id:
+                break
+            if micros is not None and to_micros(row["timestamp"]) > micros:
+                break
+            state.apply(row)
+            if newest is not None and state.tx_id % self.every == 0 and state.tx_id > newest:
+                self._save(state, offset)
+                newest = state.tx_id
+        return state
+
+    def checkpoint(self):
+        # Replay to the end of the ledger, saving every checkpoint on the way
+        return self.state_at()
+
+def _same_time(text, micros):
+    try:
+        return to_micros(text) == micros
+    except ValueError:
+        return False
+
+def _stored(row):
+    return {"balance_checking": format_cents(round_cents(row.get("balance_checking") or "0")),
+            "balance_savings": format_cents(round_cents(row.get("balance_savings") or "0")),
+            "overdraft_count": int(row.get("overdraft_count") or 0),
+            "is_active": row.get("is_active") != "False"}
+
+def diff(state, customer_rows):
+    # Differences between a replayed state and stored customer rows (e.g.
+    # Storage.load_customers(); later rows for an account win), as
+    # (account_id, field, stored, replayed). Accounts only in the ledger
+    # come out as (account_id, "account_id", None, account_id).
+    stored = {row["account_id"]: row for row in customer_rows}
+    mismatches = []
+    for account_id in sorted(stored):
+        have, replayed = _stored(stored[account_id]), state.row(account_id)
+        for field in STATE_FIELDS:
+            if have[field] != replayed[field]:
+                mismatches.append((account_id, field, have[field], replayed[field]))
+    for account_id in sorted(set(state.accounts) - set(stored)):
+        mismatches.append((account_id, "account_id", None, account_id))
+    return mismatches
+
+def check_bank(bank, replay=None):
+    # Replay bank's ledger and diff it against its stored customers. The slow
+    # part runs first without blocking the bank; then, with every operation
+    # held off, the last few rows are replayed from the fresh checkpoint and
+    # compared with what's stored, so no operation is caught half-written.
+    # Returns (mismatches, state).
+    replay = replay or LedgerReplay(bank.tx_logger)
+    replay.checkpoint()
+    with bank._gate.exclusive():
+        state = replay.state_at()
+        mismatches = diff(state, bank.storage.load_customers())
+    return mismatches, state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild balances from a transactions ledger.")
+    parser.add_argument("command", choices=["at", "check", "checkpoint"])
+    parser.add_argument("--ledger", default="transactions.csv")
+    parser.add_argument("--bank", default="bank.csv", help="customers to check against")
+    parser.add_argument("--journal", action="store_true", help="the bank keeps a journal")
+    parser.add_argument("--tx-id", type=int)
+    parser.add_argument("--timestamp", help="ISO date or time")
+    parser.add_argument("--account", action="append", help="only show these accounts")
+    parser.add_argument("--every", type=int, default=CHECKPOINT_EVERY, help="rows between checkpoints")
+    args = parser.parse_args(argv)
+    ledger = TransactionLogger(args.ledger)
+    replay = LedgerReplay(ledger, every=args.every)
+    if args.command == "checkpoint":
+        state = replay.checkpoint()
+        print(f"Replayed to tx {state.tx_id}; {len(replay.checkpoints())} checkpoints in {replay.directory}")
+        return 0
+    state = replay.state_at(args.tx_id, args.timestamp) if args.command == "at" else replay.checkpoint()
+    for tx_id, account_id, message in state.anomalies:
+        print(f"tx {tx_id} ({account_id}): {message}")
+    if state.anomaly_count > len(state.anomalies):
+        print(f"... {state.anomaly_count - len(state.anomalies)} more anomalies")
+    if args.command == "at":
+        print(f"As of tx {state.tx_id} ({state.timestamp or 'start'}):")
+        for row in state.rows() if not args.account else [state.row(a) for a in args.account]:
+            print(",".join(str(row[name]) for name in ("account_id",) + STATE_FIELDS))
+        return 0
+    mismatches = diff(state, CsvStorage(args.bank, ledger, args.journal).load_customers())
+    for account_id, field, stored, replayed in mismatches:
+        print(f"{account_id}: {field} is {stored} in {args.bank}, replay gives {replayed}")
+    print(f"{len(mismatches)} differences up to tx {state.tx_id}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+import argparse
+import base64
+import csv
+import gzip
+import hashlib
+import json
+import math
+import os
+from datetime import datetime
+
+from customer.bank_app import TransactionLogger, _file_signature
+from customer.ledger_index import to_micros
+
+class BloomFilter:
+    # Set membership with no false negatives; used to skip segments that can't
+    # mention an account
+    def __init__(self, bits, hashes, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_items(cls, items, error_rate=0.01):
+        items = set(items)
+        n = max(len(items), 1)
+        bits = max(64, int(-n * math.log(error_rate) / math.log(2) ** 2))
+        bloom = cls(bits, max(1, round(bits / n * math.log(2))))
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.data[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, item):
+        return all(self.data[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def to_json(self):
+        return {"bits": self.bits, "hashes": self.hashes, "data": base64.b64encode(bytes(self.data)).decode("ascii")}
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(value["bits"], value["hashes"], base64.b64decode(value["data"]))
+
+class SegmentedTransactionLogger(TransactionLogger):
+    # A TransactionLogger whose file only holds the current segment. When the
+    # period (a "month" or "day" of timestamps) changes or the file reaches
+    # max_bytes, it is closed into <filename>.segments/NNNNNN.csv (or .csv.gz
+    # with compress=True) and a fresh one is started. manifest.json next to the
+    # segments keeps each one's tx_id range, time range and a bloom filter of
+    # its accounts, so reads skip segments that can't match. Reads stream
+    # closed segments first, then the current file, in tx_id order.
+
+    PERIODS = {"month": 7, "day": 10, None: None} # length of the ISO timestamp prefix
+
+    def __init__(self, filename="transactions.csv", index=False, period="month", max_bytes=None, compress=False):
+        if period not in self.PERIODS:
+            raise ValueError(f"Unknown period: {period!r}")
+        self.period = period
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.segment_dir = filename + ".segments"
+        self.manifest_file = os.path.join(self.segment_dir, "manifest.json")
+        self._manifest = []
+        self._manifest_signature = None
+        self._active_key = None # (inode, period of the file's first row)
+        super().__init__(filename, index)
+        with self._state.lock:
+            self._recover()
+
+    def _load_manifest(self):
+        try:
+            signature = _file_signature(os.stat(self.manifest_file))
+        except FileNotFoundError:
+            self._manifest, self._manifest_signature = [], None
+            return self._manifest
+        if signature != self._manifest_signature:
+            with open(self.manifest_file) as f:
+                entries = json.load(f)
+            for entry in entries:
+                entry["bloom"] = BloomFilter.from_json(entry["accounts"])
+            self._manifest, self._manifest_signature = entries, signature
+        return self._manifest
+
+    def _save_manifest(self, entries):
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump([{k: v for k, v in e.items() if k != "bloom"} for e in entries], f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_file)
+
+    def _archived_last_tx_id(self):
+        manifest = self._load_manifest()
+        return manifest[-1]["last_tx_id"] if manifest else 0
+
+    def _recover(self):
+        # A crash after a segment was recorded but before the file was reset
+        # leaves rows that are already archived; drop them
+        archived = self._archived_last_tx_id()
+        first = self._first_row()
+        if archived and first and first[0].isdigit() and int(first[0]) <= archived:
+            self._reset_active()
+
+    def _first_row(self):
+        try:
+            with open(self.filename, newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                return next(reader, None)
+        except FileNotFoundError:
+            return None
+
+    def _period_of(self, timestamp):
+        length = self.PERIODS[self.period]
+        return timestamp[:length] if length else None
+
+    def _rotate_if_needed(self, state):
+        if self.period is None and self.max_bytes is None:
+            return
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            return
+        if self.max_bytes is not None and st.st_size >= self.max_bytes:
+            self._rotate(state)
+            return
+        if self.period is not None:
+            if self._active_key is None or self._active_key[0] != st.st_ino:
+                first = self._first_row()
+                if not first or len(first) < 2:
+                    return # nothing written to this segment yet
+                self._active_key = (st.st_ino, self._period_of(first[1]))
+            if self._active_key[1] != self._period_of(datetime.now().isoformat()):
+                self._rotate(state)
+
+    def rotate(self):
+        # Close the current segment now, whatever its size or period
+        with self._state.lock:
+            self._rotate(self._state)
+
+    def _rotate(self, state):
+        manifest = list(self._load_manifest())
+        os.makedirs(self.segment_dir, exist_ok=True)
+        name = f"{len(manifest) + 1:06d}.csv" + (".gz" if self.compress else "")
+        path = os.path.join(self.segment_dir, name)
+        accounts = set()
+        first_id = last_id = start = end = None
+        rows = 0
+        # One pass copies the complete rows and collects the manifest entry
+        with open(self.filename, "rb") as src, (gzip.open if self.compress else open)(path + ".tmp", "wb") as dst:
+            header = src.readline()
+            dst.write(header)
+            cols = {name: i for i, name in enumerate(next(csv.reader([header.decode("utf-8")]), []))}
+            for line in src if header.endswith(b"\n") else ():
+                if not line.endswith(b"\n"):
+                    break # torn; it was never acknowledged
+                values = next(csv.reader([line.decode("utf-8")]), None)
+                if not values or len(values) < len(cols) or not values[0].isdigit():
+                    continue
+                dst.write(line)
+                rows += 1
+                last_id, end = int(values[0]), values[cols["timestamp"]]
+                if first_id is None:
+                    first_id, start = last_id, end
+                for column in ("from_account_id", "to_account_id"):
+                    if values[cols[column]]:
+                        accounts.add(values[cols[column]])
+        if not rows:
+            os.remove(path + ".tmp")
+            return
+        os.replace(path + ".tmp", path)
+        manifest.append({"file": name, "first_tx_id": first_id, "last_tx_id": last_id, "rows": rows,
+                         "start": start, "end": end, "accounts": BloomFilter.for_items(accounts).to_json()})
+        self._save_manifest(manifest)
+        self._reset_active()
+        if state.next_id is not None:
+            state.next_id = max(state.next_id, last_id + 1)
+
+    def _reset_active(self):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w", newline="") as f:
+            csv.DictWriter(f, fieldnames=self.FIELDNAMES).writeheader()
+        os.replace(tmp, self.filename)
+        state = self._state
+        state.signature = _file_signature(os.stat(self.filename))
+        state.needs_newline = False
+        self._active_key = None
+
+    def segments(self, account_id=None, start=None, end=None):
+        # Paths of closed segments that may hold matching rows, oldest first
+        lo = to_micros(start) if start is not None else None
+        hi = to_micros(end) if end is not None else None
+        for entry in self._load_manifest():
+            if lo is not None and to_micros(entry["end"]) < lo:
+                continue
+            if hi is not None and to_micros(entry["start"]) >= hi:
+                continue
+            if account_id is not None and account_id not in entry["bloom"]:
+                continue
+            yield os.path.join(self.segment_dir, entry["file"])
+
+    def _read_segment(self, path, start, end):
+        lo = to_micros(start) if start is not None else None
+        hi = to_micros(end) if end is not None else None
+        with (gzip.open(path, "rt", newline="") if path.endswith(".gz") else open(path, newline="")) as f:
+            for row in csv.DictReader(f):
+                if lo is not None or hi is not None:
+                    micros = to_micros(row["timestamp"])
+                    if (lo is not None and micros < lo) or (hi is not None and micros >= hi):
+                        continue
+                yield row
+
+    def iter_transactions(self, start=None, end=None):
+        for path in list(self.segments(start=start, end=end)):
+            yield from self._read_segment(path, start, end)
+        yield from super().iter_transactions(start, end)
+
+    def get_transactions_for_customer(self, account_id, start=None, end=None):
+        tx_list = []
+        for path in list(self.segments(account_id, start, end)):
+            tx_list.extend(row for row in self._read_segment(path, start, end)
+                           if row.get("from_account_id") == account_id or row.get("to_account_id") == account_id)
+        tx_list.extend(super().get_transactions_for_customer(account_id, start, end))
+        return tx_list
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or rotate a segmented transactions ledger.")
+    parser.add_argument("command", choices=["list", "rotate"])
+    parser.add_argument("ledger", nargs="?", default="transactions.csv")
+    parser.add_argument("--compress", action="store_true", help="gzip the segment closed by rotate")
+    args = parser.parse_args(argv)
+    ledger = SegmentedTransactionLogger(args.ledger, period=None, compress=args.compress)
+    if args.command == "rotate":
+        ledger.rotate()
+    for entry in ledger._load_manifest():
+        print(f"{entry['file']}: tx {entry['first_tx_id']}-{entry['last_tx_id']} ({entry['rows']} rows), "
+              f"{entry['start']} .. {entry['end']}")
+
+if __name__ == "__main__":
+    main()
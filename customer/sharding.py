@@ -0,0 +1,491 @@
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future
+from zlib import crc32
+
+from customer import ids, passwords
+from customer.bank_app import Bank, TransactionLogger
+from customer.money import format_money
+
+class ShardCrashed(RuntimeError):
+    # The worker process owning a shard died before answering
+    pass
+
+def shard_of(account_id, shards):
+    return crc32(account_id.encode("utf-8")) % shards
+
+class _TransferLog:
+    # Durable state of cross-shard transfers: fsynced JSON lines
+    # {"xid", "state", ...}; the latest line for an xid wins and keeps the
+    # details of the earlier ones. A torn last line is cut off on open.
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.entries = {}
+        good = 0
+        if os.path.exists(filename):
+            with open(filename, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        entry = None
+                    if entry is None:
+                        break
+                    self.entries[entry["xid"]] = {**self.entries.get(entry["xid"], {}), **entry}
+                    good += len(line)
+            if good != os.path.getsize(filename):
+                os.truncate(filename, good)
+        self._file = open(filename, "a")
+
+    def write(self, xid, state, **details):
+        with self.lock:
+            entry = {"xid": xid, "state": state, **details}
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries[xid] = {**self.entries.get(xid, {}), **entry}
+
+    def state(self, xid):
+        entry = self.entries.get(xid)
+        return entry and entry["state"]
+
+    def compact(self, finished):
+        # Rewrite the log without the transfers whose state is in finished
+        with self.lock:
+            keep = {xid: e for xid, e in self.entries.items() if e["state"] not in finished}
+            tmp = self.filename + ".tmp"
+            with open(tmp, "w") as f:
+                for entry in keep.values():
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.filename)
+            self._file = open(self.filename, "a")
+            self.entries = keep
+
+    def close(self):
+        self._file.close()
+
+class _Shard:
+    # Runs inside a worker process: a Bank over the shard's own bank.csv and
+    # transactions.csv, plus this shard's side of cross-shard transfers.
+    #
+    # The receiving shard first records a "prepared" credit; the sending
+    # shard then debits the sender ("debited", or "refused" if the rules say
+    # no) and finally the credit is applied ("credited"). Each leg is a normal
+    # ledger row (transfer_out / transfer_in), applied with Bank.apply_leg.
+    # Before that row is written the leg is logged as "debiting"/"crediting"
+    # with the tx_id the ledger gave it and the account state it leads to, so
+    # a crash in the middle is settled on restart (Bank.settle_leg): the leg
+    # happened if and only if its ledger row is there.
+    BANK_CALLS = ("bulk_add_customers", "log_in", "deposit_money", "withdraw_money", "transfer_money",
+                  "reactivate_account", "generate_statement", "top_k_customers", "bottom_k_customers")
+    CALLS = ("customer", "balance", "prepare_credit", "debit", "commit_credit", "abort", "forget")
+    FINISHED = ("debited", "credited", "refused", "aborted")
+
+    def __init__(self, directory, options):
+        os.makedirs(directory, exist_ok=True)
+        self.bank = Bank(os.path.join(directory, "bank.csv"),
+                         TransactionLogger(os.path.join(directory, "transactions.csv")), **options)
+        self.transfers = _TransferLog(os.path.join(directory, "transfers.log"))
+        for xid in list(self.transfers.entries):
+            self._settled(xid)
+
+    def close(self):
+        self.transfers.close()
+        self.bank.close()
+
+    def customer(self, account_id):
+        return self.bank.customers.get(account_id)
+
+    def balance(self, account_id, account_type):
+        customer = self.bank.customers.get(account_id)
+        if not customer:
+            raise ValueError("Customer not found.")
+        if account_type not in ("checking", "savings"):
+            raise ValueError("Invalid account type.")
+        return getattr(customer, account_type).balance
+
+    def _leg(self, xid, leg, account_id, kind, account_type, amount, **tx_fields):
+        def prepare(tx_id, after):
+            self.transfers.write(xid, leg + "ing", account_id=account_id, tx_id=tx_id,
+                                 tx_type=tx_fields["tx_type"], after=after)
+        value = self.bank.apply_leg(account_id, kind, account_type, amount, prepare, **tx_fields)
+        self.transfers.write(xid, leg + "ed")
+        return value
+
+    def _settled(self, xid):
+        # The xid's state, after settling a leg interrupted halfway
+        state = self.transfers.state(xid)
+        if state not in ("debiting", "crediting"):
+            return state
+        entry, leg = self.transfers.entries[xid], state[:-3]
+        if self.bank.settle_leg(entry["account_id"], entry["tx_id"], entry["tx_type"], entry["after"]):
+            state = leg + "ed"
+        else:
+            state = "refused" if leg == "debit" else "prepared"
+        self.transfers.write(xid, state)
+        return state
+
+    def prepare_credit(self, xid, to_id, to_type, amount, from_id, from_type):
+        if self._settled(xid) is not None:
+            return
+        if to_id not in self.bank.customers:
+            raise ValueError("Sender or receiver not found.")
+        if to_type not in ("checking", "savings"):
+            raise ValueError("Invalid receiver account type.")
+        self.transfers.write(xid, "prepared", account_id=to_id, account_type=to_type, amount=amount,
+                             from_id=from_id, from_type=from_type)
+
+    def debit(self, xid, from_id, from_type, amount, to_id, to_type):
+        if self._settled(xid) is not None:
+            raise ValueError("Transfer was aborted.")
+        if from_id not in self.bank.customers:
+            self.transfers.write(xid, "refused")
+            raise ValueError("Sender or receiver not found.")
+        try:
+            new_balance, fee = self._leg(xid, "debit", from_id, "withdraw", from_type, amount,
+                                         tx_type="transfer_out", to_id=to_id, to_type=to_type)
+        except ValueError:
+            self.transfers.write(xid, "refused")
+            raise
+        return new_balance
+
+    def commit_credit(self, xid):
+        state = self._settled(xid)
+        if state == "credited":
+            return None
+        if state != "prepared":
+            raise RuntimeError(f"Transfer {xid} can't be credited, it is {state}.")
+        entry = self.transfers.entries[xid]
+        return self._leg(xid, "credit", entry["account_id"], "deposit", entry["account_type"], entry["amount"],
+                         tx_type="transfer_in", from_id=entry["from_id"], from_type=entry["from_type"])
+
+    def abort(self, xid):
+        # Abandon the transfer unless this shard already applied its leg;
+        # returns the final state. Also fences off a debit that arrives late.
+        state = self._settled(xid)
+        if state in ("debited", "credited"):
+            return state
+        if state != "aborted":
+            self.transfers.write(xid, "aborted")
+        return "aborted"
+
+    def forget(self):
+        self.transfers.compact(self.FINISHED)
+
+def _serve(directory, options, requests, replies):
+    # Worker process main loop: one request at a time, in arrival order
+    try:
+        shard = _Shard(directory, options)
+    except Exception as e:
+        replies.send((0, False, e))
+        return
+    replies.send((0, True, None))
+    try:
+        while True:
+            try:
+                message = requests.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            request_id, method, args = message
+            try:
+                if method in _Shard.BANK_CALLS:
+                    reply = (request_id, True, getattr(shard.bank, method)(*args))
+                elif method in _Shard.CALLS:
+                    reply = (request_id, True, getattr(shard, method)(*args))
+                else:
+                    raise AttributeError(f"Unknown shard call: {method!r}")
+            except Exception as e:
+                reply = (request_id, False, e)
+            try:
+                replies.send(reply)
+            except Exception as e: # e.g. an exception that doesn't pickle
+                replies.send((request_id, False, RuntimeError(repr(e))))
+    finally:
+        shard.close()
+
+class _Worker:
+    # The router's handle on one worker process. Requests are pipelined: any
+    # number of threads may submit, and a reader thread matches replies to
+    # their futures.
+    def __init__(self, context, index, directory, options):
+        self.index = index
+        requests_end, self._requests = context.Pipe(duplex=False)
+        self._replies, replies_end = context.Pipe(duplex=False)
+        self.process = context.Process(target=_serve, args=(directory, options, requests_end, replies_end),
+                                       name=f"bank-shard-{index}", daemon=True)
+        self.process.start()
+        requests_end.close()
+        replies_end.close()
+        self.alive = True
+        self._lock = threading.Lock()
+        self._pending = {0: Future()} # request id -> Future; 0 is the startup reply
+        self._ids = itertools.count(1)
+        self._reader = threading.Thread(target=self._read, name=f"bank-shard-{index}-replies", daemon=True)
+        self._reader.start()
+        self._pending[0].result()
+
+    def _read(self):
+        while True:
+            try:
+                request_id, ok, value = self._replies.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(request_id)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        with self._lock:
+            self.alive = False
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ShardCrashed(f"Shard {self.index} stopped."))
+
+    def submit(self, method, *args):
+        # Raises ShardCrashed only if nothing was sent, so the call can be retried
+        future = Future()
+        with self._lock:
+            if self.alive and not self.process.is_alive(): # before the reader sees EOF
+                self.alive = False
+            if not self.alive:
+                raise ShardCrashed(f"Shard {self.index} stopped.")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                self._requests.send((request_id, method, args))
+            except OSError:
+                del self._pending[request_id]
+                self.alive = False
+                raise ShardCrashed(f"Shard {self.index} stopped.")
+        return future
+
+    def stop(self):
+        with self._lock:
+            if self.alive:
+                try:
+                    self._requests.send(None)
+                except OSError:
+                    pass
+        self.process.join()
+        self._reader.join()
+        self._requests.close()
+        self._replies.close()
+
+class ShardedBank:
+    # Customers partitioned by a hash of account_id over `shards` worker
+    # processes. Each worker runs an ordinary Bank over its own files in
+    # <directory>/shard<i>/, so the shards work in parallel on separate cores
+    # and files. Operations on one account go to the shard that owns it, and
+    # account ids come from one allocator here so they stay unique.
+    #
+    # A transfer between shards is a two-phase commit coordinated from here,
+    # with its progress in <directory>/transfers.log:
+    #   begun -> the receiving shard prepares the credit -> the sending shard
+    #   debits the sender (the commit point) -> committed -> the receiver is
+    #   credited -> done
+    # If either shard refuses before the debit, both are told to abort. A
+    # crashed worker is restarted on next use; recover() (run on start and
+    # after a restart) finishes every transfer left halfway: it commits those
+    # whose debit happened and aborts the rest, so money is never created or
+    # lost. The number of shards is fixed when the directory is created.
+    #
+    # bank_options go to every shard's Bank (journal, fsync_every,
+    # password_hasher, ...) and must pickle.
+
+    def __init__(self, directory="shards", shards=None, **bank_options):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shards = self._shard_count(shards or os.cpu_count() or 1)
+        bank_options.setdefault("password_hasher", passwords.DEFAULT_HASHER)
+        self.password_hasher = bank_options["password_hasher"]
+        self.bank_options = bank_options
+        self._context = multiprocessing.get_context("spawn") # no fork with our threads running
+        self._ids = ids.id_allocator(os.path.join(directory, "ids"))
+        self._transfers = _TransferLog(os.path.join(directory, "transfers.log"))
+        self._active = set() # xids a thread here is still driving
+        self._lock = threading.RLock()
+        self._workers = [None] * self.shards
+        self._closed = False
+        for i in range(self.shards):
+            self._workers[i] = self._start(i)
+        self.recover()
+
+    def _shard_count(self, shards):
+        path = os.path.join(self.directory, "shards.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                existing = json.load(f)["shards"]
+            if existing != shards:
+                raise ValueError(f"{self.directory} has {existing} shards; resharding isn't supported.")
+            return existing
+        with open(path + ".tmp", "w") as f:
+            json.dump({"shards": shards}, f)
+        os.replace(path + ".tmp", path)
+        return shards
+
+    def _start(self, i):
+        return _Worker(self._context, i, os.path.join(self.directory, f"shard{i}"), self.bank_options)
+
+    def _worker(self, i):
+        worker = self._workers[i]
+        if worker.alive:
+            return worker
+        with self._lock:
+            if self._closed:
+                raise ShardCrashed(f"Shard {i} stopped.")
+            if not self._workers[i].alive:
+                self._workers[i].stop()
+                self._workers[i] = self._start(i)
+                self.recover()
+            return self._workers[i]
+
+    def _submit(self, i, method, *args):
+        try:
+            return self._worker(i).submit(method, *args)
+        except ShardCrashed: # nothing was sent: restart the worker and try once more
+            return self._worker(i).submit(method, *args)
+
+    def _call(self, i, method, *args):
+        return self._submit(i, method, *args).result()
+
+    def shard_of(self, account_id):
+        return shard_of(account_id, self.shards)
+
+    def _route(self, method, account_id, *args):
+        return self._call(self.shard_of(account_id), method, account_id, *args)
+
+    # Transfers between shards
+
+    def recover(self):
+        # Finish every transfer left halfway by a crash (here or in a worker)
+        with self._lock:
+            for xid, entry in list(self._transfers.entries.items()):
+                if entry["state"] not in ("done", "aborted") and xid not in self._active:
+                    self._resolve(xid)
+            if not self._active: # everything settled: nothing needs the logs any more
+                self._transfers.compact(("done", "aborted"))
+                for worker in self._workers:
+                    if worker is not None and worker.alive:
+                        worker.submit("forget").result()
+
+    def _resolve(self, xid):
+        # Drive an unfinished transfer to its end; True if it went through
+        entry = self._transfers.entries[xid]
+        if entry["state"] == "begun":
+            # Fencing the sender settles it: either its debit happened, or now it never will
+            if self._call(entry["from_shard"], "abort", xid) == "debited":
+                self._transfers.write(xid, "committed")
+            else:
+                self._call(entry["to_shard"], "abort", xid)
+                self._transfers.write(xid, "aborted")
+                return False
+        if self._transfers.state(xid) == "committed":
+            self._call(entry["to_shard"], "commit_credit", xid)
+            self._transfers.write(xid, "done")
+        return self._transfers.state(xid) == "done"
+
+    def _transfer_between_shards(self, a, b, from_id, from_type, to_id, to_type, amount):
+        amount = format_money(amount) # the sending shard checks it like any withdrawal
+        xid = uuid.uuid4().hex
+        with self._lock: # not while recover() may be compacting the logs
+            self._active.add(xid)
+        try:
+            self._transfers.write(xid, "begun", from_shard=a, to_shard=b)
+            try:
+                self._call(b, "prepare_credit", xid, to_id, to_type, amount, from_id, from_type)
+                sender_new = self._call(a, "debit", xid, from_id, from_type, amount, to_id, to_type)
+                self._transfers.write(xid, "committed")
+                receiver_new = self._call(b, "commit_credit", xid)
+                self._transfers.write(xid, "done")
+                return sender_new, receiver_new
+            except ValueError:
+                self._resolve(xid) # aborts: nothing was debited
+                raise
+            except ShardCrashed:
+                # Settle it now so the caller learns the outcome
+                if not self._resolve(xid):
+                    raise
+                return (self._call(a, "balance", from_id, from_type), self._call(b, "balance", to_id, to_type))
+        finally:
+            with self._lock:
+                self._active.discard(xid)
+
+    # Bank API
+
+    def add_new_customer(self, first_name, last_name, password, initial_checking=0, initial_savings=0):
+        return self.bulk_add_customers([{"first_name": first_name, "last_name": last_name, "password": password,
+                                         "initial_checking": initial_checking,
+                                         "initial_savings": initial_savings}])[0]
+
+    def bulk_add_customers(self, customers, prehashed=False):
+        # Like Bank.bulk_add_customers: passwords are checked for every entry
+        # first, then each shard adds (and hashes) its share in parallel. Each
+        # shard's share is all or nothing; the batch as a whole only up to I/O
+        # errors.
+        customers = list(customers)
+        Bank._check_passwords(customers, self.password_hasher, prehashed)
+        if not customers:
+            return []
+        new_ids = [str(i) for i in self._ids.reserve(len(customers))]
+        groups = {}
+        for account_id, entry in zip(new_ids, customers):
+            groups.setdefault(self.shard_of(account_id), []).append({**entry, "account_id": account_id})
+        futures = [self._submit(i, "bulk_add_customers", entries, prehashed) for i, entries in groups.items()]
+        for future in futures:
+            future.result()
+        return new_ids
+
+    def log_in(self, account_id, password):
+        return self._route("log_in", account_id, password)
+
+    def deposit_money(self, account_id, account_type, amount):
+        return self._route("deposit_money", account_id, account_type, amount)
+
+    def withdraw_money(self, account_id, account_type, amount):
+        return self._route("withdraw_money", account_id, account_type, amount)
+
+    def transfer_money(self, from_id, from_type, to_id, to_type, amount):
+        a, b = self.shard_of(from_id), self.shard_of(to_id)
+        if a == b:
+            return self._call(a, "transfer_money", from_id, from_type, to_id, to_type, amount)
+        return self._transfer_between_shards(a, b, from_id, from_type, to_id, to_type, amount)
+
+    def reactivate_account(self, account_id, account_type):
+        return self._route("reactivate_account", account_id, account_type)
+
+    def generate_statement(self, account_id, start=None, end=None):
+        return self._route("generate_statement", account_id, start, end)
+
+    def customer(self, account_id):
+        # A copy of the customer as its shard has it, or None
+        return self._route("customer", account_id)
+
+    def top_k_customers(self, k):
+        futures = [self._submit(i, "top_k_customers", k) for i in range(self.shards)]
+        candidates = [c for future in futures for c in future.result()]
+        return heapq.nlargest(k, candidates, key=Bank._total_cents)
+
+    def top_3_customers(self):
+        return self.top_k_customers(3)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.recover()
+            self._closed = True
+            for worker in self._workers:
+                worker.stop()
+            self._transfers.close()
+            self._ids.release()
@@ -0,0 +1,162 @@
+import csv
+import os
+from zlib import crc32
+
+# tempfile and concurrent.futures are imported where they are used: they
+# cost more than the rest of the bank at startup and only bulk runs need them
+
+PROGRESS_FILENAME = ".statements.progress"
+
+def statement_filename(account_id, directory="."):
+    return os.path.join(directory, f"{account_id}_statement.txt")
+
+def write_statement(filename, customer, tx_list):
+    with open(filename, "w") as f:
+        f.write(f"Customer: {customer.first_name} {customer.last_name}\n")
+        f.write(f"Checking Balance: {customer.checking.balance}\n")
+        f.write(f"Savings Balance: {customer.savings.balance}\n")
+        f.write(f"Overdrafts: {customer.checking.overdraft_count}\n")
+        f.write("Transactions:\n")
+        for tx in tx_list:
+            f.write(
+                f"{tx['timestamp']} | {tx['type']} | Amount: {tx['amount']} | Fee: {tx['fee']} | Balance: {tx['resulting_balance']}\n"
+            )
+
+def generate_all_statements(bank, start=None, end=None, directory=".", workers=4,
+                            spill_rows=500_000, buckets=64, progress=None):
+    # One pass over the ledger instead of one per account. Rows are grouped by
+    # account in memory; past spill_rows buffered rows they are spilled to
+    # bucket files (accounts hashed over buckets) and each bucket is then
+    # grouped on its own, so memory stays around spill_rows rows.
+    #
+    # Statements are written by a pool of worker threads. Finished accounts
+    # are recorded in PROGRESS_FILENAME, so running again for the same period
+    # after an interruption skips them; the file is removed once all are done.
+    # progress(done, total) is called after each statement.
+    import tempfile
+    os.makedirs(directory, exist_ok=True)
+    run = _StatementRun(bank, start, end, directory, workers, progress)
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as spill_dir:
+            groups = {}
+            buffered = 0
+            spill = None
+            fieldnames = None
+            for row in bank.tx_logger.iter_transactions(start, end):
+                if fieldnames is None:
+                    fieldnames = list(row)
+                from_id, to_id = row.get("from_account_id"), row.get("to_account_id")
+                for account_id in (from_id, to_id) if to_id != from_id else (from_id,):
+                    if account_id and account_id not in run.done:
+                        groups.setdefault(account_id, []).append(row)
+                        buffered += 1
+                if buffered >= spill_rows:
+                    spill = spill or _Spill(spill_dir, buckets, fieldnames)
+                    spill.write(groups)
+                    groups = {}
+                    buffered = 0
+            if spill is None:
+                run.write(groups)
+            else:
+                spill.write(groups)
+                groups = None
+                for bucket in spill.close():
+                    run.write(bucket)
+            # Customers without a transaction in the period still get a statement
+            run.write({account_id: [] for account_id in list(bank.customers) if account_id not in run.done})
+            run.wait()
+    finally:
+        run.close()
+    os.remove(run.progress_file) # complete; a new run starts from scratch
+    return run.written
+
+class _Spill:
+    def __init__(self, directory, buckets, fieldnames):
+        self.fieldnames = fieldnames
+        self.names = [os.path.join(directory, f"bucket{i}.csv") for i in range(buckets)]
+        self.files = [open(name, "w", newline="") for name in self.names]
+        self.writers = [csv.writer(f) for f in self.files]
+
+    def write(self, groups):
+        for account_id, rows in groups.items():
+            writer = self.writers[crc32(account_id.encode("utf-8")) % len(self.writers)]
+            for row in rows:
+                writer.writerow([account_id] + [row[name] for name in self.fieldnames])
+
+    def close(self):
+        # Yield each bucket grouped by account, rows still in ledger order
+        for f in self.files:
+            f.close()
+        for name in self.names:
+            groups = {}
+            with open(name, newline="") as f:
+                for values in csv.reader(f):
+                    groups.setdefault(values[0], []).append(dict(zip(self.fieldnames, values[1:])))
+            os.remove(name)
+            yield groups
+
+class _StatementRun:
+    def __init__(self, bank, start, end, directory, workers, progress):
+        self.bank = bank
+        self.directory = directory
+        self.progress = progress
+        self.workers = workers
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="statements")
+        self.in_flight = set()
+        self.done = set() # accounts finished or queued
+        self.progress_file = os.path.join(directory, PROGRESS_FILENAME)
+        period = f"period {start} {end}\n"
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file) as f:
+                lines = f.read().splitlines(keepends=True)
+            if lines and lines[0] == period: # same run; the last line may be torn
+                self.done.update(line[:-1] for line in lines[1:] if line.endswith("\n"))
+        self.log = open(self.progress_file, "a" if self.done else "w")
+        if not self.done:
+            self.log.write(period)
+            self.log.flush()
+        self.written = 0 # by this run
+        self.completed = len(self.done)
+        self.total = len(bank.customers)
+
+    def _write_one(self, account_id, tx_list):
+        customer = self.bank.customers.get(account_id)
+        if customer is None: # a ledger row for an account that no longer exists
+            return None
+        filename = statement_filename(account_id, self.directory)
+        write_statement(filename + ".tmp", customer, tx_list)
+        os.replace(filename + ".tmp", filename)
+        return account_id
+
+    def write(self, groups):
+        for account_id, tx_list in groups.items():
+            if account_id in self.done:
+                continue
+            self.done.add(account_id)
+            while len(self.in_flight) >= 4 * self.workers:
+                from concurrent.futures import FIRST_COMPLETED
+                self._collect(FIRST_COMPLETED)
+            self.in_flight.add(self.pool.submit(self._write_one, account_id, tx_list))
+
+    def _collect(self, return_when):
+        from concurrent.futures import wait
+        finished, self.in_flight = wait(self.in_flight, return_when=return_when)
+        for future in finished:
+            account_id = future.result()
+            if account_id is None:
+                continue
+            self.log.write(account_id + "\n") # only once the file is in place
+            self.log.flush()
+            self.written += 1
+            self.completed += 1
+            if self.progress:
+                self.progress(self.completed, self.total)
+
+    def wait(self):
+        from concurrent.futures import ALL_COMPLETED
+        self._collect(ALL_COMPLETED)
+
+    def close(self):
+        self.pool.shutdown()
+        self.log.close()
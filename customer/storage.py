@@ -0,0 +1,451 @@
+import csv
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+
+from customer.journal import CustomerJournal
+from customer.money import format_cents, round_cents, to_cents
+
+CUSTOMER_FIELDNAMES = ["account_id", "first_name", "last_name", "password",
+                       "balance_checking", "balance_savings", "overdraft_count", "is_active"]
+
+class Storage:
+    # Where a Bank keeps its customers and ledger. Rows are dicts keyed by
+    # CUSTOMER_FIELDNAMES; the ledger is exposed as tx_logger with the same
+    # log()/get_transactions_for_customer() API as TransactionLogger.
+    tx_logger = None
+    metrics = None
+    ids_filename = None # where ids.IdAllocator keeps its high-water mark
+
+    def instrument(self, metrics):
+        # Time the write paths of this instance; backends count rows and bytes
+        # themselves once self.metrics is set
+        if self.metrics is metrics:
+            return
+        self.metrics = metrics
+        for name in ("save_customers", "save_changed", "append_customers", "compact"):
+            setattr(self, name, metrics.timed(getattr(self, name), "storage_call_seconds", name, call=name))
+        instrument = getattr(self.tx_logger, "instrument", None)
+        if instrument:
+            instrument(metrics)
+
+    def load_customers(self):
+        raise NotImplementedError
+
+    def save_customers(self, rows):
+        # Replace every stored customer with rows
+        raise NotImplementedError
+
+    def save_changed(self, rows, get_all_rows):
+        # Persist just these customers after a single operation. get_all_rows is
+        # there for backends that can only write the whole set.
+        raise NotImplementedError
+
+    def append_customers(self, rows):
+        # Persist customers that don't exist yet, all or none; rows may be a
+        # generator and is consumed once
+        raise NotImplementedError
+
+    def transaction(self):
+        # Groups ledger rows and customer updates into one atomic unit, if the
+        # backend can; nested calls join the outer one.
+        return nullcontext()
+
+    def top_customers(self, k):
+        # Account ids of the k richest customers, or None to let Bank sort
+        return None
+
+    def compact(self, get_rows, freeze=nullcontext):
+        # freeze() is held while rows are captured, so no operation is half-applied
+        pass
+
+    def close(self):
+        pass
+
+class CsvStorage(Storage):
+    def __init__(self, filename, tx_logger, journal=False, fsync_every=1):
+        self.filename = filename
+        self.tx_logger = tx_logger
+        # journal=True appends changed customers to <filename>.journal instead of
+        # rewriting the whole file; compact() folds it back into the snapshot.
+        self.journal = CustomerJournal(filename + ".journal", CUSTOMER_FIELDNAMES, fsync_every) if journal else None
+        self.ids_filename = filename + ".ids"
+        self._compact_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load_customers(self):
+        count = 0
+        if os.path.exists(self.filename):
+            with open(self.filename, "r") as f:
+                for row in csv.DictReader(_complete_lines(f)):
+                    count += 1
+                    yield row
+        if self.journal:
+            for row in self.journal.replay(): # later rows win
+                count += 1
+                yield row
+        if self.metrics is not None:
+            names = [self.filename] + ([self.journal.old_filename, self.journal.filename] if self.journal else [])
+            self.metrics.inc("customer_rows_read_total", count)
+            self.metrics.inc("customer_bytes_read_total", sum(os.path.getsize(n) for n in names if os.path.exists(n)))
+
+    def _write_snapshot(self, get_rows):
+        # Rows are taken under the write lock, so snapshots land in the order
+        # they were captured and an older table never replaces a newer one
+        tmp = self.filename + ".tmp"
+        with self._write_lock:
+            rows = get_rows()
+            with open(tmp, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=CUSTOMER_FIELDNAMES)
+                writer.writeheader()
+                tally = [0]
+                writer.writerows(_counted(rows, tally) if self.metrics is not None else rows)
+                if self.journal: # the journal is discarded once this is on disk
+                    f.flush()
+                    os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(tmp, self.filename)
+        if self.metrics is not None:
+            self.metrics.inc("customer_rows_written_total", tally[0])
+            self.metrics.inc("customer_bytes_written_total", size)
+
+    def save_customers(self, rows):
+        if self.journal:
+            self.compact(lambda: rows)
+        else:
+            self._write_snapshot(lambda: rows)
+
+    def save_changed(self, rows, get_all_rows):
+        if self.journal:
+            size = self.journal.append(rows)
+            if self.metrics is not None:
+                self.metrics.inc("customer_rows_written_total", len(rows))
+                self.metrics.inc("customer_bytes_written_total", size)
+        else:
+            self._write_snapshot(get_all_rows)
+
+    def append_customers(self, rows):
+        # New rows go on the end of the snapshot (or journal) in one write
+        # instead of rewriting it. A torn append is cut off again before the
+        # next one and never loaded, so it is as if it didn't happen.
+        if self.journal:
+            self.save_changed(list(rows), None) # one commit group
+            return
+        with self._write_lock:
+            _cut_torn_tail(self.filename)
+            with open(self.filename, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=CUSTOMER_FIELDNAMES)
+                if f.tell() == 0:
+                    writer.writeheader()
+                start = f.tell()
+                tally = [0]
+                writer.writerows(_counted(rows, tally))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell() - start
+        if self.metrics is not None:
+            self.metrics.inc("customer_rows_written_total", tally[0])
+            self.metrics.inc("customer_bytes_written_total", size)
+
+    def compact(self, get_rows, freeze=nullcontext):
+        # Fold the journal into a fresh snapshot. Rows are captured and the journal
+        # rotated under its lock; the slow snapshot write happens outside it.
+        # A crash at any point replays to the same state on the next load.
+        if not self.journal:
+            return
+        with self._compact_lock:
+            with freeze(), self.journal.lock:
+                rows = list(get_rows())
+                self.journal.rotate()
+            self._write_snapshot(lambda: rows)
+            self.journal.discard_old()
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+
+def _complete_lines(f):
+    # Lines of f, minus a last one without its newline (a torn append)
+    for line in f:
+        if line.endswith("\n"):
+            yield line
+
+def _cut_torn_tail(filename):
+    try:
+        f = open(filename, "rb+")
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return
+        # scan back to the last complete line
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+def _counted(rows, tally):
+    for row in rows:
+        tally[0] += 1
+        yield row
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    account_id TEXT PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT,
+    password TEXT,
+    balance_checking INTEGER,
+    balance_savings INTEGER,
+    overdraft_count INTEGER DEFAULT 0,
+    is_active INTEGER DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS customers_total ON customers ((balance_checking + balance_savings) DESC);
+CREATE TABLE IF NOT EXISTS transactions (
+    tx_id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    type TEXT,
+    from_account_id TEXT,
+    from_account_type TEXT,
+    to_account_id TEXT,
+    to_account_type TEXT,
+    amount INTEGER,
+    fee INTEGER,
+    resulting_balance INTEGER
+);
+CREATE INDEX IF NOT EXISTS transactions_from ON transactions (from_account_id, timestamp);
+CREATE INDEX IF NOT EXISTS transactions_to ON transactions (to_account_id, timestamp);
+"""
+
+# Money columns hold integer minor units. Databases from before user_version 1
+# stored major units and are converted once when opened.
+_SCHEMA_VERSION = 1
+_TO_CENTS = """
+UPDATE customers SET balance_checking = CAST(ROUND(balance_checking * 100) AS INTEGER),
+                     balance_savings = CAST(ROUND(balance_savings * 100) AS INTEGER);
+UPDATE transactions SET amount = CAST(ROUND(amount * 100) AS INTEGER),
+                        fee = CAST(ROUND(fee * 100) AS INTEGER),
+                        resulting_balance = CAST(ROUND(resulting_balance * 100) AS INTEGER);
+"""
+_MONEY_COLUMNS = ("amount", "fee", "resulting_balance")
+
+def _iso(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, datetime.min.time())
+    return value.isoformat()
+
+class SqliteLedger:
+    FIELDNAMES = ["tx_id", "timestamp", "type", "from_account_id", "from_account_type",
+                  "to_account_id", "to_account_type", "amount", "fee", "resulting_balance"]
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.filename = storage.path
+
+    def log(self, tx_type, from_id=None, from_type=None, to_id=None, to_type=None, amount=0, fee=0, resulting_balance=0,
+            cents=False, before_write=None):
+        # before_write(tx_id) runs before the insert commits; raising rolls it back
+        money = int if cents else to_cents
+        with self.storage.transaction() as conn:
+            tx_id = conn.execute(
+                "INSERT INTO transactions (timestamp, type, from_account_id, from_account_type,"
+                " to_account_id, to_account_type, amount, fee, resulting_balance)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(), tx_type, from_id or "", from_type or "",
+                 to_id or "", to_type or "", money(amount), money(fee), money(resulting_balance))).lastrowid
+            if before_write is not None:
+                before_write(tx_id)
+        return tx_id
+
+    @staticmethod
+    def _row(tx):
+        money = int if tx.get("cents") else to_cents
+        return (datetime.now().isoformat(), tx["tx_type"], tx.get("from_id") or "", tx.get("from_type") or "",
+                tx.get("to_id") or "", tx.get("to_type") or "", money(tx.get("amount") or 0),
+                money(tx.get("fee") or 0), money(tx.get("resulting_balance") or 0))
+
+    def log_many(self, txs):
+        rows = map(self._row, txs)
+        with self.storage.transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT INTO transactions (timestamp, type, from_account_id, from_account_type,"
+                " to_account_id, to_account_type, amount, fee, resulting_balance)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return cursor.rowcount
+
+    def get_transactions_for_customer(self, account_id, start=None, end=None):
+        sql = "SELECT * FROM transactions WHERE (from_account_id = ? OR to_account_id = ?)"
+        params = [account_id, account_id]
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_iso(start))
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(_iso(end))
+        with self.storage.lock:
+            rows = self.storage.conn.execute(sql + " ORDER BY tx_id", params).fetchall()
+        return [self._row_dict(row) for row in rows]
+
+    def iter_transactions(self, start=None, end=None, chunk_size=10000):
+        # Every row with start <= timestamp < end in tx_id order, fetched in
+        # chunks so writers aren't locked out for the whole read
+        sql = "SELECT * FROM transactions WHERE tx_id > ?"
+        params = []
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_iso(start))
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(_iso(end))
+        last = 0
+        while True:
+            with self.storage.lock:
+                rows = self.storage.conn.execute(
+                    sql + " ORDER BY tx_id LIMIT ?", [last, *params, chunk_size]).fetchall()
+            for row in rows:
+                yield self._row_dict(row)
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    def _row_dict(self, row):
+        # Same shape as csv.DictReader rows so callers can't tell the backends apart
+        tx = {name: "" if value is None else str(value) for name, value in zip(self.FIELDNAMES, row)}
+        for name in _MONEY_COLUMNS:
+            tx[name] = format_cents(int(tx[name] or 0))
+        return tx
+
+class SqliteStorage(Storage):
+    # Customers and ledger in one SQLite database (WAL mode). Every Bank operation
+    # runs as a single transaction, so a transfer is all-or-nothing on disk.
+
+    def __init__(self, path="bank.db"):
+        self.path = path
+        self.lock = threading.RLock()
+        import sqlite3 # CSV banks never load it
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            self.conn.executescript("BEGIN;" + _TO_CENTS + f"PRAGMA user_version = {_SCHEMA_VERSION}; COMMIT;")
+        self._depth = 0
+        self.tx_logger = SqliteLedger(self)
+        self.ids_filename = path + ".ids"
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+
+    def load_customers(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM customers ORDER BY rowid").fetchall()
+        for row in rows:
+            row = dict(zip(CUSTOMER_FIELDNAMES, row))
+            row["balance_checking"] = format_cents(row["balance_checking"])
+            row["balance_savings"] = format_cents(row["balance_savings"])
+            row["is_active"] = "True" if row["is_active"] else "False"
+            yield row
+
+    def _upsert(self, conn, rows):
+        conn.executemany(
+            "INSERT OR REPLACE INTO customers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((r["account_id"], r["first_name"], r["last_name"], r["password"],
+              round_cents(r["balance_checking"]), round_cents(r["balance_savings"]), int(r["overdraft_count"]),
+              1 if r["is_active"] in (True, "True") else 0) for r in rows))
+
+    def save_customers(self, rows):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM customers")
+            self._upsert(conn, rows)
+
+    def save_changed(self, rows, get_all_rows):
+        with self.transaction() as conn:
+            self._upsert(conn, rows)
+
+    def append_customers(self, rows):
+        with self.transaction() as conn:
+            self._upsert(conn, rows)
+
+    def top_customers(self, k):
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT account_id FROM customers ORDER BY balance_checking + balance_savings DESC LIMIT ?", (k,))]
+
+    def compact(self, get_rows, freeze=nullcontext):
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def migrate_csv_to_sqlite(bank_csv="bank.csv", ledger_csv="transactions.csv", db_path="bank.db"):
+    # Import an existing CSV bank (snapshot plus any journal) and its ledger,
+    # keeping account ids and tx ids as they are.
+    source = CsvStorage(bank_csv, None, journal=os.path.exists(bank_csv + ".journal"))
+    customers = {}
+    for row in source.load_customers():
+        row.setdefault("overdraft_count", 0)
+        row["overdraft_count"] = row["overdraft_count"] or 0
+        row["is_active"] = row.get("is_active") != "False"
+        customers[row["account_id"]] = row
+
+    target = SqliteStorage(db_path)
+    tx_count = 0
+    try:
+        with target.transaction() as conn:
+            target._upsert(conn, customers.values())
+            if os.path.exists(ledger_csv):
+                with open(ledger_csv, newline="") as f:
+                    rows = (tuple(round_cents(row.get(name) or 0) if name in _MONEY_COLUMNS else row.get(name)
+                                  for name in SqliteLedger.FIELDNAMES)
+                            for row in csv.DictReader(f) if (row.get("tx_id") or "").isdigit())
+                    cursor = conn.executemany(
+                        "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    tx_count = cursor.rowcount
+    finally:
+        target.close()
+    return len(customers), tx_count
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Bank storage tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="import bank.csv and transactions.csv into SQLite")
+    migrate.add_argument("--bank", default="bank.csv")
+    migrate.add_argument("--ledger", default="transactions.csv")
+    migrate.add_argument("--db", default="bank.db")
+    args = parser.parse_args(argv)
+    customers, txs = migrate_csv_to_sqlite(args.bank, args.ledger, args.db)
+    print(f"Imported {customers} customers and {txs} transactions into {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
-from customer.bank_app import Bank
-from colorama import Fore, init
+import sys
 
-init(autoreset=True)
+# Nothing heavy is imported here: the subcommands load only the bank modules
+# they use, and colorama is loaded by the interactive menu alone.
+Fore = None
+
+def _load_colors():
+    global Fore
+    from colorama import Fore, init
+    init(autoreset=True)
+
+def open_bank(bank="bank.csv", ledger="transactions.csv", journal=False):
+    from customer.bank_app import Bank, TransactionLogger
+    from customer.lazy import LazyCustomers
+    # Only the accounts a command touches are parsed out of bank.csv
+    return Bank(bank, TransactionLogger(ledger), journal=journal, customers=LazyCustomers())
 
 def print_banner():
     print(Fore.CYAN + "=" * 40)
@@ -27,8 +39,9 @@ def show_dashboard(customer):
     print(Fore.GREEN + f" Total Balance: {total} {customer.checking.currency}")
     print(Fore.MAGENTA + "=" * 30 + "\n")
 
-def main():
-    bank = Bank()
+def interactive():
+    _load_colors()
+    bank = open_bank()
     print_banner()
 
     while True:
@@ -139,5 +152,126 @@ def main():
         else:
             error("Invalid choice. Try again.")
 
+COMMANDS = ("deposit", "withdraw", "transfer", "statement", "top", "import", "batch")
+
+def _parser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="ACME Bank. Without a command it opens the interactive menu.")
+    parser.add_argument("--bank", default="bank.csv")
+    parser.add_argument("--ledger", default="transactions.csv")
+    parser.add_argument("--journal", action="store_true", help="the bank keeps a journal")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("deposit", "withdraw"):
+        cmd = sub.add_parser(name, help=f"{name} money and print the new balance")
+        cmd.add_argument("account_id")
+        cmd.add_argument("account_type", choices=["checking", "savings"])
+        cmd.add_argument("amount")
+    cmd = sub.add_parser("transfer", help="move money and print both new balances")
+    cmd.add_argument("from_id")
+    cmd.add_argument("from_type", choices=["checking", "savings"])
+    cmd.add_argument("to_id")
+    cmd.add_argument("to_type", choices=["checking", "savings"])
+    cmd.add_argument("amount")
+    cmd = sub.add_parser("statement", help="write <account_id>_statement.txt")
+    cmd.add_argument("account_id")
+    cmd.add_argument("--start", help="ISO date or time, inclusive")
+    cmd.add_argument("--end", help="ISO date or time, exclusive")
+    cmd = sub.add_parser("top", help="customers with the highest total balance")
+    cmd.add_argument("-k", type=int, default=3)
+    cmd = sub.add_parser("import", help="add the customers in a CSV file and print their ids")
+    cmd.add_argument("file", help="columns first_name, last_name, password and optionally "
+                                  "account_id, initial_checking, initial_savings")
+    cmd = sub.add_parser("batch", help="run one command per line, read from a file or stdin")
+    cmd.add_argument("file", nargs="?", default="-")
+    return parser
+
+IMPORT_COLUMNS = ("first_name", "last_name", "password")
+
+def _read_customers(filename):
+    import csv
+    from customer.batch import parse_amount
+    with open(filename, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in IMPORT_COLUMNS if name not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{filename}: missing columns: {', '.join(missing)}")
+        for row in reader:
+            entry = {k: v for k, v in row.items() if k and v}
+            blank = [name for name in IMPORT_COLUMNS if name not in entry]
+            if blank:
+                raise ValueError(f"{filename}, line {reader.line_num}: no {', '.join(blank)}")
+            for name in ("initial_checking", "initial_savings"):
+                if name in entry:
+                    entry[name] = parse_amount(entry[name])
+            yield entry
+
+def _run(bank, args, out):
+    from customer.batch import parse_amount
+    if args.command == "deposit":
+        print(bank.deposit_money(args.account_id, args.account_type, parse_amount(args.amount)), file=out)
+    elif args.command == "withdraw":
+        balance, fee = bank.withdraw_money(args.account_id, args.account_type, parse_amount(args.amount))
+        print(balance, fee, file=out)
+    elif args.command == "transfer":
+        print(*bank.transfer_money(args.from_id, args.from_type, args.to_id, args.to_type,
+                                   parse_amount(args.amount)), file=out)
+    elif args.command == "statement":
+        bank.generate_statement(args.account_id, args.start, args.end)
+        print(f"{args.account_id}_statement.txt", file=out)
+    elif args.command == "top":
+        for rank, cust in enumerate(bank.top_k_customers(args.k), 1):
+            total = cust.checking.balance + cust.savings.balance
+            print(rank, cust.account_id, cust.first_name, cust.last_name, total, sep="\t", file=out)
+    elif args.command == "import":
+        for account_id in bank.bulk_add_customers(_read_customers(args.file), prehashed=True):
+            print(account_id, file=out)
+
+def _batch(bank, parser, lines, out, err):
+    # One command per line, in the same process and against the same bank; a
+    # failed line is reported and the rest still run. Returns how many failed.
+    import shlex
+    failed = 0
+    for n, line in enumerate(lines, 1):
+        try:
+            words = shlex.split(line, comments=True)
+            if not words:
+                continue
+            if words[0] not in COMMANDS[:-1]:
+                raise ValueError(f"Unknown command: {words[0]}")
+            _run(bank, parser.parse_args(words), out)
+        except SystemExit: # argparse has already printed the usage
+            print(f"line {n}: invalid command", file=err)
+            failed += 1
+        except (ValueError, OSError) as e:
+            print(f"line {n}: {e}", file=err)
+            failed += 1
+        out.flush()
+    return failed
+
+def main(argv=None, stdin=None, out=None, err=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        return interactive()
+    stdin, out, err = stdin or sys.stdin, out or sys.stdout, err or sys.stderr
+    parser = _parser()
+    args = parser.parse_args(argv)
+    bank = None
+    try:
+        bank = open_bank(args.bank, args.ledger, args.journal)
+        if args.command == "batch":
+            if args.file == "-":
+                return 1 if _batch(bank, parser, stdin, out, err) else 0
+            with open(args.file) as f:
+                return 1 if _batch(bank, parser, f, out, err) else 0
+        _run(bank, args, out)
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=err)
+        return 1
+    finally:
+        if bank is not None:
+            bank.close()
+    return 0
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
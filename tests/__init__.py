@@ -0,0 +1,4 @@
+from customer import passwords
+
+# Hashing at the production work factor would dominate the suite's runtime
+passwords.DEFAULT_HASHER = passwords.PasswordHasher(n=2**4)
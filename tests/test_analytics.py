@@ -0,0 +1,143 @@
+import unittest
+import os
+import csv
+import tempfile
+from datetime import datetime
+from customer import analytics, bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.binary_ledger import BinaryTransactionLogger, import_csv
+from customer.money import format_cents, to_cents
+from customer.segments import SegmentedTransactionLogger
+
+ROWS = [
+    # timestamp, type, from, from_type, to, to_type, amount, fee
+    ("2026-01-05T09:00:00", "deposit", "", "", "10001", "checking", "100.00", "0.00"),
+    ("2026-01-05T10:30:00.250000", "transfer", "10001", "checking", "10002", "savings", "40.50", "0.00"),
+    ("2026-01-20T12:00:00", "withdraw", "10002", "checking", "", "", "80.00", "35.00"),
+    ("2026-02-01T00:00:00", "transfer", "10002", "savings", "10001", "savings", "12.25", "0.00"),
+    ("2026-02-14T18:45:00", "withdraw", "10001", "checking", "", "", "300.00", "35.00"),
+    ("2026-02-14T19:00:00", "transfer", "10001", "checking", "10001", "savings", "5.00", "0.00"),
+    ("2026-03-01T08:00:00", "reactivate", "", "", "10001", "checking", "0.00", "0.00"),
+]
+
+@unittest.skipIf(analytics.np is None, "NumPy is not installed")
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger_file = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.ledger_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TransactionLogger.FIELDNAMES)
+            for tx_id, row in enumerate(ROWS, 1):
+                writer.writerow([tx_id, *row, "0.00"])
+        self.ledger = TransactionLogger(self.ledger_file)
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def reference(self, ledger, by, value="amount", types=None, start=None, end=None):
+        # The same aggregates with a plain Python loop over iter_transactions
+        groups = {}
+        for row in ledger.iter_transactions(start, end):
+            if types is not None and row["type"] not in types:
+                continue
+            accounts = [row["from_account_id"]]
+            if row["to_account_id"] != row["from_account_id"]:
+                accounts.append(row["to_account_id"])
+            for account in (accounts if "account" in by else [None]):
+                if "account" in by and not account:
+                    continue
+                labels = {"account": account, "type": row["type"], "day": row["timestamp"][:10],
+                          "month": row["timestamp"][:7], "from_account": row["from_account_id"]}
+                key = tuple(labels[name] for name in by)
+                groups.setdefault(key, []).append(to_cents(row[value]))
+        return {key: (len(v), format_cents(sum(v)), format_cents(min(v)), format_cents(max(v)))
+                for key, v in groups.items()}
+
+    def result(self, aggregates):
+        return {tuple(row[name] for name in aggregates.by): (row["count"], row["sum"], row["min"], row["max"])
+                for row in aggregates.rows()}
+
+    def test_matches_python_reference(self):
+        for by, value, types in [(("account",), "amount", None), (("account", "type", "month"), "amount", None),
+                                 (("month",), "fee", None), (("from_account", "day"), "amount", ("transfer",)),
+                                 (("type",), "fee", ("withdraw", "transfer"))]:
+            with self.subTest(by=by, value=value, types=types):
+                self.assertEqual(self.result(analytics.aggregate(self.ledger, by, value, types)),
+                                 self.reference(self.ledger, by, value, types))
+
+    def test_transfers_count_for_both_accounts(self):
+        rows = {row["account"]: row for row in analytics.aggregate(self.ledger, ("account",),
+                                                                   types=("transfer",)).rows()}
+        self.assertEqual(rows["10001"]["count"], 3) # a transfer to itself counts once
+        self.assertEqual(rows["10001"]["sum"], "57.75")
+        self.assertEqual(rows["10002"]["count"], 2)
+        self.assertEqual((rows["10002"]["min"], rows["10002"]["max"]), ("12.25", "40.50"))
+
+    def test_chunked_matches_whole_ledger(self):
+        whole = self.result(analytics.aggregate(self.ledger, ("account", "type", "day"), chunk_rows=None))
+        for chunk_rows in (1, 2, 3, 100):
+            with self.subTest(chunk_rows=chunk_rows):
+                chunked = analytics.aggregate(self.ledger, ("account", "type", "day"), chunk_rows=chunk_rows)
+                self.assertEqual(self.result(chunked), whole)
+        sizes = [len(frame) for frame in analytics.iter_frames(self.ledger, ("amount",), chunk_rows=3)]
+        self.assertEqual(sizes, [3, 3, 1])
+
+    def test_time_range_and_helpers(self):
+        start, end = datetime(2026, 1, 10), "2026-02-14T19:00:00"
+        self.assertEqual(self.result(analytics.aggregate(self.ledger, ("account", "month"), start=start, end=end)),
+                         self.reference(self.ledger, ("account", "month"), start=start, end=end))
+        self.assertEqual(analytics.fee_totals(self.ledger), {"2026-01": "35.00", "2026-02": "35.00"})
+        volume = {(r["account"], r["day"]): r["sum"] for r in analytics.daily_volume(self.ledger).rows()}
+        self.assertEqual(volume[("10001", "2026-01-05")], "40.50")
+        self.assertEqual(volume[("10001", "2026-02-14")], "5.00")
+
+    def test_frames_hold_selected_columns(self):
+        frame = analytics.load_frame(self.ledger, ("micros", "from_account", "amount"))
+        self.assertEqual(sorted(frame.columns), ["amount", "from_account", "micros"])
+        self.assertEqual(frame["amount"].tolist()[:2], [10000, 4050])
+        self.assertEqual([frame.accounts[c] if c >= 0 else "" for c in frame["from_account"].tolist()][:3],
+                         ["", "10001", "10002"])
+        self.assertEqual(frame["micros"][1] - frame["micros"][0], 5_400_250_000)
+        with self.assertRaises(ValueError):
+            analytics.load_frame(self.ledger, ("balance",))
+        with self.assertRaises(ValueError):
+            analytics.aggregate(self.ledger, ("week",))
+        with self.assertRaises(ValueError):
+            analytics.aggregate(self.ledger, ("account",), "tx_id")
+
+    def test_other_ledger_kinds_agree(self):
+        expected = self.result(analytics.aggregate(self.ledger, ("account", "type", "month")))
+        binary_file = os.path.join(self.tmp.name, "transactions.bin")
+        import_csv(self.ledger_file, binary_file)
+        segmented = SegmentedTransactionLogger(self.ledger_file, period=None)
+        segmented.rotate()
+        with open(self.ledger_file, "a", newline="") as f: # one more row in the live file
+            csv.writer(f).writerow([8, "2026-03-02T08:00:00", "deposit", "", "", "10002", "checking",
+                                    "1.00", "0.00", "0.00"])
+        for ledger in (BinaryTransactionLogger(binary_file), segmented):
+            with self.subTest(ledger=type(ledger).__name__):
+                result = self.result(analytics.aggregate(ledger, ("account", "type", "month"), chunk_rows=2))
+                if ledger is segmented:
+                    self.assertEqual(result.pop(("10002", "deposit", "2026-03")), (1, "1.00", "1.00", "1.00"))
+                self.assertEqual(result, expected)
+
+    def test_empty_and_live_ledgers(self):
+        empty = TransactionLogger(os.path.join(self.tmp.name, "empty.csv"))
+        self.assertEqual(len(analytics.aggregate(empty, ("account",))), 0)
+        self.assertEqual(len(analytics.load_frame(empty, ("amount",))), 0)
+        bank_file = os.path.join(self.tmp.name, "bank.csv")
+        with open(bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+        bank = Bank(bank_file, empty)
+        bank.deposit_money("10001", "checking", 10)
+        bank.withdraw_money("10001", "savings", 2.5)
+        rows = list(analytics.aggregate(bank.tx_logger, ("type",)).rows())
+        self.assertEqual([(r["type"], r["sum"]) for r in rows], [("deposit", "10.00"), ("withdraw", "2.50")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import asyncio
+import os
+import csv
+import tempfile
+import threading
+from unittest import mock
+from customer import bank_app
+from customer.async_bank import AsyncBank
+from customer.bank_app import TransactionLogger
+from customer.metrics import Metrics
+
+class TestAsyncBank(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.metrics = Metrics()
+        self.bank = await AsyncBank.open(self.bank_file, TransactionLogger(self.ledger),
+                                         metrics=self.metrics, commit_window=0.01)
+
+    async def asyncTearDown(self):
+        await self.bank.aclose()
+        os.chdir(self.cwd)
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def saves(self):
+        return self.metrics.snapshot()["histograms"]['storage_call_seconds{call="save_changed"}']["count"]
+
+    async def test_concurrent_ops_share_one_save(self):
+        results = await asyncio.gather(*[self.bank.deposit_money("10001","checking",1) for _ in range(50)],
+                                       self.bank.transfer_money("10001","savings","10002","savings",100))
+        self.assertEqual(sorted(results[:50]), list(range(1001, 1051)))
+        self.assertEqual(results[50], (4900, 600))
+        self.assertEqual(self.saves(), 1)
+        with open(self.ledger) as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 51)
+        with open(self.bank_file) as f:
+            rows = {r["account_id"]: r for r in csv.DictReader(f)}
+        self.assertEqual(rows["10001"]["balance_checking"], "1050.00")
+
+    async def test_same_errors_as_bank(self):
+        results = await asyncio.gather(
+            self.bank.withdraw_money("10002","checking",60),
+            self.bank.withdraw_money("10002","checking",100),
+            self.bank.deposit_money("99999","checking",1),
+            self.bank.deposit_money("10001","checking",-5),
+            self.bank.transfer_money("10001","bogus","10002","savings",1),
+            return_exceptions=True)
+        self.assertEqual(results[0], (-45, 35))
+        self.assertEqual(str(results[1]), "Withdrawal would exceed overdraft limit.")
+        self.assertEqual(str(results[2]), "Customer not found.")
+        self.assertIsInstance(results[3], ValueError)
+        self.assertEqual(str(results[4]), "Invalid sender account type.")
+        self.assertEqual(self.bank.bank.customers["10001"].checking.balance, 1000)
+
+    async def test_reactivate_and_statement(self):
+        await self.bank.withdraw_money("10002","checking",60)
+        await self.bank.withdraw_money("10002","checking",10)
+        with self.assertRaises(ValueError):
+            await self.bank.reactivate_account("10002","checking")
+        await self.bank.deposit_money("10002","checking",200)
+        self.assertTrue(await self.bank.reactivate_account("10002","checking"))
+        new_id = await self.bank.add_new_customer("Dora","Explorer","Strong1@",10,20)
+        await self.bank.transfer_money("10002","checking",new_id,"savings",5)
+        await self.bank.generate_statement("10002")
+        with open("10002_statement.txt") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], "Checking Balance: 105.00")
+        self.assertEqual(len(lines), 10)
+
+    async def test_open_loads_on_the_bounded_pool(self):
+        threads = []
+        def bank(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return bank_app.Bank(*args, **kwargs)
+        with mock.patch("customer.async_bank.Bank", side_effect=bank):
+            other = await AsyncBank.open(self.bank_file, TransactionLogger(self.ledger), max_workers=2)
+        try:
+            self.assertTrue(threads[0].startswith("async-bank"), threads)
+            self.assertEqual(other._executor._max_workers, 2)
+        finally:
+            await other.aclose()
+
+if __name__=="__main__":
+    unittest.main()
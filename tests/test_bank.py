@@ -1,7 +1,9 @@
 import unittest
 import os
 import csv
-from customer.bank_app import Bank
+import tempfile
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
 class TestBankFull(unittest.TestCase):
 
     def setUp(self):
@@ -16,7 +18,8 @@ class TestBankFull(unittest.TestCase):
         self.bank = Bank(self.test_file)
 
     def tearDown(self):
-        for f in [self.test_file, "transactions.csv", "10001_statement.txt", "10002_statement.txt"]:
+        for f in [self.test_file, "transactions.csv", "10001_statement.txt", "10002_statement.txt",
+                  self.test_file + ".ids", self.test_file + ".ids.lock"]:
             if os.path.exists(f):
                 os.remove(f)
 
@@ -95,5 +98,74 @@ class TestBankFull(unittest.TestCase):
         balances = [c.checking.balance+c.savings.balance for c in top3]
         self.assertTrue(balances[0]>=balances[1]>=balances[2])
 
+class TestTransactionLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_ids(self):
+        with open(self.ledger, newline="") as f:
+            return [row["tx_id"] for row in csv.DictReader(f)]
+
+    def test_ids_are_sequential(self):
+        logger = TransactionLogger(self.ledger)
+        returned = [logger.log("deposit", to_id="10001", to_type="checking", amount=1) for _ in range(5)]
+        self.assertEqual(self.read_ids(), ["1","2","3","4","5"])
+        self.assertEqual(returned, [1, 2, 3, 4, 5])
+
+    def test_before_write_sees_the_id_and_can_cancel(self):
+        logger = TransactionLogger(self.ledger)
+        seen = []
+        self.assertEqual(logger.log("deposit", to_id="10001", to_type="checking", amount=1,
+                                    before_write=seen.append), 1)
+        def refuse(tx_id):
+            seen.append(tx_id)
+            raise OSError("intent log full")
+        with self.assertRaises(OSError):
+            logger.log("deposit", to_id="10001", to_type="checking", amount=1, before_write=refuse)
+        self.assertEqual(logger.log("deposit", to_id="10001", to_type="checking", amount=1), 2)
+        self.assertEqual((seen, self.read_ids()), ([1, 2], ["1", "2"]))
+
+    def test_restart_continues_from_tail(self):
+        logger = TransactionLogger(self.ledger)
+        for _ in range(3000): # bigger than one tail chunk
+            logger.log("deposit", to_id="10001", to_type="checking", amount=1)
+        bank_app._LEDGER_STATES.clear() # simulate a process restart
+        TransactionLogger(self.ledger).log("deposit", to_id="10001", to_type="checking", amount=1)
+        self.assertEqual(self.read_ids()[-1], "3001")
+
+    def test_truncated_last_row_is_ignored(self):
+        logger = TransactionLogger(self.ledger)
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1)
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1)
+        with open(self.ledger, "a", newline="") as f:
+            f.write("3,2025-01-01T00:00:00,depo") # crash mid-write
+        bank_app._LEDGER_STATES.clear() # simulate a process restart
+        TransactionLogger(self.ledger).log("withdraw", from_id="10001", from_type="checking", amount=1)
+        with open(self.ledger, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows[-1]["tx_id"], "3")
+        self.assertEqual(rows[-1]["type"], "withdraw")
+
+    def test_loggers_sharing_a_file_never_reuse_ids(self):
+        first = TransactionLogger(self.ledger)
+        second = TransactionLogger(self.ledger)
+        for _ in range(3):
+            first.log("deposit", to_id="10001", to_type="checking", amount=1)
+            second.log("deposit", to_id="10002", to_type="checking", amount=1)
+        self.assertEqual(self.read_ids(), [str(i) for i in range(1, 7)])
+
+    def test_external_append_is_picked_up(self):
+        logger = TransactionLogger(self.ledger)
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1)
+        with open(self.ledger, "a", newline="") as f:
+            csv.writer(f).writerow([41, "2025-01-01T00:00:00", "deposit", "", "", "10002", "savings", 1, 0, 1])
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1)
+        self.assertEqual(self.read_ids(), ["1", "41", "42"])
+
 if __name__=="__main__":
     unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import csv
+import io
+import tempfile
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.batch import read_batch_csv
+from customer.storage import SqliteStorage
+
+class TestApplyBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+        self.bank = Bank(self.bank_file, TransactionLogger(self.ledger, index=True))
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def ledger_rows(self):
+        with open(self.ledger, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def saved_balance(self, account_id):
+        with open(self.bank_file, newline="") as f:
+            rows = {row["account_id"]: row for row in csv.DictReader(f)}
+        return float(rows[account_id]["balance_checking"])
+
+    def test_best_effort_skips_failures(self):
+        ops = [
+            {"op": "deposit", "account_id": "10001", "account_type": "checking", "amount": "100"},
+            {"op": "withdraw", "account_id": "10002", "account_type": "checking", "amount": "500"},
+            {"op": "transfer", "account_id": "10001", "account_type": "checking",
+             "to_account_id": "10002", "to_account_type": "bogus", "amount": "10"},
+            {"op": "transfer", "account_id": "10001", "account_type": "savings",
+             "to_account_id": "10002", "to_account_type": "checking", "amount": "25"},
+            {"op": "refund", "account_id": "10001", "amount": "1"},
+        ]
+        result = self.bank.apply_batch(ops, atomic=False)
+        self.assertEqual(result.applied, 2)
+        self.assertEqual([i for i, _ in result.errors], [1, 2, 4])
+        self.assertEqual(result.results, [(0, 1100), (3, (4975, 75))])
+        self.assertEqual(self.bank.customers["10001"].checking.balance, 1100) # failed transfer undone
+        self.assertEqual([r["tx_id"] for r in self.ledger_rows()], ["1", "2"])
+        self.assertEqual(self.saved_balance("10002"), 75)
+        self.assertEqual(len(self.bank.tx_logger.get_transactions_for_customer("10002")), 1)
+
+    def test_atomic_rolls_back_everything(self):
+        ops = [
+            {"op": "deposit", "account_id": "10001", "account_type": "checking", "amount": 100},
+            {"op": "withdraw", "account_id": "10002", "account_type": "checking", "amount": 60},
+            {"op": "withdraw", "account_id": "99999", "account_type": "checking", "amount": 1},
+        ]
+        result = self.bank.apply_batch(ops)
+        self.assertTrue(result.rolled_back)
+        self.assertEqual(result.errors, [(2, "Customer not found.")])
+        self.assertEqual(self.bank.customers["10001"].checking.balance, 1000)
+        self.assertEqual(self.bank.customers["10002"].checking.balance, 50)
+        self.assertEqual(self.bank.customers["10002"].checking.overdraft_count, 0)
+        self.assertEqual(self.ledger_rows(), [])
+
+    def test_overdraft_rules_apply_in_order(self):
+        withdraw = lambda amount: {"op": "withdraw", "account_id": "10002", "account_type": "checking", "amount": amount}
+        result = self.bank.apply_batch([withdraw(45), withdraw(10), withdraw(10), withdraw(1)], atomic=False)
+        self.assertEqual(result.results, [(0, (5, 0)), (1, (-40, 35)), (2, (-85, 35))])
+        self.assertEqual(result.errors, [(3, "Account is deactivated due to multiple overdrafts.")])
+        self.assertFalse(self.bank.customers["10002"].checking.is_active)
+        result = self.bank.apply_batch([withdraw(1)])
+        self.assertTrue(result.rolled_back)
+
+    def test_streaming_csv_with_callback(self):
+        source = io.StringIO()
+        writer = csv.writer(source)
+        writer.writerow(["op","account_id","account_type","to_account_id","to_account_type","amount"])
+        for _ in range(1000):
+            writer.writerow(["transfer","10001","savings","10002","savings","1"])
+        source.seek(0)
+        seen = []
+        result = self.bank.apply_batch(read_batch_csv(source), on_result=lambda i, value, error: seen.append(error))
+        self.assertIsNone(result.results)
+        self.assertEqual(result.applied, 1000)
+        self.assertEqual(seen, [None] * 1000)
+        self.assertEqual(self.bank.customers["10002"].savings.balance, 1500)
+        self.assertEqual(self.ledger_rows()[-1]["tx_id"], "1000")
+
+class TestApplyBatchSqlite(unittest.TestCase):
+
+    def test_batch_commits_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bank = Bank(storage=SqliteStorage(os.path.join(tmp, "bank.db")))
+            a = bank.add_new_customer("Alice","Wonder","P@ssword1",100,0)
+            b = bank.add_new_customer("Bob","Builder","StrongP@ss2",0,0)
+            ops = [{"op": "transfer", "account_id": a, "account_type": "checking",
+                    "to_account_id": b, "to_account_type": "savings", "amount": 10}] * 5
+            self.assertEqual(bank.apply_batch(ops).applied, 5)
+            bank.close()
+            bank = Bank(storage=SqliteStorage(os.path.join(tmp, "bank.db")))
+            self.assertEqual(bank.customers[b].savings.balance, 50)
+            self.assertEqual(len(bank.tx_logger.get_transactions_for_customer(a)), 6) # "open" + 5 transfers
+            bank.close()
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import os
+import csv
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+from customer import bank_app, binary_ledger
+from customer.bank_app import Bank, TransactionLogger
+from customer.binary_ledger import BinaryTransactionLogger, RECORD, export_csv, import_csv
+
+class TestBinaryLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.csv_ledger = os.path.join(self.tmp.name, "transactions.csv")
+        self.bin_ledger = os.path.join(self.tmp.name, "transactions.bin")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def activity(self, bank):
+        bank.deposit_money("10001","checking",100.25)
+        bank.transfer_money("10001","savings","10002","checking",20)
+        bank.withdraw_money("10002","checking",80)
+        bank.withdraw_money("10002","checking",10)
+        bank.deposit_money("10002","checking",500)
+        bank.reactivate_account("10002","checking")
+        bank.apply_batch([{"op": "deposit", "account_id": "10001", "account_type": "savings", "amount": "0.01"}] * 3)
+
+    def test_lossless_round_trip(self):
+        self.activity(Bank(self.bank_file, TransactionLogger(self.csv_ledger)))
+        self.assertEqual(import_csv(self.csv_ledger, self.bin_ledger), 9)
+        self.assertEqual(os.path.getsize(self.bin_ledger), 16 + 9 * RECORD.size)
+        exported = os.path.join(self.tmp.name, "exported.csv")
+        export_csv(self.bin_ledger, exported)
+        with open(self.csv_ledger, "rb") as a, open(exported, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_lossy_rows_are_refused(self):
+        row = {"tx_id": "1", "timestamp": "2026-01-01T10:00:00+03:00", "type": "deposit",
+               "from_account_id": "", "from_account_type": "", "to_account_id": "10001",
+               "to_account_type": "checking", "amount": "1.00", "fee": "0.00", "resulting_balance": "1.00"}
+        for change in ({"timestamp": "2026-01-01T10:00:00+03:00"}, {"amount": "1.5"},
+                       {"to_account_id": "0042"}, {"type": "interest"}):
+            with self.assertRaises(ValueError):
+                binary_ledger.encode_row({**row, **change, "timestamp": change.get("timestamp", "2026-01-01T10:00:00")})
+
+    def test_old_ledgers_are_normalized(self):
+        # Ledgers from before money was formatted wrote amounts as they came
+        with open(self.csv_ledger, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TransactionLogger.FIELDNAMES)
+            writer.writerow(["1", "2025-01-01T10:00:00", "deposit", "", "", "10001", "checking", "100.1", "0", "1100.1"])
+            writer.writerow(["2", "2025-01-01T10:00:01.500000", "withdraw", "10002", "checking", "", "", "60", "35",
+                             "-45.0"])
+        with self.assertRaisesRegex(ValueError, "Row 1 can't be stored losslessly"):
+            import_csv(self.csv_ledger, self.bin_ledger, strict=True)
+        self.assertEqual(import_csv(self.csv_ledger, self.bin_ledger), 2)
+        rows = BinaryTransactionLogger(self.bin_ledger).get_transactions_for_customer("10001")
+        self.assertEqual([(r["amount"], r["fee"], r["resulting_balance"]) for r in rows], [("100.10", "0.00", "1100.10")])
+        rows = list(BinaryTransactionLogger(self.bin_ledger).iter_transactions())
+        self.assertEqual((rows[1]["timestamp"], rows[1]["resulting_balance"]), ("2025-01-01T10:00:01.500000", "-45.00"))
+
+    def test_bank_reads_match_csv_ledger(self):
+        csv_bank = Bank(self.bank_file, TransactionLogger(self.csv_ledger))
+        self.activity(csv_bank)
+        import_csv(self.csv_ledger, self.bin_ledger)
+        bin_logger = BinaryTransactionLogger(self.bin_ledger)
+        for account_id in ("10001", "10002", "99999", "abc"):
+            self.assertEqual(bin_logger.get_transactions_for_customer(account_id),
+                             csv_bank.tx_logger.get_transactions_for_customer(account_id))
+        later = datetime.now() + timedelta(seconds=1)
+        self.assertEqual(bin_logger.get_transactions_for_customer("10001", end=later),
+                         csv_bank.tx_logger.get_transactions_for_customer("10001", end=later))
+        self.assertEqual(list(bin_logger.iter_transactions(start=later)), [])
+        with mock.patch.object(binary_ledger, "np", None): # the struct fallback
+            self.assertEqual(list(bin_logger.iter_transactions()), list(csv_bank.tx_logger.iter_transactions()))
+            self.assertEqual(len(bin_logger.get_transactions_for_customer("10002")), 5)
+
+    def test_bank_writes_binary_ledger(self):
+        bank = Bank(self.bank_file, BinaryTransactionLogger(self.bin_ledger))
+        self.activity(bank)
+        rows = bank.tx_logger.get_transactions_for_customer("10002")
+        self.assertEqual([r["type"] for r in rows], ["transfer", "withdraw", "withdraw", "deposit", "reactivate"])
+        self.assertEqual(rows[1]["fee"], "35.00")
+        self.assertEqual([r["tx_id"] for r in bank.tx_logger.iter_transactions()], [str(i) for i in range(1, 10)])
+        with open(self.bin_ledger, "ab") as f:
+            f.write(b"torn")
+        bank_app._LEDGER_STATES.clear()
+        logger = BinaryTransactionLogger(self.bin_ledger)
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1, resulting_balance=1)
+        self.assertEqual(list(logger.iter_transactions())[-1]["tx_id"], "10")
+        with self.assertRaises(ValueError):
+            logger.log("deposit", to_id="x1", to_type="checking", amount=1)
+        self.assertEqual(logger.log("deposit", to_id="10001", to_type="checking", amount=1), 11)
+        self.assertEqual(list(logger.iter_transactions())[-1]["tx_id"], "11")
+
+if __name__=="__main__":
+    unittest.main()
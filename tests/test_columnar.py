@@ -0,0 +1,90 @@
+import unittest
+import os
+import csv
+import tempfile
+import tracemalloc
+from customer import bank_app
+from customer.bank_app import Bank, CheckingAccount, Customer, SavingsAccount, TransactionLogger
+from customer.columnar import CustomerTable
+
+class TestSlots(unittest.TestCase):
+
+    def test_no_instance_dicts(self):
+        cust = Customer("10001","Alice","Wonder","P@ssword1",10,20)
+        for obj in (cust, cust.checking, cust.savings, CheckingAccount(), SavingsAccount()):
+            self.assertFalse(hasattr(obj, "__dict__"))
+        with self.assertRaises(AttributeError):
+            cust.nickname = "Al"
+
+class TestColumnarBank(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+        self.bank = self.open_bank()
+
+    def tearDown(self):
+        self.bank.close()
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self):
+        return Bank(self.bank_file, TransactionLogger(self.ledger), journal=True, customers=CustomerTable())
+
+    def test_operations_follow_account_rules(self):
+        self.bank.deposit_money("10001","checking",500)
+        self.bank.transfer_money("10001","savings","10002","savings",200)
+        new_balance, fee = self.bank.withdraw_money("10002","checking",60)
+        self.assertEqual((new_balance, fee), (-45, 35))
+        self.bank.withdraw_money("10002","checking",10)
+        bob = self.bank.customers["10002"]
+        self.assertFalse(bob.checking.is_active)
+        self.assertEqual(bob.checking.overdraft_count, 2)
+        with self.assertRaises(ValueError):
+            self.bank.withdraw_money("10002","checking",1)
+        self.assertEqual(self.bank.customers["10001"].checking.balance, 1500)
+        self.assertEqual(bob.savings.balance, 700)
+        self.assertEqual(bob.full_name(), "Bob Builder")
+
+    def test_reload_and_add_customers(self):
+        self.bank.withdraw_money("10002","checking",60)
+        new_id = self.bank.add_new_customer("Dora","Explorer","Strong1@",10,20)
+        self.bank.close()
+        self.bank = self.open_bank()
+        self.assertIsInstance(self.bank.customers, CustomerTable)
+        self.assertEqual(self.bank.customers["10002"].checking.overdraft_count, 1)
+        self.assertEqual(self.bank.customers[new_id].savings.balance, 20)
+        self.assertEqual([c.first_name for c in self.bank.top_3_customers()], ["Alice","Bob","Dora"])
+
+    def test_failed_transfer_is_rolled_back(self):
+        with self.assertRaises(ValueError):
+            self.bank.transfer_money("10001","checking","10002","bogus",100)
+        self.assertEqual(self.bank.customers["10001"].checking.balance, 1000)
+        result = self.bank.apply_batch([{"op": "deposit", "account_id": "10001", "account_type": "savings", "amount": "1"}])
+        self.assertEqual(result.results, [(0, 5001)])
+
+    def test_delete_keeps_columns_dense(self):
+        table = self.bank.customers
+        del table["10001"]
+        self.assertEqual(list(table), ["10002"])
+        self.assertEqual(table["10002"].checking.balance, 50)
+        self.assertNotIn("10001", table)
+
+    def test_uses_less_memory_than_objects(self):
+        def measure(customers):
+            tracemalloc.start()
+            for i in range(5000):
+                customers[str(20000 + i)] = Customer(str(20000 + i), "First", "Last", "P@ssword1", 1000 + i, 2000 + i)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return size
+        self.assertLess(measure(CustomerTable()), measure({}) / 2)
+
+if __name__=="__main__":
+    unittest.main()
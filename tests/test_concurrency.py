@@ -0,0 +1,176 @@
+import unittest
+import os
+import csv
+import random
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.storage import SqliteStorage
+
+THREADS = 8
+TRANSFERS_PER_THREAD = 150
+ACCOUNTS = 12
+
+class ConcurrencyMixin:
+
+    def make_bank(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank = self.make_bank()
+        self.ids = [self.bank.add_new_customer(f"User{i}", "Test", "Str0ng@pass", 100, 100) for i in range(ACCOUNTS)]
+
+    def tearDown(self):
+        self.bank.close()
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def total(self, bank):
+        return sum(c.checking.balance + c.savings.balance for c in bank.customers.values())
+
+    def run_threads(self, work):
+        errors = []
+        def runner(seed):
+            try:
+                work(random.Random(seed))
+            except Exception as e: # anything but a rule violation is a bug
+                errors.append(e)
+        threads = [threading.Thread(target=runner, args=(seed,)) for seed in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(60)
+            self.assertFalse(t.is_alive(), "deadlock")
+        self.assertEqual(errors, [])
+
+    def test_random_transfers_conserve_money(self):
+        start = self.total(self.bank)
+        done = []
+
+        def work(rng):
+            for _ in range(TRANSFERS_PER_THREAD):
+                a, b = rng.sample(self.ids, 2)
+                try:
+                    sender_new, _ = self.bank.transfer_money(
+                        a, rng.choice(["checking", "savings"]), b, rng.choice(["checking", "savings"]), rng.randint(1, 60))
+                    done.append(sender_new)
+                except ValueError:
+                    pass
+
+        self.run_threads(work)
+        txs = []
+        for account_id in self.ids:
+            txs.extend(self.bank.tx_logger.get_transactions_for_customer(account_id))
+        transfers = {tx["tx_id"]: tx for tx in txs if tx["type"] == "transfer"}
+        self.assertEqual(len(transfers), len(done))
+        fees = sum(Decimal(tx["fee"]) for tx in transfers.values())
+        self.assertEqual(self.total(self.bank), start - fees)
+        self.assertEqual(self.total(self.reopen()), start - fees)
+
+    def test_opposite_transfers_do_not_deadlock(self):
+        a, b = self.ids[:2]
+
+        def work(rng):
+            for _ in range(TRANSFERS_PER_THREAD):
+                src, dst = (a, b) if rng.random() < 0.5 else (b, a)
+                try:
+                    self.bank.transfer_money(src, "savings", dst, "savings", 1)
+                except ValueError:
+                    pass
+
+        self.run_threads(work)
+        self.assertEqual(self.bank.customers[a].savings.balance + self.bank.customers[b].savings.balance, 200)
+
+class TestConcurrentCsvBank(ConcurrencyMixin, unittest.TestCase):
+
+    def make_bank(self):
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        return Bank(self.bank_file, TransactionLogger(self.ledger))
+
+    def reopen(self):
+        self.bank.close()
+        bank_app._LEDGER_STATES.clear()
+        self.bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        return self.bank
+
+    def stored_checking(self):
+        with open(self.bank_file, newline="") as f:
+            return {row["account_id"]: row["balance_checking"] for row in csv.DictReader(f)}
+
+    def test_whole_file_saves_land_in_order(self):
+        a = self.ids[0]
+        b = next(x for x in self.ids if hash(x) % bank_app._LOCK_STRIPES != hash(a) % bank_app._LOCK_STRIPES)
+        write = self.bank.storage._write_snapshot
+        other = threading.Thread(target=self.bank.deposit_money, args=(b, "checking", 1))
+        def slow(get_rows):
+            if other.ident is None: # b's deposit runs while a's save is pending
+                other.start()
+                other.join(0.2)
+            return write(get_rows)
+        with mock.patch.object(self.bank.storage, "_write_snapshot", side_effect=slow):
+            self.bank.deposit_money(a, "checking", 1)
+            other.join()
+        stored = self.stored_checking()
+        self.assertEqual((stored[a], stored[b]), ("101.00", "101.00"))
+
+    def test_half_done_operations_are_not_saved(self):
+        a, b, c = self.ids[:3]
+        logging, release = threading.Event(), threading.Event()
+        log = self.bank.tx_logger.log
+        def stuck(*args, **kwargs):
+            if kwargs.get("tx_type") == "withdraw":
+                logging.set()
+                release.wait(10)
+                raise OSError("disk full")
+            return log(*args, **kwargs)
+        with mock.patch.object(self.bank.tx_logger, "log", side_effect=stuck):
+            def failing_withdraw():
+                with self.assertRaises(OSError):
+                    self.bank.withdraw_money(a, "checking", 30)
+            t = threading.Thread(target=failing_withdraw)
+            t.start()
+            self.assertTrue(logging.wait(10))
+            self.bank.deposit_money(c, "checking", 1) # saves the whole table meanwhile
+            release.set()
+            t.join()
+        stored = self.stored_checking()
+        self.assertEqual((stored[a], stored[c]), ("100.00", "101.00"))
+        self.assertEqual(self.bank.customers[a].checking.balance, 100)
+
+class TestConcurrentJournalBank(ConcurrencyMixin, unittest.TestCase):
+
+    def make_bank(self):
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        return Bank(self.bank_file, TransactionLogger(self.ledger, index=True), journal=True,
+                    fsync_every=0, compact_interval=0.005)
+
+    def reopen(self):
+        self.bank.close()
+        self.bank = Bank(self.bank_file, TransactionLogger(self.ledger), journal=True)
+        return self.bank
+
+    def test_ledger_ids_are_unique(self):
+        self.test_random_transfers_conserve_money()
+        with open(self.ledger, newline="") as f:
+            ids = [int(row["tx_id"]) for row in csv.DictReader(f)]
+        self.assertEqual(ids, list(range(1, len(ids) + 1)))
+
+class TestConcurrentSqliteBank(ConcurrencyMixin, unittest.TestCase):
+
+    def make_bank(self):
+        self.db = os.path.join(self.tmp.name, "bank.db")
+        return Bank(storage=SqliteStorage(self.db))
+
+    def reopen(self):
+        self.bank.close()
+        self.bank = Bank(storage=SqliteStorage(self.db))
+        return self.bank
+
+if __name__=="__main__":
+    unittest.main()
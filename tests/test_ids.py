@@ -0,0 +1,145 @@
+import unittest
+import os
+import csv
+import tempfile
+import threading
+from customer import bank_app, passwords
+from customer.bank_app import Bank, TransactionLogger
+from customer.ids import IdAllocator
+from customer.storage import SqliteStorage
+
+class TestIdAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "bank.csv.ids")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stored(self):
+        with open(self.filename) as f:
+            return int(f.read())
+
+    def test_blocks_are_reserved_before_use(self):
+        allocator = IdAllocator(self.filename, block_size=10)
+        self.assertEqual([allocator.next_id() for _ in range(3)], [10001, 10002, 10003])
+        self.assertEqual(self.stored(), 10010) # the whole block, written once
+        # a crash loses the rest of the block, but nothing is handed out twice
+        restarted = IdAllocator(self.filename, block_size=10)
+        self.assertEqual(restarted.next_id(), 10011)
+        restarted.release() # a clean shutdown gives the unused ids back
+        self.assertEqual(self.stored(), 10011)
+        self.assertEqual(IdAllocator(self.filename, block_size=10).next_id(), 10012)
+
+    def test_reserve_and_seen(self):
+        allocator = IdAllocator(self.filename, block_size=10)
+        self.assertEqual(list(allocator.reserve(3)), [10001, 10002, 10003])
+        self.assertEqual(list(allocator.reserve(25)), list(range(10004, 10029))) # carries on, no gap
+        self.assertEqual(self.stored(), 10028)
+        self.assertEqual(allocator.next_id(), 10029)
+        allocator.seen(20000)
+        self.assertEqual(allocator.next_id(), 20001)
+        allocator.seen(15000) # never goes back
+        self.assertEqual(allocator.next_id(), 20002)
+        in_memory = IdAllocator(None, block_size=10)
+        self.assertEqual([in_memory.next_id(), in_memory.next_id()], [10001, 10002])
+
+    def test_sharers_get_disjoint_ids(self):
+        first, second = IdAllocator(self.filename, 5), IdAllocator(self.filename, 5)
+        taken = []
+        def take(allocator):
+            for _ in range(200):
+                taken.append(allocator.next_id())
+        threads = [threading.Thread(target=take, args=(a,)) for a in (first, second, first, second)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(taken)), 800)
+        first.release()
+        second.release() # first's release can't lower the mark below second's ids
+        self.assertGreaterEqual(self.stored(), max(taken))
+        self.assertGreater(IdAllocator(self.filename).next_id(), max(taken))
+
+class TestBankIds(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder",passwords.DEFAULT_HASHER.hash("P@ssword1"),"1000","5000"])
+            writer.writerow(["10007","Bob","Builder",passwords.DEFAULT_HASHER.hash("StrongP@ss2"),"50","500"])
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self, **kwargs):
+        return Bank(self.bank_file, TransactionLogger(self.ledger), **kwargs)
+
+    def test_new_customers_are_appended(self):
+        with open(self.bank_file, "rb") as f:
+            before = f.read()
+        inode = os.stat(self.bank_file).st_ino
+        bank = self.open_bank()
+        self.assertEqual(bank.add_new_customer("Dora","Explorer","Strong1@",10,20), "10008")
+        self.assertEqual(bank.add_new_customer("Eve","Online","Strong2@"), "10009")
+        self.assertEqual(os.stat(self.bank_file).st_ino, inode) # not rewritten
+        with open(self.bank_file, "rb") as f:
+            self.assertTrue(f.read().startswith(before))
+        bank.close()
+        bank = self.open_bank()
+        self.assertEqual(bank.customers["10008"].savings.balance, 20)
+        self.assertTrue(bank.log_in("10009", "Strong2@"))
+        self.assertEqual(bank.add_new_customer("Fay","Wray","Strong3@"), "10010") # sequential after close
+
+    def test_bulk_add_is_all_or_nothing(self):
+        bank = self.open_bank()
+        entries = [{"first_name": f"First{i}", "last_name": "Last", "password": f"P@ssw0rd{i}",
+                    "initial_checking": i} for i in range(5)]
+        with self.assertRaisesRegex(ValueError, "Customer 4: Password too weak"):
+            bank.bulk_add_customers(entries[:3] + [{**entries[3], "password": "weak"}])
+        self.assertEqual(len(bank.customers), 2)
+        hashed = passwords.DEFAULT_HASHER.hash("Imported1!")
+        new_ids = bank.bulk_add_customers(entries + [{"first_name": "Old", "last_name": "Import", "password": hashed}],
+                                          prehashed=True)
+        self.assertEqual(new_ids, [str(i) for i in range(10008, 10014)])
+        self.assertEqual(bank.top_3_customers()[0].account_id, "10001")
+        bank.close()
+        bank = self.open_bank()
+        self.assertEqual(len(bank.customers), 8)
+        self.assertEqual(bank.customers["10012"].checking.balance, 4)
+        self.assertTrue(bank.log_in("10013", "Imported1!"))
+
+    def test_torn_append_is_dropped(self):
+        bank = self.open_bank()
+        bank.add_new_customer("Dora","Explorer","Strong1@")
+        with open(self.bank_file, "a") as f:
+            f.write("10099,Half,Writ") # a crash in the middle of an append
+        bank = self.open_bank()
+        self.assertNotIn("10099", bank.customers)
+        new_id = bank.add_new_customer("Eve","Online","Strong2@")
+        with open(self.bank_file, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["account_id"] for r in rows], ["10001", "10007", "10008", new_id])
+
+    def test_journal_and_sqlite_storage(self):
+        bank = self.open_bank(journal=True)
+        a, b = bank.bulk_add_customers([{"first_name": "A", "last_name": "B", "password": "Strong1@"}] * 2)
+        bank.close()
+        self.assertEqual(self.open_bank(journal=True).customers[b].first_name, "A")
+        db = os.path.join(self.tmp.name, "bank.db")
+        bank = Bank(storage=SqliteStorage(db))
+        self.assertEqual(bank.add_new_customer("Dora","Explorer","Strong1@"), "10001")
+        bank.close()
+        bank = Bank(storage=SqliteStorage(db))
+        self.assertEqual(bank.add_new_customer("Eve","Online","Strong2@"), "10002")
+        self.assertEqual(len(bank.customers), 2)
+        bank.close()
+
+if __name__ == "__main__":
+    unittest.main()
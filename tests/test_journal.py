@@ -0,0 +1,96 @@
+import unittest
+import os
+import csv
+import time
+import tempfile
+from customer.bank_app import Bank, TransactionLogger
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+        self.bank = self.open_bank()
+
+    def tearDown(self):
+        self.bank.close()
+        self.tmp.cleanup()
+
+    def open_bank(self, **kwargs):
+        return Bank(self.bank_file, TransactionLogger(self.ledger), journal=True, **kwargs)
+
+    def reopen(self):
+        self.bank.close()
+        self.bank = self.open_bank()
+        return self.bank
+
+    def test_mutation_does_not_rewrite_snapshot(self):
+        with open(self.bank_file) as f:
+            before = f.read()
+        self.bank.deposit_money("10001","checking",500)
+        self.bank.transfer_money("10001","savings","10002","checking",100)
+        with open(self.bank_file) as f:
+            self.assertEqual(f.read(), before)
+        self.assertTrue(os.path.exists(self.bank_file + ".journal"))
+
+    def test_reload_replays_journal(self):
+        self.bank.deposit_money("10001","checking",500)
+        self.bank.withdraw_money("10002","checking",60)
+        new_id = self.bank.add_new_customer("Dora","Explorer","Strong1@",10,20)
+        bank = self.reopen()
+        self.assertEqual(bank.customers["10001"].checking.balance,1500)
+        self.assertEqual(bank.customers["10002"].checking.balance,-45)
+        self.assertEqual(bank.customers["10002"].checking.overdraft_count,1)
+        self.assertEqual(bank.customers[new_id].savings.balance,20)
+
+    def test_compact_folds_journal_into_snapshot(self):
+        self.bank.withdraw_money("10002","checking",60)
+        self.bank.compact()
+        self.assertFalse(os.path.exists(self.bank_file + ".journal"))
+        plain = Bank(self.bank_file, TransactionLogger(self.ledger))
+        self.assertEqual(plain.customers["10002"].checking.balance,-45)
+        self.assertEqual(plain.customers["10002"].checking.overdraft_count,1)
+
+    def test_torn_append_is_not_replayed(self):
+        self.bank.deposit_money("10001","checking",500)
+        self.bank.close()
+        with open(self.bank_file + ".journal", "a", newline="") as f:
+            f.write("10001,Alice,Wonder,P@ssword1,99999,5000,0,True\r\n10002,Bob,Bui") # no commit row
+        bank = self.reopen()
+        self.assertEqual(bank.customers["10001"].checking.balance,1500)
+        self.assertEqual(bank.customers["10002"].checking.balance,50)
+        bank.deposit_money("10002","checking",5) # appending after the torn tail still works
+        self.assertEqual(self.reopen().customers["10002"].checking.balance,55)
+
+    def test_crash_during_compaction_recovers(self):
+        self.bank.deposit_money("10001","checking",500)
+        with self.bank.storage.journal.lock: # rotate, then "crash" before the snapshot is written
+            self.bank.storage.journal.rotate()
+        self.bank.deposit_money("10001","savings",1)
+        bank = self.reopen()
+        self.assertEqual(bank.customers["10001"].checking.balance,1500)
+        self.assertEqual(bank.customers["10001"].savings.balance,5001)
+        bank.compact()
+        self.assertFalse(os.path.exists(self.bank_file + ".journal.old"))
+        self.assertEqual(self.reopen().customers["10001"].savings.balance,5001)
+
+    def test_background_compaction(self):
+        self.bank.close()
+        self.bank = self.open_bank(compact_interval=0.01, fsync_every=0)
+        self.bank.deposit_money("10001","checking",500)
+        deadline = time.time() + 5
+        while (os.path.exists(self.bank_file + ".journal") or os.path.exists(self.bank_file + ".journal.old")) \
+                and time.time() < deadline:
+            time.sleep(0.01)
+        with open(self.bank_file, newline="") as f:
+            rows = {row["account_id"]: row for row in csv.DictReader(f)}
+        self.assertEqual(float(rows["10001"]["balance_checking"]),1500)
+
+if __name__=="__main__":
+    unittest.main()
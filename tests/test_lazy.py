@@ -0,0 +1,146 @@
+import unittest
+import os
+import csv
+import gc
+import tempfile
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.lazy import LazyCustomers
+
+class TestLazyCustomers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            for i in range(50):
+                writer.writerow([str(10001 + i), f"First{i}", "Last", "P@ssword1", str(100 + i), "500"])
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self, journal=False, cache_size=4):
+        return Bank(self.bank_file, TransactionLogger(self.ledger), journal=journal,
+                    customers=LazyCustomers(cache_size=cache_size))
+
+    def test_customers_are_built_on_first_access(self):
+        bank = self.open_bank()
+        customers = bank.customers
+        self.assertEqual(len(customers), 50)
+        self.assertEqual(len(customers._cache), 0)
+        self.assertIn("10050", customers)
+        self.assertNotIn("99999", customers)
+        self.assertEqual(customers["10007"].checking.balance, 106)
+        self.assertTrue(bank.log_in("10003", "P@ssword1"))
+        self.assertEqual(len(customers._cache), 2)
+        self.assertEqual(customers._dirty, {}) # its password was hashed on login, and saved
+        for i in range(10):
+            customers.get(str(10010 + i))
+        self.assertEqual(len(customers._cache), 4) # bounded by cache_size
+
+    def test_only_changed_customers_are_rewritten(self):
+        bank = self.open_bank()
+        bank.deposit_money("10001","checking",10)
+        bank.transfer_money("10002","savings","10040","checking",50)
+        for i in range(20): # push everything out of the cache
+            bank.customers.get(str(10020 + i))
+        self.assertEqual(bank.customers._dirty, {}) # saved, so they could be evicted too
+        self.assertEqual(len(bank.customers._cache), 4)
+        new_id = bank.add_new_customer("Dora","Explorer","Strong1@",10,20)
+        self.assertEqual(new_id, "10051")
+
+        bank = self.open_bank()
+        self.assertEqual(bank.customers["10001"].checking.balance, 110)
+        self.assertEqual(bank.customers["10002"].savings.balance, 450)
+        self.assertEqual(bank.customers["10040"].checking.balance, 189)
+        self.assertEqual(bank.customers[new_id].savings.balance, 20)
+        self.assertEqual(bank.customers["10030"].first_name, "First29")
+        self.assertEqual(len(bank.customers._cache), 4)
+
+    def test_journal_rows_are_seen_before_compaction(self):
+        bank = self.open_bank(journal=True)
+        bank.withdraw_money("10005","checking",150)
+        bank.close()
+        bank_app._LEDGER_STATES.clear()
+        bank = self.open_bank(journal=True)
+        self.assertEqual(bank.customers["10005"].checking.overdraft_count, 1)
+        bank.compact()
+        for i in range(10):
+            bank.customers.get(str(10030 + i))
+        self.assertEqual(bank.customers["10005"].checking.balance, -81)
+        self.assertEqual(bank.customers["10006"].checking.balance, 105)
+        bank.close()
+
+    def test_held_customer_is_not_loaded_twice(self):
+        bank = self.open_bank(cache_size=1)
+        alice = bank.customers["10001"]
+        bank.customers.get("10002")
+        self.assertIs(bank.customers["10001"], alice)
+        del alice
+        gc.collect()
+        self.assertEqual(bank.customers["10001"].checking.balance, 100)
+
+    def test_batch_and_ranking(self):
+        bank = self.open_bank(cache_size=2)
+        ops = [{"op": "deposit", "account_id": str(10001 + i), "account_type": "savings", "amount": "1000"}
+               for i in range(0, 50, 7)]
+        self.assertTrue(bank.apply_batch(ops).ok)
+        top = [c.account_id for c in bank.top_3_customers()]
+        self.assertEqual(top, ["10050", "10043", "10036"])
+        self.assertEqual(len(bank.customers._cache), 2)
+
+    def test_saved_customers_are_not_kept_forever(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                bank = self.open_bank(journal=journal)
+                first = bank.customers["10001"].checking.balance
+                last = bank.customers["10050"].checking.balance
+                for i in range(500):
+                    bank.deposit_money(str(10001 + i % 50), "checking", 1)
+                customers = bank.customers
+                self.assertEqual(customers._dirty, {})
+                self.assertLessEqual(len(customers._cache), 4)
+                self.assertEqual(len(customers._overlay), 50 if journal else 0) # rows, until compaction
+                bank.compact()
+                self.assertEqual(customers._overlay, {})
+                self.assertEqual(customers["10001"].checking.balance, first + 10)
+                bank.close()
+                bank_app._LEDGER_STATES.clear()
+                self.assertEqual(self.open_bank(journal=journal).customers["10050"].checking.balance, last + 10)
+
+    def test_evicted_customers_keep_their_state(self):
+        for account_id, journal in (("10001", False), ("10002", True)):
+            with self.subTest(journal=journal):
+                bank = self.open_bank(journal=journal, cache_size=1)
+                balance = bank.customers[account_id].checking.balance
+                bank.withdraw_money(account_id, "checking", balance + 10)
+                bank.withdraw_money(account_id, "checking", 10) # second overdraft deactivates it
+                bank.customers.get("10040") # evicts it
+                gc.collect()
+                self.assertNotIn(account_id, bank.customers._cache)
+                checking = bank.customers[account_id].checking
+                self.assertEqual((checking.is_active, checking.overdraft_count), (False, 2))
+                bank.close()
+
+    def test_imported_customers_are_bounded_by_the_cache(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                bank = self.open_bank(journal=journal)
+                new_ids = bank.bulk_add_customers(
+                    [{"first_name": f"New{i}", "last_name": "Last", "password": "Strong1@", "initial_checking": i}
+                     for i in range(500)])
+                customers = bank.customers
+                self.assertEqual(customers._dirty, {})
+                self.assertLessEqual(len(customers._cache), 4)
+                gc.collect()
+                self.assertIn(new_ids[0], customers) # evicted, found on disk again
+                self.assertEqual(customers[new_ids[10]].checking.balance, 10)
+                self.assertEqual(len(customers), 50 + 500 * (journal + 1)) # the second run adds to the first
+                bank.close()
+
+if __name__=="__main__":
+    unittest.main()
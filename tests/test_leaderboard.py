@@ -0,0 +1,108 @@
+import unittest
+import os
+import csv
+import random
+import tempfile
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.leaderboard import Leaderboard
+from customer.storage import SqliteStorage
+
+class TestLeaderboard(unittest.TestCase):
+
+    def test_matches_full_sort_under_updates(self):
+        rng = random.Random(3)
+        totals = {str(i): rng.randrange(-10000, 10000) for i in range(3000)}
+        board = Leaderboard(totals.items())
+        for _ in range(2000):
+            account_id = str(rng.randrange(3100))
+            if rng.random() < 0.05:
+                board.remove(account_id)
+                totals.pop(account_id, None)
+            else:
+                totals[account_id] = rng.randrange(-10000, 10000)
+                board.update(account_id, totals[account_id])
+        ranked = sorted(totals, key=lambda a: (-totals[a], a))
+        self.assertEqual(len(board), len(ranked))
+        self.assertEqual(board.top(10), ranked[:10])
+        self.assertEqual(board.bottom(10), ranked[::-1][:10])
+        self.assertEqual(board.top(len(ranked) + 5), ranked)
+        for account_id in rng.sample(ranked, 50):
+            self.assertEqual(board.rank(account_id), ranked.index(account_id) + 1)
+        self.assertIsNone(board.rank("missing"))
+
+    def test_empty(self):
+        board = Leaderboard()
+        self.assertEqual((board.top(3), board.bottom(3)), ([], []))
+        board.update("1", 5)
+        board.remove("1")
+        self.assertEqual(board.top(1), [])
+
+    def test_negative_k(self):
+        board = Leaderboard((str(i), i) for i in range(10))
+        self.assertEqual((board.top(0), board.bottom(0)), ([], []))
+        for method in (board.top, board.bottom):
+            with self.assertRaises(ValueError):
+                method(-1)
+
+class TestBankRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+            writer.writerow(["10003","Carol","Singer","StrongP@ss3","300","300"])
+        self.bank = Bank(self.bank_file, TransactionLogger(os.path.join(self.tmp.name, "transactions.csv")))
+
+    def tearDown(self):
+        self.bank.close()
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def names(self, customers):
+        return [c.first_name for c in customers]
+
+    def test_ranking_follows_operations(self):
+        self.assertEqual(self.names(self.bank.top_3_customers()), ["Alice","Carol","Bob"])
+        self.assertEqual(self.bank.customer_rank("10002"), 3)
+        self.bank.deposit_money("10002","savings",10000)
+        self.bank.transfer_money("10001","savings","10003","checking",4800)
+        self.assertEqual(self.names(self.bank.top_k_customers(2)), ["Bob","Carol"])
+        self.assertEqual(self.names(self.bank.bottom_k_customers(1)), ["Alice"])
+        new_id = self.bank.add_new_customer("Dora","Explorer","Strong1@",0,1)
+        self.assertEqual(self.bank.customer_rank(new_id), 4)
+        self.bank.apply_batch([{"op": "deposit", "account_id": new_id, "account_type": "savings", "amount": "99999"}])
+        self.assertEqual(self.bank.customer_rank(new_id), 1)
+        with self.assertRaises(ValueError):
+            self.bank.customer_rank("99999")
+
+    def test_failed_operations_keep_ranking(self):
+        self.bank.top_3_customers()
+        with self.assertRaises(ValueError):
+            self.bank.transfer_money("10002","checking","10003","bogus",40)
+        result = self.bank.apply_batch([
+            {"op": "deposit", "account_id": "10002", "account_type": "savings", "amount": "90000"},
+            {"op": "withdraw", "account_id": "10003", "account_type": "savings", "amount": "1000000"},
+        ])
+        self.assertTrue(result.rolled_back)
+        self.assertEqual(self.names(self.bank.bottom_k_customers(3)), ["Bob","Carol","Alice"])
+
+    def test_sqlite_backend(self):
+        storage = SqliteStorage(os.path.join(self.tmp.name, "bank.db"))
+        bank = Bank(storage=storage, customers=None)
+        try:
+            for name, amount in (("Ann", 5), ("Ben", 50), ("Cat", 20)):
+                bank.add_new_customer(name, "X", "Strong1@", amount, 0)
+            self.assertEqual(self.names(bank.top_k_customers(2)), ["Ben","Cat"])
+            self.assertEqual(bank.customer_rank("10001"), 3)
+            with self.assertRaises(ValueError):
+                bank.top_k_customers(-1) # not LIMIT -1, i.e. everyone
+        finally:
+            bank.close()
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import csv
+import tempfile
+from datetime import datetime
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.ledger_index import LedgerIndex, main
+
+class TestLedgerIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def fill(self, logger):
+        logger.log("deposit", to_id="10001", to_type="checking", amount=10)
+        logger.log("deposit", to_id="10002", to_type="savings", amount=20)
+        logger.log("transfer", from_id="10001", from_type="checking", to_id="10002", to_type="savings", amount=5)
+        logger.log("withdraw", from_id="10002", from_type="savings", amount=1)
+
+    def scan(self, account_id):
+        return TransactionLogger(self.ledger).get_transactions_for_customer(account_id)
+
+    def test_indexed_lookup_matches_full_scan(self):
+        logger = TransactionLogger(self.ledger, index=True)
+        self.fill(logger)
+        self.assertTrue(os.path.exists(self.ledger + ".idx"))
+        for account_id in ["10001", "10002", "99999"]:
+            self.assertEqual(logger.get_transactions_for_customer(account_id), self.scan(account_id))
+        self.assertEqual([r["tx_id"] for r in logger.get_transactions_for_customer("10002")], ["2","3","4"])
+
+    def test_index_survives_restart_and_catches_up(self):
+        self.fill(TransactionLogger(self.ledger, index=True))
+        bank_app._LEDGER_STATES.clear()
+        TransactionLogger(self.ledger).log("deposit", to_id="10001", to_type="savings", amount=3) # not indexed
+        bank_app._LEDGER_STATES.clear()
+        logger = TransactionLogger(self.ledger, index=True)
+        self.assertEqual([r["tx_id"] for r in logger.get_transactions_for_customer("10001")], ["1","3","5"])
+
+    def test_rebuild_command(self):
+        self.fill(TransactionLogger(self.ledger))
+        main(["rebuild", self.ledger])
+        index = LedgerIndex(self.ledger)
+        self.assertEqual(len(index.offsets("10002")), 3)
+        self.assertEqual(index.rows("10001"), self.scan("10001"))
+
+    def test_stale_index_is_rebuilt(self):
+        self.fill(TransactionLogger(self.ledger, index=True))
+        bank_app._LEDGER_STATES.clear()
+        os.remove(self.ledger)
+        logger = TransactionLogger(self.ledger, index=True)
+        logger.log("deposit", to_id="10003", to_type="checking", amount=1)
+        self.assertEqual(logger.get_transactions_for_customer("10001"), [])
+        self.assertEqual(len(logger.get_transactions_for_customer("10003")), 1)
+
+    def test_date_range_filter(self):
+        with open(self.ledger, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TransactionLogger.FIELDNAMES)
+            for tx_id, month in enumerate([1, 2, 2, 3], 1):
+                writer.writerow([tx_id, datetime(2025, month, 15).isoformat(), "deposit", "", "", "10001", "checking", 1, 0, 1])
+        indexed = TransactionLogger(self.ledger, index=True)
+        start, end = datetime(2025, 2, 1), "2025-03-01"
+        rows = indexed.get_transactions_for_customer("10001", start, end)
+        self.assertEqual([r["tx_id"] for r in rows], ["2","3"])
+        bank_app._LEDGER_STATES.clear()
+        scanned = TransactionLogger(self.ledger).get_transactions_for_customer("10001", start, end)
+        self.assertEqual(scanned, rows)
+
+    def test_statement_uses_index(self):
+        bank_file = os.path.join(self.tmp.name, "bank.csv")
+        with open(bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+        bank = Bank(bank_file, TransactionLogger(self.ledger, index=True))
+        bank.deposit_money("10001","checking",100)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            bank.generate_statement("10001", start=datetime(2000, 1, 1))
+            with open("10001_statement.txt") as f:
+                self.assertIn("deposit | Amount: 100", f.read())
+        finally:
+            os.chdir(cwd)
+
+if __name__=="__main__":
+    unittest.main()
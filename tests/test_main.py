@@ -0,0 +1,99 @@
+import unittest
+import os
+import io
+import subprocess
+import sys
+import tempfile
+import main
+from customer import bank_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name) # statements are written to the working directory
+        with open("customers.csv", "w", newline="") as f:
+            f.write("first_name,last_name,password,initial_checking,initial_savings\n"
+                    "Alice,Wonder,P@ssword1,100,50\n"
+                    "Bob,Builder,StrongP@ss2,10,\n")
+        self.assertEqual(self.run_main("import", "customers.csv"), (0, "10001\n10002\n", ""))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def run_main(self, *argv, stdin=""):
+        out, err = io.StringIO(), io.StringIO()
+        code = main.main(list(argv), io.StringIO(stdin), out, err)
+        bank_app._LEDGER_STATES.clear() # every command is a fresh process in real use
+        return code, out.getvalue(), err.getvalue()
+
+    def test_subcommands(self):
+        self.assertEqual(self.run_main("deposit", "10001", "checking", "25.50"), (0, "125.50\n", ""))
+        self.assertEqual(self.run_main("withdraw", "10001", "savings", "20"), (0, "30.00 0.00\n", ""))
+        self.assertEqual(self.run_main("transfer", "10001", "checking", "10002", "savings", "5"),
+                         (0, "120.50 5.00\n", ""))
+        code, out, _ = self.run_main("top", "-k", "1")
+        self.assertEqual(out, "1\t10001\tAlice\tWonder\t150.50\n")
+        self.assertEqual(self.run_main("statement", "10002"), (0, "10002_statement.txt\n", ""))
+        with open("10002_statement.txt") as f:
+            self.assertIn("Savings Balance: 5.00", f.read())
+
+    def test_errors_set_the_exit_code(self):
+        self.assertEqual(self.run_main("withdraw", "10002", "checking", "500"),
+                         (1, "", "error: Withdrawal would exceed overdraft limit.\n"))
+        self.assertEqual(self.run_main("deposit", "99999", "checking", "1")[0], 1)
+        self.assertEqual(self.run_main("import", "customers.csv")[0], 0) # fresh ids for the same people
+        with self.assertRaises(SystemExit):
+            self.run_main("deposit", "10001", "gold", "1")
+
+    def test_import_needs_names_and_passwords(self):
+        with open("partial.csv", "w", newline="") as f:
+            f.write("first_name,password\nCarol,StrongP@ss3\n")
+        self.assertEqual(self.run_main("import", "partial.csv"),
+                         (1, "", "error: partial.csv: missing columns: last_name\n"))
+        with open("blank.csv", "w", newline="") as f:
+            f.write("first_name,last_name,password\nCarol,Singer,StrongP@ss3\nDan,,StrongP@ss4\n")
+        self.assertEqual(self.run_main("import", "blank.csv"),
+                         (1, "", "error: blank.csv, line 3: no last_name\n"))
+        self.assertEqual(self.run_main("deposit", "10003", "checking", "1")[0], 1) # nothing was added
+
+    def test_bad_data_files_are_reported(self):
+        os.mkdir("folder")
+        code, out, err = self.run_main("--bank", "folder", "top")
+        self.assertEqual((code, out), (1, ""))
+        self.assertTrue(err.startswith("error: "), err)
+        with open("other.csv", "w", newline="") as f:
+            f.write("foo,bar\n1,2\n")
+        self.assertEqual(self.run_main("--bank", "other.csv", "deposit", "1", "checking", "1"),
+                         (1, "", "error: other.csv is not a customer file: no account_id, first_name, last_name,"
+                                 " password, balance_checking, balance_savings column\n"))
+
+    def test_batch_from_stdin(self):
+        commands = ("deposit 10001 checking 5\n"
+                    "# a comment, then a blank line\n\n"
+                    "withdraw 10002 checking 500\n"
+                    "bogus 1\n"
+                    "batch\n"
+                    "transfer 10001 checking 10002 checking '1.5'\n")
+        code, out, err = self.run_main("batch", stdin=commands)
+        self.assertEqual(code, 1)
+        self.assertEqual(out, "105.00\n103.50 11.50\n")
+        self.assertEqual(err.splitlines(), ["line 4: Withdrawal would exceed overdraft limit.",
+                                            "line 5: Unknown command: bogus",
+                                            "line 6: Unknown command: batch"])
+        self.assertEqual(self.run_main("batch", stdin="deposit 10002 savings 1\n"), (0, "1.00\n", ""))
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_loads_no_bank_or_colorama(self):
+        code = "import sys, main; print(sorted(m for m in ('colorama', 'customer.bank_app') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+if __name__ == "__main__":
+    unittest.main()
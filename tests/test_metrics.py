@@ -0,0 +1,109 @@
+import unittest
+import os
+import csv
+import tempfile
+from customer import bank_app, passwords
+from customer.bank_app import Bank, TransactionLogger
+from customer.metrics import Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            # already hashed, so loading doesn't rewrite the file
+            writer.writerow(["10001","Alice","Wonder",passwords.DEFAULT_HASHER.hash("P@ssword1"),"1000","5000"])
+            writer.writerow(["10002","Bob","Builder",passwords.DEFAULT_HASHER.hash("StrongP@ss2"),"50","500"])
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self, metrics=None, journal=False):
+        return Bank(self.bank_file, TransactionLogger(self.ledger), journal=journal, metrics=metrics)
+
+    def test_operations_are_counted_and_timed(self):
+        metrics = Metrics()
+        bank_size = os.path.getsize(self.bank_file)
+        bank = self.open_bank(metrics)
+        ledger_size = os.path.getsize(self.ledger)
+        bank.deposit_money("10001","checking",100)
+        bank.transfer_money("10001","savings","10002","savings",10)
+        with self.assertRaises(ValueError):
+            bank.withdraw_money("10002","checking",1000)
+        bank.generate_statement("10001")
+        counters = metrics.snapshot()["counters"]
+        histograms = metrics.snapshot()["histograms"]
+        self.assertEqual(counters['bank_operations_total{operation="deposit_money",outcome="ok"}'], 1)
+        self.assertEqual(counters['bank_operations_total{operation="withdraw_money",outcome="error"}'], 1)
+        self.assertEqual(histograms['bank_operation_seconds{operation="transfer_money"}']["count"], 1)
+        self.assertEqual(histograms['ledger_call_seconds{call="_next_tx_id"}']["count"], 2)
+        self.assertEqual(counters["customer_rows_read_total"], 2)
+        self.assertEqual(counters["customer_bytes_read_total"], bank_size)
+        self.assertEqual(counters["customer_rows_written_total"], 4) # whole snapshot, twice
+        self.assertEqual(counters["ledger_rows_written_total"], 2)
+        self.assertEqual(counters["ledger_bytes_written_total"], os.path.getsize(self.ledger) - ledger_size)
+        self.assertEqual(counters["ledger_rows_read_total"], 2)
+        bank.bulk_add_customers([{"first_name": "Cara", "last_name": "Way", "password": "StrongP@ss3"}])
+        bank.generate_all_statements(directory="statements")
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters['bank_operations_total{operation="bulk_add_customers",outcome="ok"}'], 1)
+        self.assertEqual(counters['bank_operations_total{operation="generate_all_statements",outcome="ok"}'], 1)
+
+    def test_journal_writes_only_changed_rows(self):
+        metrics = Metrics()
+        bank = self.open_bank(metrics, journal=True)
+        bank.deposit_money("10002","savings",1)
+        bank.apply_batch([{"op": "deposit", "account_id": "10001", "account_type": "savings", "amount": "2"}])
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["customer_rows_written_total"], 2)
+        header = len(",".join(Bank.FIELDNAMES)) + 2
+        self.assertEqual(counters["customer_bytes_written_total"] + header, os.path.getsize(self.bank_file + ".journal"))
+        bank.close()
+
+    def test_prometheus_text(self):
+        metrics = Metrics(buckets=(0.5, 1.0))
+        metrics.observe("op_seconds", 0.2, op="a")
+        metrics.observe("op_seconds", 0.7, op="a")
+        metrics.observe("op_seconds", 3.0, op="a")
+        metrics.inc("rows_total", 5, file='x"y')
+        text = metrics.render()
+        self.assertIn('# TYPE rows_total counter\nrows_total{file="x\\"y"} 5\n', text)
+        self.assertIn('# TYPE op_seconds histogram\n', text)
+        self.assertIn('op_seconds_bucket{op="a",le="0.5"} 1\n', text)
+        self.assertIn('op_seconds_bucket{op="a",le="1.0"} 2\n', text)
+        self.assertIn('op_seconds_bucket{op="a",le="+Inf"} 3\n', text)
+        self.assertIn('op_seconds_sum{op="a"} 3.9\n', text)
+        self.assertIn('op_seconds_count{op="a"} 3\n', text)
+
+    def test_profiles_requested_and_slow_operations(self):
+        metrics = Metrics()
+        bank = self.open_bank(metrics)
+        metrics.profile_next("deposit_money")
+        bank.log_in("10001","P@ssword1")
+        bank.deposit_money("10001","checking",1)
+        bank.deposit_money("10001","checking",1)
+        self.assertEqual([p[0] for p in metrics.profiles], ["deposit_money"])
+        self.assertIn("_persist", metrics.profile_report())
+
+        metrics = Metrics(slow_threshold=0)
+        bank = self.open_bank(metrics)
+        bank.deposit_money("10001","checking",1)
+        bank.deposit_money("10001","checking",1)
+        self.assertIn("deposit_money", [p[0] for p in metrics.profiles])
+
+    def test_disabled_by_default(self):
+        bank = self.open_bank()
+        self.assertNotIn("deposit_money", vars(bank))
+        self.assertIsNone(bank.tx_logger.metrics)
+        bank.deposit_money("10001","checking",1)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import csv
+import sqlite3
+import tempfile
+from decimal import Decimal
+from customer import bank_app
+from customer.bank_app import Bank, CheckingAccount, SavingsAccount, TransactionLogger
+from customer.money import format_cents, round_cents, to_cents
+from customer.storage import SqliteStorage
+
+class TestMoney(unittest.TestCase):
+
+    def test_to_cents(self):
+        self.assertEqual(to_cents(12), 1200)
+        self.assertEqual(to_cents(0.1), 10)
+        self.assertEqual(to_cents("19.99"), 1999)
+        self.assertEqual(to_cents(Decimal("-0.45")), -45)
+        self.assertEqual(to_cents("10.500"), 1050)
+        for sub_cent in ("0.005", 10.005, Decimal("-0.001"), 0.1 + 0.2):
+            with self.assertRaisesRegex(ValueError, "more than two decimal places"):
+                to_cents(sub_cent)
+        self.assertEqual(round_cents("0.005"), 0) # half-even, for stored values only
+        self.assertEqual(round_cents(0.1 + 0.2), 30)
+        self.assertEqual(format_cents(-4500), "-45.00")
+        self.assertEqual(format_cents(-5), "-0.05")
+        with self.assertRaises(ValueError):
+            to_cents("abc")
+        with self.assertRaises(ValueError):
+            to_cents(float("nan"))
+        with self.assertRaises(TypeError):
+            to_cents(None)
+
+    def test_no_float_drift(self):
+        acc = SavingsAccount()
+        for _ in range(3):
+            acc.deposit(0.1)
+        self.assertEqual(acc.balance, Decimal("0.30"))
+        for _ in range(1000):
+            acc.deposit(0.01)
+        self.assertEqual(acc.balance_cents, 1030)
+
+    def test_overdraft_limit_is_exact(self):
+        acc = CheckingAccount(0)
+        self.assertEqual(acc.withdraw("65"), (Decimal("-100.00"), 35)) # lands exactly on the limit
+        acc = CheckingAccount(0)
+        with self.assertRaises(ValueError):
+            acc.withdraw("65.01")
+        self.assertEqual(acc.balance_cents, 0)
+
+class TestMoneyPersistence(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def test_csv_round_trip_is_exact(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        new_id = bank.add_new_customer("Rich","Person","Str0ng@pass","12345678901234.56","0.1")
+        bank.deposit_money(new_id,"savings",0.2)
+        with open(self.bank_file, newline="") as f:
+            row = next(csv.DictReader(f))
+        self.assertEqual((row["balance_checking"], row["balance_savings"]), ("12345678901234.56", "0.30"))
+        with open(self.ledger, newline="") as f:
+            tx = list(csv.DictReader(f))[-1] # after the two "open" rows
+        self.assertEqual((tx["amount"], tx["fee"], tx["resulting_balance"]), ("0.20", "0.00", "0.30"))
+        again = Bank(self.bank_file, TransactionLogger(self.ledger))
+        self.assertEqual(again.customers[new_id].checking.balance, Decimal("12345678901234.56"))
+
+    def test_sub_cent_amounts_are_refused(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        new_id = bank.add_new_customer("Rich","Person","Str0ng@pass",10,0)
+        for op in (lambda: bank.deposit_money(new_id,"checking",10.005),
+                   lambda: bank.withdraw_money(new_id,"checking","0.001"),
+                   lambda: bank.add_new_customer("Poor","Person","Str0ng@pass","0.999")):
+            with self.assertRaises(ValueError):
+                op()
+        self.assertEqual(bank.customers[new_id].checking.balance, 10)
+
+    def test_float_noise_from_old_files_is_rounded(self):
+        with open(self.bank_file, "w", newline="") as f:
+            f.write("account_id,first_name,last_name,password,balance_checking,balance_savings\n"
+                    "10001,Alice,Wonder,P@ssword1,0.30000000000000004,1100.1\n")
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        self.assertEqual(bank.customers["10001"].checking.balance_cents, 30)
+        self.assertEqual(bank.customers["10001"].savings.balance, Decimal("1100.10"))
+
+    def test_sqlite_stores_minor_units(self):
+        db = os.path.join(self.tmp.name, "bank.db")
+        bank = Bank(storage=SqliteStorage(db))
+        new_id = bank.add_new_customer("Rich","Person","Str0ng@pass",0.1,0)
+        bank.deposit_money(new_id,"checking","0.2")
+        self.assertEqual(bank.tx_logger.get_transactions_for_customer(new_id)[-1]["resulting_balance"], "0.30")
+        bank.close()
+        conn = sqlite3.connect(db)
+        self.assertEqual(conn.execute("SELECT balance_checking FROM customers").fetchone()[0], 30)
+        conn.close()
+
+    def test_old_sqlite_database_is_converted(self):
+        db = os.path.join(self.tmp.name, "old.db")
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE customers (account_id TEXT PRIMARY KEY, first_name TEXT, last_name TEXT,"
+                     " password TEXT, balance_checking NUMERIC, balance_savings NUMERIC,"
+                     " overdraft_count INTEGER DEFAULT 0, is_active INTEGER DEFAULT 1)")
+        conn.execute("INSERT INTO customers VALUES ('10001', 'A', 'B', 'x', 10.5, 0.3, 0, 1)")
+        conn.commit()
+        conn.close()
+        bank = Bank(storage=SqliteStorage(db))
+        self.assertEqual(bank.customers["10001"].checking.balance, Decimal("10.50"))
+        self.assertEqual(bank.customers["10001"].savings.balance_cents, 30)
+        bank.close()
+
+if __name__=="__main__":
+    unittest.main()
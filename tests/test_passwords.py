@@ -0,0 +1,161 @@
+import unittest
+import os
+import csv
+import tempfile
+from unittest import mock
+from customer import bank_app, passwords
+from customer.bank_app import Bank, TransactionLogger
+from customer.lazy import LazyCustomers
+from customer.passwords import LoginCache, PasswordHasher
+
+class TestPasswordHasher(unittest.TestCase):
+
+    def test_hash_and_verify(self):
+        for hasher in (PasswordHasher(n=2**4), PasswordHasher("pbkdf2_sha256", iterations=1000)):
+            with self.subTest(scheme=hasher.scheme):
+                stored = hasher.hash("P@ssword1")
+                self.assertTrue(stored.startswith(hasher.scheme + "$"))
+                self.assertNotIn("P@ssword1", stored)
+                self.assertNotEqual(stored, hasher.hash("P@ssword1")) # salted
+                self.assertTrue(hasher.is_hashed(stored))
+                self.assertTrue(hasher.verify("P@ssword1", stored))
+                self.assertFalse(hasher.verify("P@ssword2", stored))
+                self.assertFalse(hasher.needs_rehash(stored))
+
+    def test_plaintext_and_other_work_factors(self):
+        hasher = PasswordHasher(n=2**5)
+        self.assertFalse(hasher.is_hashed("P@ssword1"))
+        self.assertTrue(hasher.verify("P@ssword1", "P@ssword1"))
+        self.assertFalse(hasher.verify("P@ssword", "P@ssword1"))
+        self.assertFalse(hasher.is_hashed("scrypt$P@ss$word1")) # a plaintext that merely looks like one
+        old = PasswordHasher(n=2**4).hash("P@ssword1")
+        self.assertTrue(hasher.verify("P@ssword1", old))
+        self.assertTrue(hasher.needs_rehash(old))
+        self.assertTrue(hasher.needs_rehash("P@ssword1"))
+        self.assertTrue(hasher.needs_rehash(PasswordHasher("pbkdf2_sha256", iterations=1000).hash("x")))
+        with self.assertRaises(ValueError):
+            PasswordHasher(n=1000)
+        with self.assertRaises(ValueError):
+            PasswordHasher("md5")
+
+class TestLoginCache(unittest.TestCase):
+
+    def test_entries_match_only_the_same_password_and_hash(self):
+        cache = LoginCache()
+        cache.add("10001", "scrypt$a", "P@ssword1")
+        self.assertTrue(cache.check("10001", "scrypt$a", "P@ssword1"))
+        self.assertFalse(cache.check("10001", "scrypt$a", "P@ssword2"))
+        self.assertFalse(cache.check("10001", "scrypt$b", "P@ssword1")) # password changed since
+        self.assertFalse(cache.check("10002", "scrypt$a", "P@ssword1"))
+        cache.invalidate("10001")
+        self.assertFalse(cache.check("10001", "scrypt$a", "P@ssword1"))
+
+    def test_ttl_and_size_bounds(self):
+        now = [0.0]
+        cache = LoginCache(max_entries=2, ttl=60, clock=lambda: now[0])
+        cache.add("10001", "h", "p")
+        cache.add("10002", "h", "p")
+        now[0] = 30
+        self.assertTrue(cache.check("10001", "h", "p")) # now the most recently used
+        cache.add("10003", "h", "p")
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(cache.check("10002", "h", "p"))
+        now[0] = 61
+        self.assertFalse(cache.check("10001", "h", "p"))
+        self.assertTrue(cache.check("10003", "h", "p"))
+        off = LoginCache(ttl=0)
+        off.add("10001", "h", "p")
+        self.assertFalse(off.check("10001", "h", "p"))
+
+class TestBankPasswords(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        self.write_bank()
+
+    def write_bank(self):
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def stored_passwords(self):
+        with open(self.bank_file, newline="") as f:
+            return {row["account_id"]: row["password"] for row in csv.DictReader(f)}
+
+    def test_plaintext_rows_are_hashed_on_load(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                self.write_bank()
+                Bank(self.bank_file, TransactionLogger(self.ledger), journal=journal).close()
+                bank = Bank(self.bank_file, TransactionLogger(self.ledger), journal=journal)
+                stored = self.stored_passwords()
+                self.assertTrue(all(passwords.DEFAULT_HASHER.is_hashed(p) for p in stored.values()))
+                self.assertTrue(bank.log_in("10001", "P@ssword1"))
+                self.assertFalse(bank.log_in("10001", "StrongP@ss2"))
+                self.assertEqual(bank.customers["10002"].savings.balance, 500)
+                bank.close()
+
+    def test_new_customers_are_stored_hashed(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        new_id = bank.add_new_customer("Dora","Explorer","Strong1@")
+        self.assertTrue(passwords.DEFAULT_HASHER.is_hashed(self.stored_passwords()[new_id]))
+        self.assertTrue(Bank(self.bank_file, TransactionLogger(self.ledger)).log_in(new_id, "Strong1@"))
+
+    def test_hashes_are_only_taken_as_is_from_imports(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        for looks_hashed in ("pbkdf2_sha256$1$AAAA$AAAA", passwords.DEFAULT_HASHER.hash("Imported1!")):
+            self.assertTrue(passwords.DEFAULT_HASHER.is_hashed(looks_hashed))
+            new_id = bank.add_new_customer("Eve","X",looks_hashed) # a password like any other
+            self.assertNotEqual(self.stored_passwords()[new_id], looks_hashed)
+            self.assertTrue(bank.log_in(new_id, looks_hashed))
+        imported = bank.bulk_add_customers([{"first_name": "Old", "last_name": "Import", "password": looks_hashed}],
+                                           prehashed=True)[0]
+        self.assertEqual(self.stored_passwords()[imported], looks_hashed)
+        self.assertTrue(bank.log_in(imported, "Imported1!"))
+
+    def test_lazy_customers_are_hashed_on_first_login(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger), customers=LazyCustomers())
+        self.assertEqual(self.stored_passwords()["10001"], "P@ssword1") # nothing loaded yet
+        self.assertFalse(bank.log_in("10001", "wrong"))
+        self.assertTrue(bank.log_in("10001", "P@ssword1"))
+        stored = self.stored_passwords()
+        self.assertTrue(passwords.DEFAULT_HASHER.is_hashed(stored["10001"]))
+        self.assertEqual(stored["10002"], "StrongP@ss2")
+
+    def test_login_cache_skips_the_kdf(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        with mock.patch.object(PasswordHasher, "_derive", wraps=PasswordHasher._derive) as derive:
+            self.assertTrue(bank.log_in("10001", "P@ssword1"))
+            self.assertTrue(bank.log_in("10001", "P@ssword1"))
+            self.assertTrue(bank.log_in("10001", "P@ssword1"))
+            self.assertEqual(derive.call_count, 1)
+            self.assertFalse(bank.log_in("10001", "P@ssword2")) # never answered from the cache
+            self.assertEqual(derive.call_count, 2)
+        uncached = Bank(self.bank_file, TransactionLogger(self.ledger), login_cache=LoginCache(ttl=0))
+        with mock.patch.object(PasswordHasher, "_derive", wraps=PasswordHasher._derive) as derive:
+            uncached.log_in("10001", "P@ssword1")
+            uncached.log_in("10001", "P@ssword1")
+            self.assertEqual(derive.call_count, 2)
+
+    def test_stronger_work_factor_rehashes_on_login(self):
+        Bank(self.bank_file, TransactionLogger(self.ledger))
+        old = self.stored_passwords()["10001"]
+        stronger = PasswordHasher(n=2**5)
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger), password_hasher=stronger)
+        self.assertEqual(self.stored_passwords()["10001"], old) # hashes aren't redone without the password
+        self.assertTrue(bank.log_in("10001", "P@ssword1"))
+        upgraded = self.stored_passwords()["10001"]
+        self.assertTrue(upgraded.startswith("scrypt$32$"))
+        self.assertFalse(stronger.needs_rehash(upgraded))
+        self.assertTrue(bank.log_in("10001", "P@ssword1"))
+
+if __name__ == "__main__":
+    unittest.main()
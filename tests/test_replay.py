@@ -0,0 +1,170 @@
+import unittest
+import os
+import csv
+import tempfile
+from unittest import mock
+from customer import bank_app, replay
+from customer.bank_app import Bank, TransactionLogger
+from customer.replay import LedgerReplay, ReplayState
+from customer.segments import SegmentedTransactionLogger
+from customer.storage import SqliteStorage
+
+def state_of(bank):
+    return {a: (c.checking.balance_cents, c.savings.balance_cents, c.checking.overdraft_count, c.checking.is_active)
+            for a, c in bank.customers.items()}
+
+def replayed(state, account_ids):
+    return {a: (c.checking.balance_cents, c.savings.balance_cents, c.checking.overdraft_count, c.checking.is_active)
+            for a, c in ((a, state.account(a)) for a in account_ids)}
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        self.history = {} # tx_id -> bank state right after it
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self, logger=None, **options):
+        return Bank(self.bank_file, logger or TransactionLogger(self.ledger), **options)
+
+    def make_activity(self, bank):
+        def record():
+            last = max(int(row["tx_id"]) for row in bank.tx_logger.iter_transactions())
+            self.history[last] = state_of(bank)
+        a = bank.add_new_customer("Alice","Wonder","P@ssword1",100,50)
+        record()
+        b = bank.add_new_customer("Bob","Builder","StrongP@ss2")
+        c = bank.add_new_customer("Cara","Way","StrongP@ss3",0,20)
+        record()
+        for step in (lambda: bank.deposit_money(b, "savings", 30),
+                     lambda: bank.withdraw_money(a, "checking", 120), # overdraft + fee
+                     lambda: bank.transfer_money(b, "savings", a, "checking", 10.5),
+                     lambda: bank.withdraw_money(a, "checking", 10), # second overdraft, deactivated
+                     lambda: bank.deposit_money(a, "checking", 100),
+                     lambda: bank.reactivate_account(a, "checking"),
+                     lambda: bank.transfer_money(c, "savings", c, "checking", 5),
+                     lambda: bank.withdraw_money(a, "savings", 50)):
+            step()
+            record()
+        return a, b, c
+
+    def test_state_at_any_tx_id(self):
+        bank = self.open_bank()
+        self.make_activity(bank)
+        engine = LedgerReplay(bank.tx_logger, every=0)
+        for tx_id, expected in self.history.items():
+            state = engine.state_at(tx_id)
+            self.assertEqual(state.tx_id, tx_id)
+            self.assertEqual(replayed(state, expected), expected)
+            self.assertEqual(state.anomalies, [])
+        self.assertEqual(replayed(engine.state_at(), bank.customers), state_of(bank))
+        self.assertEqual(engine.state_at(0).accounts, {})
+        self.assertFalse(os.path.exists(engine.directory))
+
+    def test_state_at_timestamp(self):
+        bank = self.open_bank()
+        self.make_activity(bank)
+        with open(self.ledger, newline="") as f:
+            rows = list(csv.DictReader(f))
+        engine = LedgerReplay(bank.tx_logger)
+        self.assertEqual(engine.state_at(timestamp=rows[5]["timestamp"]).tx_id, int(rows[5]["tx_id"]))
+        self.assertEqual(engine.state_at(timestamp="2000-01-01").tx_id, 0)
+
+    def test_checkpoints_are_resumed_from(self):
+        bank = self.open_bank()
+        self.make_activity(bank)
+        engine = LedgerReplay(bank.tx_logger, every=3)
+        last = engine.checkpoint().tx_id
+        self.assertEqual([tx_id for tx_id, _, _ in engine.checkpoints()], list(range(3, last + 1, 3)))
+        with mock.patch.object(ReplayState, "apply", autospec=True, side_effect=ReplayState.apply) as apply:
+            state = engine.state_at(8)
+        self.assertEqual(apply.call_count, 2) # from the checkpoint at 6
+        self.assertEqual(replayed(state, self.history[8]), self.history[8])
+
+    def test_stale_checkpoints_are_dropped(self):
+        bank = self.open_bank()
+        self.make_activity(bank)
+        LedgerReplay(bank.tx_logger, every=3).checkpoint()
+        bank.close()
+        bank_app._LEDGER_STATES.clear()
+        os.remove(self.ledger) # a different history under the same name
+        os.remove(self.bank_file)
+        bank = self.open_bank()
+        a = bank.add_new_customer("Dan","Other","StrongP@ss4",7,0)
+        for _ in range(8):
+            bank.deposit_money(a, "checking", 1)
+        engine = LedgerReplay(bank.tx_logger, every=3)
+        state = engine.state_at()
+        self.assertEqual(replayed(state, [a]), state_of(bank))
+        self.assertEqual(state.anomalies, [])
+        self.assertEqual([tx_id for tx_id, _, _ in engine.checkpoints()], [3, 6, 9])
+
+    def test_generic_ledgers(self):
+        bank = Bank(storage=SqliteStorage(os.path.join(self.tmp.name, "bank.db")))
+        self.make_activity(bank)
+        engine = LedgerReplay(bank.tx_logger, every=4)
+        self.assertEqual(replayed(engine.checkpoint(), bank.customers), state_of(bank))
+        self.assertEqual(replayed(engine.state_at(9), self.history[9]), self.history[9])
+        self.assertEqual(replay.check_bank(bank, engine)[0], [])
+        bank.close()
+        bank = self.open_bank(SegmentedTransactionLogger(self.ledger, period=None, max_bytes=400))
+        self.make_activity(bank)
+        self.assertTrue(bank.tx_logger.segments())
+        engine = LedgerReplay(bank.tx_logger, every=4)
+        engine.checkpoint()
+        self.assertEqual(replayed(engine.state_at(9), self.history[9]), self.history[9])
+
+    def test_rows_the_rules_reject_are_applied_and_reported(self):
+        logger = TransactionLogger(self.ledger)
+        logger.log("deposit", to_id="10001", to_type="savings", amount=10, resulting_balance=10)
+        logger.log("withdraw", "10001", "savings", amount=25, resulting_balance=-15)
+        state = LedgerReplay(logger).state_at()
+        self.assertEqual(state.account("10001").savings.balance_cents, -1500)
+        self.assertEqual([(tx_id, a) for tx_id, a, _ in state.anomalies], [(2, "10001")])
+        self.assertIn("Insufficient funds", state.anomalies[0][2])
+
+class TestConsistencyCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def test_check_bank(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                bank = Bank(self.bank_file, TransactionLogger(self.ledger), journal=journal)
+                a = bank.add_new_customer("Alice","Wonder","P@ssword1",100,50)
+                bank.withdraw_money(a, "checking", 130)
+                self.assertEqual(replay.check_bank(bank)[0], [])
+                bank.close()
+                for name in (self.bank_file, self.bank_file + ".journal", self.ledger):
+                    if os.path.exists(name):
+                        os.remove(name)
+                bank_app._LEDGER_STATES.clear()
+
+    def test_differences_are_reported(self):
+        bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        a = bank.add_new_customer("Alice","Wonder","P@ssword1",100,50)
+        b = bank.add_new_customer("Bob","Builder","StrongP@ss2")
+        bank.withdraw_money(a, "checking", 130)
+        bank.tx_logger.log("deposit", to_id="10999", to_type="checking", amount=5, resulting_balance=5)
+        bank.customers[b].savings.balance = 12 # changed without a ledger row
+        bank.save_customers()
+        self.assertEqual(replay.main(["check", "--ledger", self.ledger, "--bank", self.bank_file]), 1)
+        mismatches, state = replay.check_bank(bank)
+        self.assertEqual(mismatches, [(b, "balance_savings", "12.00", "0.00"),
+                                      ("10999", "account_id", None, "10999")])
+        self.assertEqual(state.row(a)["overdraft_count"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
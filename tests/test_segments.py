@@ -0,0 +1,104 @@
+import unittest
+import os
+import csv
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+from customer import bank_app, segments
+from customer.bank_app import Bank
+from customer.segments import BloomFilter, SegmentedTransactionLogger
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        items = [str(10000 + i) for i in range(2000)]
+        bloom = BloomFilter.from_json(BloomFilter.for_items(items).to_json())
+        self.assertTrue(all(i in bloom for i in items))
+        false_hits = sum(str(50000 + i) in bloom for i in range(2000))
+        self.assertLess(false_hits, 100)
+
+class TestSegmentedLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            for i in range(6):
+                writer.writerow([str(10001 + i), f"First{i}", "Last", "P@ssword1", "1000", "1000"])
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def open_bank(self, **options):
+        return Bank(self.bank_file, SegmentedTransactionLogger(self.ledger, **options))
+
+    def test_size_rotation_and_reads(self):
+        bank = self.open_bank(period=None, max_bytes=400, compress=True)
+        for i in range(30):
+            bank.deposit_money(str(10001 + i % 3), "checking", 1)
+        bank.transfer_money("10001", "checking", "10004", "savings", 5)
+        logger = bank.tx_logger
+        manifest = logger._load_manifest()
+        self.assertGreater(len(manifest), 3)
+        self.assertTrue(all(e["file"].endswith(".csv.gz") for e in manifest))
+        self.assertEqual(manifest[0]["first_tx_id"], 1)
+        self.assertEqual([e["first_tx_id"] for e in manifest[1:]], [e["last_tx_id"] + 1 for e in manifest[:-1]])
+        rows = list(logger.iter_transactions())
+        self.assertEqual([int(r["tx_id"]) for r in rows], list(range(1, 32)))
+        self.assertEqual(len(logger.get_transactions_for_customer("10001")), 11)
+        # the bloom filters let reads for 10004 skip every segment but the last
+        self.assertLessEqual(len(list(logger.segments("10004"))), 1)
+        self.assertEqual(len(logger.get_transactions_for_customer("10004")), 1)
+        with gzip.open(os.path.join(logger.segment_dir, manifest[0]["file"]), "rt") as f:
+            self.assertEqual(f.readline().strip(), ",".join(logger.FIELDNAMES))
+
+        bank_app._LEDGER_STATES.clear()
+        bank = self.open_bank(period=None, max_bytes=400)
+        bank.deposit_money("10002", "checking", 1)
+        self.assertEqual(bank.tx_logger.iter_transactions().__next__()["tx_id"], "1")
+        self.assertEqual(list(bank.tx_logger.iter_transactions())[-1]["tx_id"], "32")
+
+    def test_monthly_rotation(self):
+        bank = self.open_bank()
+        bank.deposit_money("10001", "checking", 1)
+        bank.deposit_money("10002", "checking", 1)
+        next_month = datetime.now() + timedelta(days=32)
+        with mock.patch.object(segments, "datetime", mock.Mock(now=mock.Mock(return_value=next_month))):
+            bank.deposit_money("10003", "checking", 1)
+        manifest = bank.tx_logger._load_manifest()
+        self.assertEqual([(e["first_tx_id"], e["last_tx_id"]) for e in manifest], [(1, 2)])
+        with open(self.ledger) as f:
+            self.assertEqual([r["tx_id"] for r in csv.DictReader(f)], ["3"])
+        self.assertEqual(list(bank.tx_logger.segments(start=next_month)), [])
+        self.assertEqual(len(bank.tx_logger.get_transactions_for_customer("10001", start=next_month)), 0)
+        self.assertEqual(len(bank.tx_logger.get_transactions_for_customer("10001")), 1)
+
+    def test_recovers_from_crash_before_reset(self):
+        bank = self.open_bank(period=None)
+        for i in range(3):
+            bank.deposit_money("10001", "checking", 1)
+        with mock.patch.object(SegmentedTransactionLogger, "_reset_active"):
+            bank.tx_logger.rotate() # "crashes" before the file is emptied
+        bank_app._LEDGER_STATES.clear()
+        logger = SegmentedTransactionLogger(self.ledger, period=None)
+        self.assertEqual([r["tx_id"] for r in logger.iter_transactions()], ["1", "2", "3"])
+        logger.log("deposit", to_id="10001", to_type="checking", amount=1, resulting_balance=1004)
+        self.assertEqual([r["tx_id"] for r in logger.iter_transactions()], ["1", "2", "3", "4"])
+
+    def test_cli_lists_segments(self):
+        bank = self.open_bank(period=None)
+        bank.deposit_money("10001", "checking", 1)
+        with mock.patch("builtins.print") as printed:
+            segments.main(["rotate", self.ledger])
+        self.assertIn("000001.csv: tx 1-1", printed.call_args[0][0])
+        with open(os.path.join(self.ledger + ".segments", "manifest.json")) as f:
+            self.assertEqual(json.load(f)[0]["rows"], 1)
+
+if __name__=="__main__":
+    unittest.main()
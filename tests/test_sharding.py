@@ -0,0 +1,179 @@
+import unittest
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
+from customer import bank_app, replay
+from customer.bank_app import TransactionLogger
+from customer.sharding import ShardCrashed, ShardedBank, _Shard, shard_of
+from customer.storage import CsvStorage
+
+class TestShardedBank(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "shards")
+        self.bank = ShardedBank(self.directory, shards=3)
+        self.ids = self.bank.bulk_add_customers(
+            [{"first_name": f"First{i}", "last_name": "Last", "password": "P@ssword1",
+              "initial_checking": 100, "initial_savings": 50} for i in range(12)])
+
+    def tearDown(self):
+        self.bank.close()
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def pair(self, same_shard=False):
+        for a in self.ids:
+            for b in self.ids:
+                if a != b and (shard_of(a, 3) == shard_of(b, 3)) == same_shard:
+                    return a, b
+
+    def total(self):
+        return sum(c.checking.balance + c.savings.balance for c in map(self.bank.customer, self.ids))
+
+    def test_operations_are_routed_to_the_owning_shard(self):
+        self.assertEqual(self.ids, [str(i) for i in range(10001, 10013)])
+        self.assertEqual({shard_of(a, 3) for a in self.ids}, {0, 1, 2})
+        a = self.ids[0]
+        self.assertTrue(self.bank.log_in(a, "P@ssword1"))
+        self.assertFalse(self.bank.log_in(a, "wrong"))
+        self.assertEqual(self.bank.deposit_money(a, "checking", 25), Decimal("125.00"))
+        self.assertEqual(self.bank.withdraw_money(a, "savings", 20), (Decimal("30.00"), 0))
+        with self.assertRaisesRegex(ValueError, "Customer not found"):
+            self.bank.deposit_money("99999", "checking", 1)
+        self.assertEqual(self.bank.top_3_customers()[0].account_id, a)
+        path = os.path.join(self.directory, f"shard{shard_of(a, 3)}", "bank.csv")
+        with open(path) as f:
+            self.assertIn(a, f.read())
+        with self.assertRaisesRegex(ValueError, "resharding"):
+            ShardedBank(self.directory, shards=4)
+
+    def test_transfers_move_money_exactly_once(self):
+        before = self.total()
+        a, b = self.pair()
+        c, d = self.pair(same_shard=True)
+        self.assertEqual(self.bank.transfer_money(a, "checking", b, "savings", 30),
+                         (Decimal("70.00"), Decimal("80.00")))
+        self.bank.transfer_money(c, "savings", d, "checking", 10)
+        self.assertEqual(self.bank.transfer_money(b, "checking", a, "checking", 120),
+                         (Decimal("-55.00"), Decimal("190.00"))) # overdraft fee 35 leaves the bank
+        self.assertEqual(self.total(), before - 35)
+        self.bank.close()
+        self.bank = ShardedBank(self.directory, shards=3)
+        self.assertEqual(self.bank.customer(b).checking.overdraft_count, 1)
+        self.assertEqual(self.total(), before - 35)
+        for i in range(3): # every shard's ledger replays to what it stored
+            shard = os.path.join(self.directory, f"shard{i}")
+            logger = TransactionLogger(os.path.join(shard, "transactions.csv"))
+            state = replay.LedgerReplay(logger, every=0).state_at()
+            rows = CsvStorage(os.path.join(shard, "bank.csv"), logger).load_customers()
+            self.assertEqual((replay.diff(state, rows), state.anomalies), ([], []))
+
+    def test_refused_transfers_change_nothing(self):
+        before = self.total()
+        a, b = self.pair()
+        with self.assertRaisesRegex(ValueError, "Insufficient funds"):
+            self.bank.transfer_money(a, "savings", b, "savings", 51)
+        with self.assertRaisesRegex(ValueError, "not found"):
+            self.bank.transfer_money(a, "savings", "99999", "savings", 5)
+        with self.assertRaisesRegex(ValueError, "Invalid receiver account type"):
+            self.bank.transfer_money(a, "savings", b, "gold", 5)
+        self.assertEqual(self.total(), before)
+        states = {e["state"] for e in self.bank._transfers.entries.values()}
+        self.assertEqual(states, {"aborted"})
+
+    def test_crashed_worker_is_restarted(self):
+        a, b = self.pair()
+        worker = self.bank._workers[shard_of(a, 3)]
+        worker.process.kill()
+        worker.process.join()
+        with self.assertRaises(ShardCrashed):
+            worker.submit("customer", a).result()
+        self.assertEqual(self.bank.deposit_money(a, "checking", 1), Decimal("101.00"))
+        self.assertEqual(self.bank.transfer_money(b, "checking", a, "checking", 1)[1], Decimal("102.00"))
+        # Killed again, and the reply reader hasn't noticed yet
+        worker = self.bank._workers[shard_of(a, 3)]
+        worker.process.kill()
+        worker.process.join()
+        worker._reader.join()
+        worker.alive = True
+        self.assertEqual(self.bank.deposit_money(a, "checking", 1), Decimal("103.00"))
+
+    def test_transfers_left_halfway_are_finished(self):
+        before = self.total()
+        a, b = self.pair()
+        sa, sb = shard_of(a, 3), shard_of(b, 3)
+        # Debited, then the coordinator and the receiving shard crash
+        committed = uuid.uuid4().hex
+        self.bank._transfers.write(committed, "begun", from_shard=sa, to_shard=sb)
+        self.bank._call(sb, "prepare_credit", committed, b, "checking", "40.00", a, "checking")
+        self.bank._call(sa, "debit", committed, a, "checking", "40.00", b, "checking")
+        # Prepared but never debited
+        aborted = uuid.uuid4().hex
+        self.bank._transfers.write(aborted, "begun", from_shard=sa, to_shard=sb)
+        self.bank._call(sb, "prepare_credit", aborted, b, "checking", "5.00", a, "checking")
+        for worker in self.bank._workers: # the whole process tree goes down
+            worker.process.kill()
+            worker.process.join()
+        self.bank._transfers.close()
+        self.bank = ShardedBank(self.directory, shards=3)
+        self.assertEqual(self.bank.customer(a).checking.balance, 60)
+        self.assertEqual(self.bank.customer(b).checking.balance, 140)
+        self.assertEqual(self.total(), before)
+        # Everything is settled, so the transfer logs are emptied
+        self.assertEqual(self.bank._transfers.entries, {})
+        for i in range(3):
+            self.assertEqual(os.path.getsize(os.path.join(self.directory, f"shard{i}", "transfers.log")), 0)
+
+class TestShardLegs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "shard0")
+        shard = _Shard(self.directory, {})
+        self.account = shard.bank.add_new_customer("Alice","Wonder","P@ssword1",100,0)
+        shard.close()
+
+    def tearDown(self):
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def restart(self, shard):
+        shard.transfers.close()
+        bank_app._LEDGER_STATES.clear()
+        return _Shard(self.directory, {})
+
+    def test_debit_torn_after_the_ledger_row_is_rolled_forward(self):
+        shard = _Shard(self.directory, {})
+        with mock.patch.object(shard.bank.storage, "save_changed", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                shard.debit("x1", self.account, "checking", "30.00", "20001", "checking")
+        self.assertEqual(shard.transfers.state("x1"), "debiting")
+        rows = list(shard.bank.tx_logger.iter_transactions())
+        self.assertEqual(shard.transfers.entries["x1"]["tx_id"], int(rows[-1]["tx_id"])) # the id the ledger gave
+        shard = self.restart(shard)
+        self.assertEqual(shard.transfers.state("x1"), "debited")
+        self.assertEqual(shard.bank.customers[self.account].checking.balance, 70)
+        self.assertEqual(self.restart(shard).bank.customers[self.account].checking.balance, 70)
+
+    def test_debit_torn_before_the_ledger_row_is_rolled_back(self):
+        shard = _Shard(self.directory, {})
+        log = shard.bank.tx_logger.log
+        def crash_before_the_row(*args, before_write, **kwargs):
+            def prepared(tx_id):
+                before_write(tx_id)
+                raise OSError("disk full")
+            return log(*args, before_write=prepared, **kwargs)
+        with mock.patch.object(shard.bank.tx_logger, "log", side_effect=crash_before_the_row):
+            with self.assertRaises(OSError):
+                shard.debit("x1", self.account, "checking", "30.00", "20001", "checking")
+        self.assertEqual(shard.transfers.state("x1"), "debiting")
+        shard = self.restart(shard)
+        self.assertEqual(shard.transfers.state("x1"), "refused")
+        self.assertEqual(shard.bank.customers[self.account].checking.balance, 100)
+        self.assertEqual(shard.abort("x1"), "aborted")
+
+if __name__ == "__main__":
+    unittest.main()
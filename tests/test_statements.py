@@ -0,0 +1,106 @@
+import unittest
+import os
+import csv
+import tempfile
+from datetime import datetime, timedelta
+from customer import bank_app
+from customer.bank_app import Bank, TransactionLogger
+from customer.statements import PROGRESS_FILENAME
+from customer.storage import SqliteStorage
+
+class TestAllStatements(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            for i in range(12):
+                writer.writerow([str(10001 + i), f"First{i}", "Last", "P@ssword1", "1000", "1000"])
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.bank = Bank(self.bank_file, TransactionLogger(os.path.join(self.tmp.name, "transactions.csv")))
+        self.make_activity(self.bank)
+
+    def tearDown(self):
+        self.bank.close()
+        os.chdir(self.cwd)
+        bank_app._LEDGER_STATES.clear()
+        self.tmp.cleanup()
+
+    def make_activity(self, bank):
+        for i in range(10): # the last two customers stay quiet
+            a, b = str(10001 + i), str(10001 + (i + 1) % 10)
+            bank.deposit_money(a, "checking", 10 + i)
+            bank.transfer_money(a, "savings", b, "checking", 5)
+            bank.withdraw_money(b, "savings", 1)
+
+    def expected(self, bank, directory, start=None, end=None):
+        # The per-account path, for comparison
+        os.makedirs(directory, exist_ok=True)
+        os.chdir(directory)
+        try:
+            for account_id in bank.customers:
+                bank.generate_statement(account_id, start, end)
+        finally:
+            os.chdir(self.tmp.name)
+        return self.read_all(directory)
+
+    def read_all(self, directory):
+        result = {}
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name)) as f:
+                result[name] = f.read()
+        return result
+
+    def test_same_output_as_generate_statement(self):
+        expected = self.expected(self.bank, "one_by_one")
+        self.assertEqual(len(expected), 12)
+        seen = []
+        written = self.bank.generate_all_statements(directory="bulk", progress=lambda d, t: seen.append((d, t)))
+        self.assertEqual(written, 12)
+        self.assertEqual(self.read_all("bulk"), expected)
+        self.assertEqual(seen[-1], (12, 12))
+        self.assertEqual(self.bank.generate_all_statements(directory="spilled", spill_rows=3, workers=2), 12)
+        self.assertEqual(self.read_all("spilled"), expected)
+
+    def test_period(self):
+        later = datetime.now() + timedelta(days=1)
+        expected = self.expected(self.bank, "one_by_one", start=later)
+        self.bank.generate_all_statements(start=later, directory="bulk")
+        self.assertEqual(self.read_all("bulk"), expected)
+        self.assertTrue(all(text.endswith("Transactions:\n") for text in expected.values()))
+
+    def test_resume_after_interruption(self):
+        class Stop(Exception):
+            pass
+        def interrupt(done, total):
+            if done == 5:
+                raise Stop()
+        with self.assertRaises(Stop):
+            self.bank.generate_all_statements(directory="bulk", workers=1, progress=interrupt)
+        with open(os.path.join("bulk", PROGRESS_FILENAME)) as f:
+            finished = f.read().splitlines()[1:]
+        self.assertEqual(len(finished), 5)
+        seen = []
+        self.assertEqual(self.bank.generate_all_statements(directory="bulk", progress=lambda d, t: seen.append(d)), 7)
+        self.assertEqual(seen[0], 6)
+        self.assertFalse(os.path.exists(os.path.join("bulk", PROGRESS_FILENAME)))
+        self.assertEqual(self.read_all("bulk"), self.expected(self.bank, "one_by_one"))
+
+    def test_sqlite_ledger(self):
+        bank = Bank(storage=SqliteStorage(os.path.join(self.tmp.name, "bank.db")))
+        try:
+            for i in range(12):
+                bank.add_new_customer(f"First{i}", "Last", "P@ssword1", 1000, 1000)
+            self.make_activity(bank)
+            rows = list(bank.tx_logger.iter_transactions(chunk_size=7))
+            self.assertEqual([int(r["tx_id"]) for r in rows], list(range(1, 55))) # 24 "open" rows first
+            bank.generate_all_statements(directory="bulk")
+            self.assertEqual(self.read_all("bulk"), self.expected(bank, "one_by_one"))
+        finally:
+            bank.close()
+
+if __name__=="__main__":
+    unittest.main()
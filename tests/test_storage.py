@@ -0,0 +1,123 @@
+import unittest
+import os
+import csv
+import tempfile
+from customer.bank_app import Bank, TransactionLogger
+from customer.storage import SqliteStorage, main
+
+class TestSqliteStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "bank.db")
+        self.bank = Bank(storage=SqliteStorage(self.db))
+        self.alice = self.bank.add_new_customer("Alice","Wonder","P@ssword1",1000,5000)
+        self.bob = self.bank.add_new_customer("Bob","Builder","StrongP@ss2",50,500)
+
+    def tearDown(self):
+        self.bank.close()
+        self.tmp.cleanup()
+
+    def reopen(self):
+        self.bank.close()
+        self.bank = Bank(storage=SqliteStorage(self.db))
+        return self.bank
+
+    def test_operations_persist(self):
+        self.bank.deposit_money(self.alice,"checking",500)
+        self.bank.withdraw_money(self.bob,"checking",60)
+        self.bank.transfer_money(self.alice,"savings",self.bob,"savings",100)
+        bank = self.reopen()
+        self.assertEqual(bank.customers[self.alice].checking.balance,1500)
+        self.assertEqual(bank.customers[self.alice].savings.balance,4900)
+        self.assertEqual(bank.customers[self.bob].checking.balance,-45)
+        self.assertEqual(bank.customers[self.bob].checking.overdraft_count,1)
+        self.assertEqual(bank.customers[self.bob].savings.balance,600)
+
+    def test_transfer_is_atomic(self):
+        def broken_log(*args, **kwargs):
+            raise OSError("disk full")
+        self.bank.tx_logger.log = broken_log
+        with self.assertRaises(OSError):
+            self.bank.transfer_money(self.alice,"checking",self.bob,"savings",200)
+        self.assertEqual(self.bank.customers[self.alice].checking.balance,1000)
+        self.assertEqual(self.bank.customers[self.bob].savings.balance,500)
+        bank = self.reopen()
+        self.assertEqual(bank.customers[self.alice].checking.balance,1000)
+        self.assertEqual(bank.customers[self.bob].savings.balance,500)
+
+    def test_ledger_returns_tx_ids(self):
+        ledger = self.bank.tx_logger
+        first = ledger.log("deposit", to_id=self.alice, to_type="checking", amount=1)
+        def refuse(tx_id):
+            raise OSError("intent log full")
+        with self.assertRaises(OSError):
+            ledger.log("deposit", to_id=self.alice, to_type="checking", amount=2, before_write=refuse)
+        self.assertEqual(ledger.log("deposit", to_id=self.alice, to_type="checking", amount=3), first + 1)
+        rows = ledger.get_transactions_for_customer(self.alice)
+        self.assertEqual([(r["tx_id"], r["amount"]) for r in rows[-2:]], [(str(first), "1.00"), (str(first + 1), "3.00")])
+
+    def test_top_3_uses_index(self):
+        self.bank.add_new_customer("Eve","Online","Strong2@",500,100)
+        self.bank.add_new_customer("Frank","Ocean","Strong3@",7000,200)
+        top3 = self.bank.top_3_customers()
+        self.assertEqual([c.first_name for c in top3], ["Frank","Alice","Eve"])
+        plan = self.bank.storage.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT account_id FROM customers ORDER BY balance_checking + balance_savings DESC LIMIT 3").fetchall()
+        self.assertIn("customers_total", str(plan))
+
+    def test_statement_rows(self):
+        self.bank.deposit_money(self.alice,"checking",100)
+        self.bank.transfer_money(self.bob,"savings",self.alice,"checking",5)
+        rows = self.bank.tx_logger.get_transactions_for_customer(self.alice)
+        self.assertEqual([r["type"] for r in rows], ["open","open","deposit","transfer"])
+        self.assertEqual(rows[3]["from_account_id"], self.bob)
+        self.assertEqual(self.bank.tx_logger.get_transactions_for_customer(self.alice, start="2999-01-01"), [])
+
+class TestMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank_file = os.path.join(self.tmp.name, "bank.csv")
+        self.ledger = os.path.join(self.tmp.name, "transactions.csv")
+        self.db = os.path.join(self.tmp.name, "bank.db")
+        with open(self.bank_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["account_id","first_name","last_name","password","balance_checking","balance_savings"])
+            writer.writerow(["10001","Alice","Wonder","P@ssword1","1000","5000"])
+            writer.writerow(["10002","Bob","Builder","StrongP@ss2","50","500"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_migrate_keeps_customers_and_ledger(self):
+        csv_bank = Bank(self.bank_file, TransactionLogger(self.ledger))
+        csv_bank.withdraw_money("10002","checking",60)
+        csv_bank.transfer_money("10001","checking","10002","savings",200)
+        main(["migrate", "--bank", self.bank_file, "--ledger", self.ledger, "--db", self.db])
+        bank = Bank(storage=SqliteStorage(self.db))
+        try:
+            for account_id, cust in csv_bank.customers.items():
+                self.assertEqual(bank.customers[account_id].checking.balance, cust.checking.balance)
+                self.assertEqual(bank.customers[account_id].savings.balance, cust.savings.balance)
+            self.assertEqual(bank.customers["10002"].checking.overdraft_count, 1)
+            migrated = bank.tx_logger.get_transactions_for_customer("10002")
+            self.assertEqual([r["tx_id"] for r in migrated], ["1","2"])
+            bank.deposit_money("10001","checking",1)
+            self.assertEqual(bank.tx_logger.get_transactions_for_customer("10001")[-1]["tx_id"], "3")
+        finally:
+            bank.close()
+
+class TestCsvAtomicity(unittest.TestCase):
+
+    def test_invalid_receiver_type_leaves_sender_untouched(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bank = Bank(os.path.join(tmp, "bank.csv"), TransactionLogger(os.path.join(tmp, "transactions.csv")))
+            a = bank.add_new_customer("Alice","Wonder","P@ssword1",1000,0)
+            b = bank.add_new_customer("Bob","Builder","StrongP@ss2",0,0)
+            with self.assertRaises(ValueError):
+                bank.transfer_money(a,"checking",b,"bogus",100)
+            self.assertEqual(bank.customers[a].checking.balance,1000)
+
+if __name__=="__main__":
+    unittest.main()